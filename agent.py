@@ -21,7 +21,7 @@ from langchain_core.tools import tool
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_factory import get_chat_model
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,7 +33,7 @@ api_key = os.getenv("GOOGLE_API_KEY")
 os.environ["GOOGLE_API_KEY"] = api_key
 
 # Initialize the model
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+llm = get_chat_model("gemini-1.5-flash")
 
 database_url = os.getenv("DATABASE_URL")
 db = SQLDatabase.from_uri(database_url)
@@ -0,0 +1,167 @@
+"""
+Agent Cache - Compiled ReAct sub-agents built once and shared across requests
+
+The query_gen and query_execute nodes called create_react_agent() on every
+question, which binds the tools to the LLM and compiles a new LangGraph graph
+each time even though the LLM, the tools and the prompt never change. The
+cache compiles each sub-agent once per (llm, toolset, prompt) and hands the
+same compiled graph to every request; compiled graphs keep no per-run state,
+so concurrent invocations can share them.
+
+Cache keys use the identity of the LLM and tool objects (two modules may
+define tools with the same name against different databases) and the prompt
+text. The cache keeps a reference to the objects of each key, so an id can
+never be reused by another object while its entry exists.
+
+Configuration:
+- SQL_AGENT_CACHE_ENABLED: Reuse compiled sub-agents (default true); when
+  disabled every call compiles a new agent, as before
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+from langgraph.prebuilt import create_react_agent
+
+
+AGENT_CACHE_ENABLED = os.getenv("SQL_AGENT_CACHE_ENABLED", "true").lower() == "true"
+
+
+class AgentCacheStats:
+    """Thread-safe counters of cache hits, misses and compile time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compile_seconds = 0.0
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, compile_seconds: float) -> None:
+        with self._lock:
+            self.misses += 1
+            self.compile_seconds += compile_seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.compile_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "compile_ms_total": round(self.compile_seconds * 1000, 3),
+            }
+
+
+# Global stats instance
+agent_cache_stats = AgentCacheStats()
+
+_lock = threading.Lock()
+# key -> (compiled agent, objects the key refers to by id)
+_agents: Dict[Tuple, Tuple[Any, Tuple]] = {}
+
+
+def _cache_key(llm: Any, tools: Sequence[Any], prompt: Optional[Any]) -> Tuple:
+    prompt_key = prompt if prompt is None or isinstance(prompt, str) else ("id", id(prompt))
+    return (id(llm), tuple(id(tool) for tool in tools), prompt_key)
+
+
+def get_react_agent(llm: Any, tools: Sequence[Any], prompt: Optional[Any] = None) -> Any:
+    """
+    Compiled ReAct agent for an LLM, toolset and prompt, built on first use.
+
+    Args:
+        llm: Chat model the agent calls
+        tools: Tools the agent can use
+        prompt: Optional prompt passed to create_react_agent()
+
+    Returns:
+        Compiled agent graph, shared by every caller with the same arguments
+    """
+    tools = list(tools)
+    if not AGENT_CACHE_ENABLED:
+        return create_react_agent(llm, tools=tools, prompt=prompt)
+
+    key = _cache_key(llm, tools, prompt)
+    entry = _agents.get(key)
+    if entry is not None:
+        agent_cache_stats.record_hit()
+        return entry[0]
+
+    with _lock:
+        # Another thread may have compiled it while we waited for the lock
+        entry = _agents.get(key)
+        if entry is not None:
+            agent_cache_stats.record_hit()
+            return entry[0]
+
+        start = time.perf_counter()
+        agent = create_react_agent(llm, tools=tools, prompt=prompt)
+        agent_cache_stats.record_miss(time.perf_counter() - start)
+        _agents[key] = (agent, (llm, tuple(tools), prompt))
+        return agent
+
+
+def clear_agent_cache() -> None:
+    """Drop all compiled agents, e.g. after the LLM or tools were replaced"""
+    with _lock:
+        _agents.clear()
+
+
+def get_agent_cache_stats() -> Dict[str, Any]:
+    """Cache statistics, including the number of compiled agents"""
+    stats = agent_cache_stats.to_dict()
+    stats["agents"] = len(_agents)
+    return stats
+
+
+def measure_setup_overhead(llm: Any, tools: Sequence[Any], iterations: int = 50) -> Dict[str, float]:
+    """
+    Per-question sub-agent setup time, compiling every time versus cached.
+
+    Args:
+        llm: Chat model the agent calls
+        tools: Tools the agent can use
+        iterations: Number of setups measured for each mode
+
+    Returns:
+        Mean milliseconds per setup for "uncached" and "cached"
+    """
+    tools = list(tools)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        create_react_agent(llm, tools=tools)
+    uncached_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    get_react_agent(llm, tools)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        get_react_agent(llm, tools)
+    cached_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    return {"uncached_ms": round(uncached_ms, 3), "cached_ms": round(cached_ms, 4)}
+
+
+if __name__ == "__main__":
+    from langchain_core.tools import tool
+    from mock_llm import MockChatModel
+
+    @tool
+    def db_exec_tool(query: str) -> str:
+        """Execute a SQL query"""
+        return query
+
+    overhead = measure_setup_overhead(MockChatModel(), [db_exec_tool])
+    print(f"Sub-agent setup per question: {overhead['uncached_ms']} ms compiled each time, "
+          f"{overhead['cached_ms']} ms cached")
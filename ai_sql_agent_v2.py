@@ -8,18 +8,54 @@ while SQL execution is handled by the separate sql_execution_api.py module.
 Key Features:
 - Natural language to SQL conversion using Gemini AI
 - DDL schema-aware query generation
+- DDL loaded from an on-disk snapshot, revalidated in the background
 - SQL validation and syntax checking
+- EXPLAIN-based cost guard before execution
+- Row budget (automatic LIMIT) for exploratory queries
+- Cached static prompt prefix with per-request token accounting
+- Template fast path that answers common questions without the LLM
+- Bounded self-repair of queries that fail on execution
+- Few-shot examples retrieved from successful runs
+- Batch processing with deduplication and shared LLM calls
+- Optional speculative generation racing several candidates
+- Streamed generation that stops as soon as the SQL statement is complete
+- Per-stage timings and token usage with rolling percentiles
 - Modular design with separated concerns
 """
 
 import os
+import re
+import time
+import threading
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
-from extract_ddl import extract_ddl_from_database
-from typing import Dict, Any, Optional
+from engine_resources import get_database_ddl, get_ddl_snapshot, get_llm
+from direct_execution import run_in_background
+from sql_cost_guard import COST_GUARD_ENABLED, evaluate_plan, is_explainable
+from sql_row_budget import ROW_BUDGET, apply_row_budget, is_read_only
+from intent_router import TEMPLATE_ROUTER_ENABLED, IntentRouter
+from example_store import FEW_SHOT_ENABLED, ExampleStore, example_store_path, format_examples, few_shot_stats, tokenize
+from sql_stream import STREAM_GENERATION, stream_sql
+from pipeline_metrics import pipeline_stats, record_stage, record_tokens, stage, track_request
+from speculative_generation import SPECULATIVE_K, run_speculative, speculative_stats
+from sql_repair import (
+    REPAIR_DEADLINE_SECONDS,
+    REPAIR_MAX_ATTEMPTS,
+    SQL_REPAIR_PROMPT,
+    build_repair_request,
+    is_repairable_error,
+    repair_stats
+)
+from prompt_cache import (
+    PROMPT_CACHE_MODE,
+    build_prompt_messages,
+    get_prompt_prefix,
+    resolve_cache_mode,
+    token_usage_stats
+)
+from typing import Dict, Any, Callable, Iterator, List, Optional
 import logging
 
 load_dotenv()
@@ -28,19 +64,91 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+# LLM, shared with the other agents of the process and created on first use (see engine_resources.py)
+LLM_MODEL = "gemini-2.5-flash"
+
+
+def __getattr__(name: str) -> Any:
+    # llm, the DDL and the template router without creating them when the module is imported
+    if name == "llm":
+        return get_llm(LLM_MODEL)
+    if name == "ddl_snapshot":
+        return get_ddl_snapshot()
+    if name == "DATABASE_DDL":
+        return get_database_ddl()
+    if name == "template_router":
+        return get_template_router()
+    if name == "example_store":
+        return get_example_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # SQL Execution API configuration
 SQL_API_BASE_URL = "http://localhost:8001"
 
-# Extract DDL once at startup for enhanced query generation
-try:
-    DATABASE_DDL = extract_ddl_from_database()
-    logger.info("DDL extracted successfully for enhanced query generation")
-except Exception as e:
-    logger.warning(f"Could not extract DDL: {e}")
-    DATABASE_DDL = "DDL not available"
+# Batch processing: queries per shared LLM call and concurrent generation/execution tasks
+BATCH_GROUP_SIZE = int(os.getenv("SQL_BATCH_GROUP_SIZE", "5"))
+BATCH_WORKERS = int(os.getenv("SQL_BATCH_WORKERS", "8"))
+
+# The DDL for enhanced query generation comes from the process-wide snapshot
+# (get_database_ddl(), loaded or extracted on first use and kept up to date)
+
+# Template fast path, created on first use; dimension values (categories, cities, names) are loaded lazily via the API
+_template_router: Optional[IntentRouter] = None
+_template_router_lock = threading.Lock()
+
+
+def get_template_router() -> IntentRouter:
+    """The template router, created with the current DDL on first use and updated after schema changes"""
+    global _template_router
+    with _template_router_lock:
+        if _template_router is None:
+            router = IntentRouter(get_database_ddl(), execute_fn=lambda sql: execute_sql_via_api(sql))
+            get_ddl_snapshot().on_change(router.update_ddl)
+            _template_router = router
+        return _template_router
+
+# Few-shot examples, seeded from the curated example queries and grown from successful runs
+_example_store: Optional[ExampleStore] = None
+_example_store_lock = threading.Lock()
+
+
+def get_example_store() -> ExampleStore:
+    """The few-shot example store, loaded from example_store_path() on first use"""
+    global _example_store
+    with _example_store_lock:
+        if _example_store is None:
+            _example_store = ExampleStore(path=example_store_path())
+        return _example_store
+
+
+# Static part of the SQL generation prompt; {ddl} is filled in once per DDL version
+SQL_GENERATION_PROMPT = """You are an expert SQL query generator specialized in PostgreSQL for the DVD Rental database.
+You have complete knowledge of the database schema through the DDL provided below.
+
+DATABASE SCHEMA (DDL):
+{ddl}
+
+Your task is to convert natural language queries into precise PostgreSQL SQL statements.
+
+Guidelines:
+- Generate syntactically correct PostgreSQL queries
+- Use proper table and column names from the schema above
+- Handle joins correctly based on foreign key relationships
+- Use appropriate PostgreSQL functions and syntax
+- For system queries (database name, version), use PostgreSQL system functions
+- Return only the SQL query without additional commentary
+- Ensure queries are efficient and follow best practices
+
+Common DVD Rental database patterns:
+- Actor and film relationships via film_actor table
+- Customer rental history via rental and customer tables  
+- Film categories via film_category and category tables
+- Store inventory via inventory and store tables
+- Payment transactions via payment table
+- Geographic data via country, city, address tables
+
+IMPORTANT: Return ONLY the SQL query, no explanation or additional text unless specifically requested.
+"""
 
 
 class SQLGenerationRequest(BaseModel):
@@ -55,6 +163,9 @@ class SQLGenerationResponse(BaseModel):
     explanation: Optional[str] = Field(default=None, description="Explanation of the SQL query")
     validation_status: str = Field(description="Validation status: 'valid', 'warning', or 'error'")
     validation_message: Optional[str] = Field(default=None, description="Validation details")
+    token_usage: Optional[Dict[str, int]] = Field(default=None, description="LLM token usage including cached prompt tokens")
+    template_id: Optional[str] = Field(default=None, description="SQL template that answered the query without the LLM")
+    examples_used: int = Field(default=0, description="Number of few-shot examples included in the prompt")
 
 
 class QueryExecutionResponse(BaseModel):
@@ -66,89 +177,296 @@ class QueryExecutionResponse(BaseModel):
     execution_error: Optional[str] = Field(default=None, description="Execution error message if any")
     rows_affected: Optional[int] = Field(default=None, description="Number of rows affected/returned")
     execution_time_ms: Optional[float] = Field(default=None, description="Execution time in milliseconds")
+    plan_summary: Optional[Dict[str, Any]] = Field(default=None, description="Estimated plan from EXPLAIN before execution")
+    cost_guard_action: Optional[str] = Field(default=None, description="Cost guard action: 'allow', 'limit', 'async' or 'reject'")
+    job_id: Optional[str] = Field(default=None, description="Background job id when the query was routed to the async path")
+    executed_sql: Optional[str] = Field(default=None, description="SQL actually executed after row budget rewrites")
+    truncated: bool = Field(default=False, description="Whether the result was cut off at the row budget")
+    row_limit: Optional[int] = Field(default=None, description="Row budget applied to the result")
+    estimated_total_rows: Optional[int] = Field(default=None, description="Planner estimate of the full result size")
+    template_id: Optional[str] = Field(default=None, description="SQL template that answered the query without the LLM")
+    repair_attempts: int = Field(default=0, description="Number of times the SQL was repaired after an execution error")
+    examples_used: int = Field(default=0, description="Number of few-shot examples included in the prompt")
+    timings: Optional[Dict[str, Any]] = Field(default=None, description="Per-stage durations (ms) and LLM token usage")
+
+
+class BatchQueryResult(BaseModel):
+    """Result of one distinct query in a batch"""
+    query_indices: List[int] = Field(description="Positions of the query (and its duplicates) in the batch")
+    response: QueryExecutionResponse = Field(description="Query processing result")
 
 
-def generate_sql_query(natural_query: str, include_explanation: bool = False) -> SQLGenerationResponse:
+def generate_sql_query(natural_query: str, include_explanation: bool = False,
+                       on_partial: Optional[Callable[[str], None]] = None) -> SQLGenerationResponse:
     """
     Generate SQL query from natural language input using DDL-enhanced prompting.
     
     Args:
         natural_query: Natural language query to convert
         include_explanation: Whether to include explanation of the generated SQL
+        on_partial: Called with the partial SQL while it is streamed
         
     Returns:
         SQLGenerationResponse with generated SQL and validation status
     """
     
-    # Enhanced system prompt with DDL knowledge
-    system_prompt = f"""You are an expert SQL query generator specialized in PostgreSQL for the DVD Rental database.
-You have complete knowledge of the database schema through the DDL provided below.
+    # Common intents are answered from SQL templates without calling the LLM
+    with stage("template_routing"):
+        template_result = match_sql_template(natural_query, include_explanation)
+    if template_result:
+        return template_result
+    
+    llm = get_llm(LLM_MODEL)
+    with stage("prompt_build"):
+        # Static prompt prefix, built once per DDL version and reused across requests
+        prefix = get_prompt_prefix(SQL_GENERATION_PROMPT, get_database_ddl(), resolve_cache_mode(llm, PROMPT_CACHE_MODE))
+        
+        # Per-request part of the prompt goes after the prefix so the prefix stays cacheable
+        examples = get_example_store().search(natural_query) if FEW_SHOT_ENABLED else []
+        request_text = format_examples(examples) + f"Natural language query: {natural_query}"
+        if include_explanation:
+            request_text += "\n\nIf explanation is requested, provide a brief explanation after the SQL query, separated by a newline and starting with 'EXPLANATION:'."
+        
+        messages = build_prompt_messages(prefix, request_text)
 
-DATABASE SCHEMA (DDL):
-{DATABASE_DDL}
+    try:
+        # Generate SQL using LLM
+        with stage("llm"):
+            if SPECULATIVE_K > 1:
+                # Race K candidates and keep the first one that passes validation
+                race = run_speculative(
+                    llm, messages,
+                    validate=lambda candidate: validate_sql_syntax(parse_generated_sql(candidate.content, include_explanation)[0])["status"]
+                )
+                if not race.completed:
+                    raise RuntimeError("All speculative candidates failed")
+                response = race.response or race.completed[0]
+                
+                # Every answer received was paid for, and a cancelled call still paid for its prompt
+                from langchain_core.messages import AIMessage
+                usages = [_record_usage(candidate, prefix) for candidate in race.completed]
+                prompt_tokens = usages[0]["input_tokens"]
+                usages += [
+                    _record_usage(AIMessage(content="", usage_metadata={
+                        "input_tokens": prompt_tokens, "output_tokens": 0, "total_tokens": prompt_tokens
+                    }), prefix)
+                    for _ in range(race.cancelled)
+                ]
+                token_usage = {}
+                for usage in usages:
+                    for key, value in usage.items():
+                        token_usage[key] = token_usage.get(key, 0) + value
+                token_usage["prefix_tokens"] = prefix.token_estimate
+            elif STREAM_GENERATION:
+                # Stop at the end of the statement unless an explanation follows it
+                response = stream_sql(llm, messages, on_partial, stop_early=not include_explanation)
+                token_usage = _record_usage(response, prefix)
+            else:
+                response = llm.invoke(messages)
+                token_usage = _record_usage(response, prefix)
+        
+        with stage("validation"):
+            # Parse response (extract SQL and optional explanation)
+            sql_query, explanation = parse_generated_sql(response.content, include_explanation)
+            
+            # Basic validation
+            validation_result = validate_sql_syntax(sql_query)
+        
+        return SQLGenerationResponse(
+            sql_query=sql_query,
+            explanation=explanation,
+            validation_status=validation_result["status"],
+            validation_message=validation_result["message"],
+            token_usage=token_usage,
+            examples_used=len(examples)
+        )
+        
+    except Exception as e:
+        logger.error(f"Error generating SQL query: {e}")
+        return SQLGenerationResponse(
+            sql_query="",
+            explanation=None,
+            validation_status="error",
+            validation_message=f"SQL generation failed: {str(e)}"
+        )
 
-Your task is to convert natural language queries into precise PostgreSQL SQL statements.
 
-Guidelines:
-- Generate syntactically correct PostgreSQL queries
-- Use proper table and column names from the schema above
-- Handle joins correctly based on foreign key relationships
-- Use appropriate PostgreSQL functions and syntax
-- For system queries (database name, version), use PostgreSQL system functions
-- Return only the SQL query without additional commentary
-- Ensure queries are efficient and follow best practices
+def _record_usage(response: Any, prefix: Optional[Any] = None) -> Dict[str, int]:
+    """Record the token usage of an LLM response globally and for the current request"""
+    token_usage = token_usage_stats.record(response, prefix)
+    record_tokens(token_usage)
+    return token_usage
 
-Common DVD Rental database patterns:
-- Actor and film relationships via film_actor table
-- Customer rental history via rental and customer tables  
-- Film categories via film_category and category tables
-- Store inventory via inventory and store tables
-- Payment transactions via payment table
-- Geographic data via country, city, address tables
 
-IMPORTANT: Return ONLY the SQL query, no explanation or additional text unless specifically requested.
-"""
+def parse_generated_sql(content: str, include_explanation: bool = False):
+    """
+    Split LLM output into the SQL query and the optional explanation.
+    
+    Args:
+        content: LLM response text
+        include_explanation: Whether an explanation was requested
+        
+    Returns:
+        Tuple of (sql_query, explanation)
+    """
+    generated_content = content.strip()
+    
+    if include_explanation and "EXPLANATION:" in generated_content:
+        parts = generated_content.split("EXPLANATION:", 1)
+        sql_query = parts[0].strip()
+        explanation = parts[1].strip()
+    else:
+        sql_query = generated_content
+        explanation = None
+    
+    # Clean SQL query
+    sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+    return sql_query, explanation
 
-    if include_explanation:
-        system_prompt += "\n\nIf explanation is requested, provide a brief explanation after the SQL query, separated by a newline and starting with 'EXPLANATION:'."
 
+def match_sql_template(natural_query: str, include_explanation: bool = False) -> Optional[SQLGenerationResponse]:
+    """
+    Answer a query from the SQL templates when the template router is confident.
+    
+    Args:
+        natural_query: Natural language query to convert
+        include_explanation: Whether to include the template description
+        
+    Returns:
+        SQLGenerationResponse with the template SQL, or None when the LLM is needed
+    """
+    if not TEMPLATE_ROUTER_ENABLED:
+        return None
+    
+    match = get_template_router().route(natural_query)
+    if not match:
+        return None
+    
+    logger.info(f"Template fast path: {match.template_id} (confidence {match.confidence:.2f})")
+    validation_result = validate_sql_syntax(match.sql_query)
+    return SQLGenerationResponse(
+        sql_query=match.sql_query,
+        explanation=match.description if include_explanation else None,
+        validation_status=validation_result["status"],
+        validation_message=validation_result["message"],
+        template_id=match.template_id
+    )
+
+
+def generate_sql_batch(natural_queries: List[str]) -> Dict[str, SQLGenerationResponse]:
+    """
+    Generate SQL for several related queries with one LLM call.
+    
+    The queries share the cached prompt prefix and their few-shot examples.
+    Queries whose SQL cannot be found in the combined answer are generated
+    on their own.
+    
+    Args:
+        natural_queries: Natural language queries to convert
+        
+    Returns:
+        SQLGenerationResponse per query
+    """
+    if len(natural_queries) == 1:
+        return {natural_queries[0]: generate_sql_query(natural_queries[0])}
+    
+    llm = get_llm(LLM_MODEL)
+    prefix = get_prompt_prefix(SQL_GENERATION_PROMPT, get_database_ddl(), resolve_cache_mode(llm, PROMPT_CACHE_MODE))
+    
+    examples = []
+    if FEW_SHOT_ENABLED:
+        for natural_query in natural_queries:
+            for example in get_example_store().search(natural_query, k=1):
+                if example not in examples:
+                    examples.append(example)
+    
+    numbered_queries = "\n".join(f"{i}. {natural_query}" for i, natural_query in enumerate(natural_queries, 1))
+    request_text = (
+        format_examples(examples)
+        + f"Natural language queries:\n{numbered_queries}\n\n"
+        + "Answer every query. For each one write a line '-- Query <number>' followed by its SQL query."
+    )
+    
+    results = {}
     try:
-        # Create the full prompt
-        full_prompt = f"{system_prompt}\n\nNatural language query: {natural_query}"
+        response = llm.invoke(build_prompt_messages(prefix, request_text))
+        token_usage = _record_usage(response, prefix)
         
-        # Generate SQL using LLM
-        response = llm.invoke([HumanMessage(content=full_prompt)])
-        generated_content = response.content.strip()
-        
-        # Parse response (extract SQL and optional explanation)
-        if include_explanation and "EXPLANATION:" in generated_content:
-            parts = generated_content.split("EXPLANATION:", 1)
-            sql_query = parts[0].strip()
-            explanation = parts[1].strip()
-        else:
-            sql_query = generated_content
-            explanation = None if not include_explanation else None
-            
-        # Clean SQL query
-        sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+        # Attribute the shared call evenly to the queries it answered
+        share = {key: value // len(natural_queries) for key, value in token_usage.items()}
+        
+        content = response.content.replace("```sql", "").replace("```", "")
+        parts = re.split(r"^\s*--\s*Query\s+(\d+)\s*:?\s*$", content, flags=re.MULTILINE | re.IGNORECASE)
+        for number, sql_query in zip(parts[1::2], parts[2::2]):
+            index = int(number) - 1
+            sql_query = sql_query.strip()
+            if 0 <= index < len(natural_queries) and sql_query:
+                validation_result = validate_sql_syntax(sql_query)
+                results[natural_queries[index]] = SQLGenerationResponse(
+                    sql_query=sql_query,
+                    validation_status=validation_result["status"],
+                    validation_message=validation_result["message"],
+                    token_usage=share,
+                    examples_used=len(examples)
+                )
+    except Exception as e:
+        logger.error(f"Error generating SQL for batch: {e}")
+    
+    for natural_query in natural_queries:
+        if natural_query not in results:
+            results[natural_query] = generate_sql_query(natural_query)
+    
+    return results
+
+
+def repair_sql_query(natural_query: str, sql_query: str, error: str,
+                     timeout: Optional[float] = None) -> SQLGenerationResponse:
+    """
+    Ask the LLM to fix a SQL query that failed on execution.
+    
+    Only the failing SQL, the PostgreSQL error and the schema of the tables
+    the query refers to are sent, not the full generation prompt.
+    
+    Args:
+        natural_query: Original natural language query
+        sql_query: SQL query that failed
+        error: PostgreSQL error message
+        timeout: Seconds left of the repair deadline; the LLM call is cancelled after them
         
-        # Basic validation
-        validation_result = validate_sql_syntax(sql_query)
+    Returns:
+        SQLGenerationResponse with the repaired SQL and validation status
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    request_text = build_repair_request(natural_query, sql_query, error, get_database_ddl())
+    messages = [SystemMessage(content=SQL_REPAIR_PROMPT), HumanMessage(content=request_text)]
+    
+    try:
+        with stage("repair_llm"):
+            # On the background loop, so a call still running at the deadline can be cancelled
+            future = run_in_background(get_llm(LLM_MODEL).ainvoke(messages))
+            try:
+                response = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise TimeoutError(f"the repair deadline passed after {timeout:.1f}s") from None
+        token_usage = _record_usage(response)
+        repaired_sql = response.content.strip().replace("```sql", "").replace("```", "").strip()
+        validation_result = validate_sql_syntax(repaired_sql)
         
         return SQLGenerationResponse(
-            sql_query=sql_query,
-            explanation=explanation,
+            sql_query=repaired_sql,
             validation_status=validation_result["status"],
-            validation_message=validation_result["message"]
+            validation_message=validation_result["message"],
+            token_usage=token_usage
         )
         
     except Exception as e:
-        logger.error(f"Error generating SQL query: {e}")
+        logger.error(f"Error repairing SQL query: {e}")
         return SQLGenerationResponse(
             sql_query="",
-            explanation=None,
             validation_status="error",
-            validation_message=f"SQL generation failed: {str(e)}"
+            validation_message=f"SQL repair failed: {str(e)}"
         )
 
 
@@ -201,7 +519,8 @@ def execute_sql_via_api(sql_query: str) -> Dict[str, Any]:
         )
         
         if response.status_code == 200:
-            return response.json()
+            with stage("deserialization"):
+                return response.json()
         else:
             return {
                 "result": None,
@@ -221,6 +540,121 @@ def execute_sql_via_api(sql_query: str) -> Dict[str, Any]:
         }
 
 
+def explain_sql_via_api(sql_query: str) -> Dict[str, Any]:
+    """
+    Get the estimated plan of a SQL query using the sql_execution_api.py service.
+    
+    Args:
+        sql_query: SQL query to plan
+        
+    Returns:
+        Plan summary results from the API
+    """
+    try:
+        response = requests.post(
+            f"{SQL_API_BASE_URL}/explain",
+            json={"sql": sql_query},
+            timeout=10
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return {"plan_summary": None, "success": False, "error": f"API error: HTTP {response.status_code}"}
+            
+    except requests.exceptions.RequestException as e:
+        return {"plan_summary": None, "success": False, "error": f"Connection error: {str(e)}"}
+
+
+def submit_sql_job_via_api(sql_query: str) -> Dict[str, Any]:
+    """
+    Queue a SQL query for background execution using the sql_execution_api.py service.
+    
+    Args:
+        sql_query: SQL query to queue
+        
+    Returns:
+        Job information with job_id and status, or an error
+    """
+    try:
+        response = requests.post(
+            f"{SQL_API_BASE_URL}/jobs",
+            json={"sql": sql_query},
+            timeout=10
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return {"error": f"API error: HTTP {response.status_code}"}
+            
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Connection error: {str(e)}"}
+
+
+def get_sql_job_via_api(job_id: str) -> Dict[str, Any]:
+    """
+    Get the status and result of a background SQL job.
+    
+    Args:
+        job_id: Job id returned when the query was queued
+        
+    Returns:
+        Job information with status and, once finished, the execution result
+    """
+    try:
+        response = requests.get(f"{SQL_API_BASE_URL}/jobs/{job_id}", timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return {"error": f"API error: HTTP {response.status_code}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Connection error: {str(e)}"}
+
+
+def execute_sql_with_row_budget(sql_query: str, max_rows: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+    """
+    Execute a SQL query with an automatic LIMIT when it has none.
+    
+    Args:
+        sql_query: SQL query to execute
+        max_rows: Maximum rows to return, defaults to SQL_ROW_BUDGET (0 disables)
+        offset: Number of rows to skip, used for pagination
+        
+    Returns:
+        Execution results from the API plus executed_sql, truncated and row_limit keys
+    """
+    budget = apply_row_budget(sql_query, max_rows, offset)
+    execution_result = execute_sql_via_api(budget.sql_query)
+    execution_result["executed_sql"] = budget.sql_query
+    execution_result["truncated"] = False
+    execution_result["row_limit"] = budget.row_limit
+    
+    # The budget asks for one extra row, which tells us whether rows were left out
+    rows = execution_result.get("result")
+    if budget.applied and execution_result["success"] and isinstance(rows, list) and len(rows) > budget.row_limit:
+        execution_result["result"] = rows[:budget.row_limit]
+        execution_result["rows_affected"] = budget.row_limit
+        execution_result["truncated"] = True
+    
+    return execution_result
+
+
+def fetch_result_page(sql_query: str, page: int = 1, page_size: int = ROW_BUDGET) -> Dict[str, Any]:
+    """
+    Fetch one page of a query result, e.g. to browse past a truncated result.
+    
+    Args:
+        sql_query: Unbounded SQL query (QueryExecutionResponse.sql_query)
+        page: 1-based page number
+        page_size: Rows per page
+        
+    Returns:
+        Execution results for the page; truncated is True when more pages follow
+    """
+    return execute_sql_with_row_budget(sql_query, page_size, offset=(page - 1) * page_size)
+
+
 def check_api_availability() -> bool:
     """
     Check if the SQL execution API is available.
@@ -235,20 +669,42 @@ def check_api_availability() -> bool:
         return False
 
 
-def process_natural_language_query(natural_query: str, include_explanation: bool = False) -> QueryExecutionResponse:
+def process_natural_language_query(natural_query: str, include_explanation: bool = False,
+                                   max_rows: Optional[int] = None,
+                                   on_partial: Optional[Callable[[str], None]] = None) -> QueryExecutionResponse:
     """
     Complete pipeline: Generate SQL from natural language and execute it.
     
     Args:
         natural_query: Natural language query to process
         include_explanation: Whether to include SQL explanation
+        max_rows: Row budget for queries without a LIMIT, defaults to SQL_ROW_BUDGET (0 disables)
+        on_partial: Called with the partial SQL while it is generated
         
     Returns:
-        QueryExecutionResponse with complete results
+        QueryExecutionResponse with complete results, including per-stage timings
     """
+    return _with_timings(_process_natural_language_query, natural_query, include_explanation, max_rows, on_partial)
+
+
+def _with_timings(function: Callable[..., QueryExecutionResponse], *args) -> QueryExecutionResponse:
+    """Run a pipeline function as one tracked request and attach its timings to the response"""
+    with track_request() as timings:
+        response = function(*args)
+    response.timings = timings.as_dict()
+    return response
+
+
+def _process_natural_language_query(natural_query: str, include_explanation: bool,
+                                    max_rows: Optional[int],
+                                    on_partial: Optional[Callable[[str], None]]) -> QueryExecutionResponse:
+    """Pipeline body of process_natural_language_query()"""
+    start_time = time.time()
     
     # Check API availability
-    if not check_api_availability():
+    with stage("health_check"):
+        api_available = check_api_availability()
+    if not api_available:
         return QueryExecutionResponse(
             natural_query=natural_query,
             sql_query="",
@@ -260,7 +716,26 @@ def process_natural_language_query(natural_query: str, include_explanation: bool
         )
     
     # Generate SQL query
-    generation_result = generate_sql_query(natural_query, include_explanation)
+    generation_result = generate_sql_query(natural_query, include_explanation, on_partial)
+    
+    return execute_with_repair(natural_query, generation_result, max_rows, start_time)
+
+
+def execute_with_repair(natural_query: str, generation_result: SQLGenerationResponse,
+                        max_rows: Optional[int] = None, start_time: Optional[float] = None) -> QueryExecutionResponse:
+    """
+    Execute generated SQL, repairing it after query errors, and learn from the outcome.
+    
+    Args:
+        natural_query: Natural language query the SQL answers
+        generation_result: Result of SQL generation
+        max_rows: Row budget for queries without a LIMIT, defaults to SQL_ROW_BUDGET (0 disables)
+        start_time: Time the query was received, the repair deadline counts from here
+        
+    Returns:
+        QueryExecutionResponse with complete results
+    """
+    start_time = start_time or time.time()
     
     if generation_result.validation_status == "error":
         return QueryExecutionResponse(
@@ -273,20 +748,258 @@ def process_natural_language_query(natural_query: str, include_explanation: bool
             execution_time_ms=None
         )
     
+    response = execute_generated_sql(natural_query, generation_result.sql_query, max_rows)
+    response.template_id = generation_result.template_id
+    response.examples_used = generation_result.examples_used
+    repair_stats.record_first_try(response.execution_success)
+    tokens_spent = _total_tokens(generation_result.token_usage)
+    
+    # Feed query errors back to the LLM, within the attempt budget and deadline
+    while (not response.execution_success
+           and is_repairable_error(response.execution_error)
+           and response.repair_attempts < REPAIR_MAX_ATTEMPTS
+           and time.time() - start_time < REPAIR_DEADLINE_SECONDS):
+        attempt = response.repair_attempts + 1
+        logger.info(f"Repair attempt {attempt} after error: {response.execution_error}")
+        
+        remaining = REPAIR_DEADLINE_SECONDS - (time.time() - start_time)
+        repair_result = repair_sql_query(natural_query, response.sql_query, response.execution_error, remaining)
+        tokens_spent += _total_tokens(repair_result.token_usage)
+        if repair_result.validation_status == "error":
+            repair_stats.record_attempt(attempt, False)
+            response.repair_attempts = attempt
+            break
+        
+        response = execute_generated_sql(natural_query, repair_result.sql_query, max_rows)
+        response.repair_attempts = attempt
+        response.examples_used = generation_result.examples_used
+        repair_stats.record_attempt(attempt, response.execution_success)
+    
+    # Template answers need no examples; queued jobs have not run yet; writes are never shown as examples
+    if response.template_id is None:
+        few_shot_stats.record(response.examples_used, response.execution_success, tokens_spent)
+        if response.execution_success and response.job_id is None and is_read_only(response.sql_query):
+            get_example_store().add(natural_query, response.sql_query)
+    
+    return response
+
+
+def _total_tokens(token_usage: Optional[Dict[str, int]]) -> int:
+    """Input plus output tokens of one LLM call"""
+    if not token_usage:
+        return 0
+    return token_usage.get("input_tokens", 0) + token_usage.get("output_tokens", 0)
+
+
+def execute_generated_sql(natural_query: str, sql_query: str, max_rows: Optional[int] = None) -> QueryExecutionResponse:
+    """
+    Run generated SQL through the cost guard and row budget and execute it.
+    
+    Args:
+        natural_query: Natural language query the SQL answers
+        sql_query: SQL query to execute
+        max_rows: Row budget for queries without a LIMIT, defaults to SQL_ROW_BUDGET (0 disables)
+        
+    Returns:
+        QueryExecutionResponse with execution results
+    """
+    plan_summary = None
+    cost_guard_action = None
+    row_limit = ROW_BUDGET if max_rows is None else max_rows
+    
+    # Check the estimated cost before running anything against the database
+    if COST_GUARD_ENABLED and is_explainable(sql_query):
+        with stage("explain"):
+            explain_result = explain_sql_via_api(sql_query)
+        
+        if explain_result["success"]:
+            plan_summary = explain_result["plan_summary"]
+            decision = evaluate_plan(sql_query, plan_summary)
+            cost_guard_action = decision.action
+            
+            if decision.reason:
+                logger.info(f"Cost guard {decision.action}: {decision.reason}")
+            
+            if decision.action == "reject":
+                return QueryExecutionResponse(
+                    natural_query=natural_query,
+                    sql_query=sql_query,
+                    execution_result=None,
+                    execution_success=False,
+                    execution_error=f"Query rejected by cost guard: {decision.reason}",
+                    plan_summary=plan_summary,
+                    cost_guard_action=cost_guard_action
+                )
+            
+            if decision.action == "async":
+                job = submit_sql_job_via_api(sql_query)
+                if "error" in job:
+                    return QueryExecutionResponse(
+                        natural_query=natural_query,
+                        sql_query=sql_query,
+                        execution_result=None,
+                        execution_success=False,
+                        execution_error=f"Could not queue expensive query: {job['error']}",
+                        plan_summary=plan_summary,
+                        cost_guard_action=cost_guard_action
+                    )
+                return QueryExecutionResponse(
+                    natural_query=natural_query,
+                    sql_query=sql_query,
+                    execution_result={
+                        "job_id": job["job_id"],
+                        "status": job["status"],
+                        "message": f"Query queued for background execution: {decision.reason}"
+                    },
+                    execution_success=True,
+                    plan_summary=plan_summary,
+                    cost_guard_action=cost_guard_action,
+                    job_id=job["job_id"]
+                )
+            
+            if decision.action == "limit":
+                row_limit = min(row_limit, decision.row_limit) if row_limit > 0 else decision.row_limit
+        else:
+            # Planning errors surface again (with full detail) from /execute
+            logger.info(f"EXPLAIN failed, executing without cost guard: {explain_result['error']}")
+    
     # Execute SQL query
-    execution_result = execute_sql_via_api(generation_result.sql_query)
+    with stage("execute"):
+        execution_result = execute_sql_with_row_budget(sql_query, row_limit)
+    record_stage("db", execution_result.get("execution_time_ms") or 0.0)
+    
+    estimated_total_rows = None
+    if execution_result["truncated"] and plan_summary:
+        estimated_total_rows = plan_summary.get("plan_rows")
     
     return QueryExecutionResponse(
         natural_query=natural_query,
-        sql_query=generation_result.sql_query,
+        sql_query=sql_query,
         execution_result=execution_result["result"],
         execution_success=execution_result["success"],
         execution_error=execution_result["error"],
         rows_affected=execution_result.get("rows_affected"),
-        execution_time_ms=execution_result.get("execution_time_ms")
+        execution_time_ms=execution_result.get("execution_time_ms"),
+        plan_summary=plan_summary,
+        cost_guard_action=cost_guard_action,
+        executed_sql=execution_result["executed_sql"],
+        truncated=execution_result["truncated"],
+        row_limit=execution_result["row_limit"],
+        estimated_total_rows=estimated_total_rows
     )
 
 
+def _group_related_queries(natural_queries: List[str], group_size: int) -> List[List[str]]:
+    """
+    Split queries into groups of related queries (shared content words).
+    
+    Args:
+        natural_queries: Natural language queries
+        group_size: Maximum queries per group
+        
+    Returns:
+        Groups of queries
+    """
+    remaining = [(natural_query, set(tokenize(natural_query))) for natural_query in natural_queries]
+    groups = []
+    
+    while remaining:
+        seed_query, seed_tokens = remaining.pop(0)
+        group = [seed_query]
+        group_tokens = set(seed_tokens)
+        
+        # Greedily add the queries sharing the most words with the group so far
+        while remaining and len(group) < group_size:
+            best = max(range(len(remaining)), key=lambda i: len(remaining[i][1] & group_tokens))
+            if not remaining[best][1] & group_tokens:
+                break
+            natural_query, tokens = remaining.pop(best)
+            group.append(natural_query)
+            group_tokens |= tokens
+        
+        groups.append(group)
+    
+    return groups
+
+
+def _execute_batch_query(natural_query: str, generation_result: SQLGenerationResponse,
+                         max_rows: Optional[int], start_time: float) -> QueryExecutionResponse:
+    """Execute one query of a batch; its share of the shared LLM call counts towards its tokens"""
+    record_tokens(generation_result.token_usage)
+    return execute_with_repair(natural_query, generation_result, max_rows, start_time)
+
+
+def process_natural_language_batch(natural_queries: List[str], max_rows: Optional[int] = None) -> Iterator[BatchQueryResult]:
+    """
+    Process many natural language queries at once.
+    
+    Identical queries are answered once, template matches skip the LLM,
+    related queries share one LLM call (up to SQL_BATCH_GROUP_SIZE per call)
+    and all generation calls and SQL executions run concurrently, so the
+    batch takes about as long as its slowest query.
+    
+    Args:
+        natural_queries: Natural language queries to process
+        max_rows: Row budget for queries without a LIMIT, defaults to SQL_ROW_BUDGET (0 disables)
+        
+    Yields:
+        BatchQueryResult per distinct query, in order of completion
+    """
+    start_time = time.time()
+    
+    # Identical queries (ignoring case and whitespace) are processed once
+    unique_queries: Dict[str, List[int]] = {}
+    canonical: Dict[str, str] = {}
+    for index, natural_query in enumerate(natural_queries):
+        key = " ".join(natural_query.lower().split())
+        canonical.setdefault(key, natural_query)
+        unique_queries.setdefault(canonical[key], []).append(index)
+    
+    if not check_api_availability():
+        for natural_query, indices in unique_queries.items():
+            yield BatchQueryResult(
+                query_indices=indices,
+                response=QueryExecutionResponse(
+                    natural_query=natural_query,
+                    sql_query="",
+                    execution_result=None,
+                    execution_success=False,
+                    execution_error="SQL execution API is not available. Please start sql_execution_api.py"
+                )
+            )
+        return
+    
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        pending = {}
+        llm_queries = []
+        
+        for natural_query in unique_queries:
+            template_result = match_sql_template(natural_query)
+            if template_result:
+                future = executor.submit(_with_timings, _execute_batch_query, natural_query, template_result, max_rows, start_time)
+                pending[future] = natural_query
+            else:
+                llm_queries.append(natural_query)
+        
+        for group in _group_related_queries(llm_queries, BATCH_GROUP_SIZE):
+            pending[executor.submit(generate_sql_batch, group)] = None
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                natural_query = pending.pop(future)
+                
+                if natural_query is None:
+                    # A generation call finished: execute its queries as soon as possible
+                    for generated_query, generation_result in future.result().items():
+                        execution = executor.submit(
+                            _with_timings, _execute_batch_query, generated_query, generation_result, max_rows, start_time
+                        )
+                        pending[execution] = generated_query
+                else:
+                    yield BatchQueryResult(query_indices=unique_queries[natural_query], response=future.result())
+
+
 def get_database_info() -> Dict[str, Any]:
     """
     Get basic database information via the execution API.
@@ -331,23 +1044,28 @@ def get_table_schema(table_name: str) -> Dict[str, Any]:
 
 
 # Legacy compatibility function
-def process_query(message: str) -> dict:
+def process_query(message: str, on_partial: Optional[Callable[[str], None]] = None) -> dict:
     """
     Legacy compatibility function for existing code.
     
     Args:
         message: Natural language query
+        on_partial: Called with the partial SQL while it is generated
         
     Returns:
-        Dictionary with sql_query, result, and json_result keys for compatibility
+        Dictionary with sql_query, result, and json_result keys for compatibility,
+        plus truncated and estimated_total_rows for row budget aware callers
     """
-    result = process_natural_language_query(message)
+    result = process_natural_language_query(message, on_partial=on_partial)
     
     # Format for legacy compatibility
     return {
         "sql_query": result.sql_query,
         "result": result.execution_result if result.execution_success else f"Error: {result.execution_error}",
-        "json_result": result.execution_result if result.execution_success else None
+        "json_result": result.execution_result if result.execution_success else None,
+        "truncated": result.truncated,
+        "row_limit": result.row_limit,
+        "estimated_total_rows": result.estimated_total_rows
     }
 
 
@@ -379,3 +1097,12 @@ if __name__ == "__main__":
     
     if result.execution_error:
         print(f"Error: {result.execution_error}")
+    
+    print(f"Token Usage: {token_usage_stats.summary()}")
+    print(f"Template Router: {get_template_router().stats()}")
+    print(f"SQL Repair: {repair_stats.summary()}")
+    print(f"Few-shot Examples: {few_shot_stats.summary()}")
+    if SPECULATIVE_K > 1:
+        print(f"Speculative Generation: {speculative_stats.summary()}")
+    print(f"Timings: {result.timings}")
+    print(pipeline_stats.format_table())
@@ -0,0 +1,215 @@
+"""
+Conversation Store - Compact multi-turn history per conversation thread
+
+The LangGraph workflows start every question from an empty state, so a
+follow-up ("and which of them rented the most?") has no context. Keeping the
+full graph state between turns is not an option either: it holds the agent
+tool transcripts and grows with every turn.
+
+Conversations are kept per thread_id in a local SQLite file, compacted to
+what a follow-up needs: the question, the SQL that answered it and a short
+summary of the result. The last few turns are placed in front of the next
+question as a single message, so the prompt stays small however long the
+conversation gets, and a thread can be resumed after a restart.
+
+Configuration:
+- SQL_CONVERSATION_DB: SQLite file of the conversations (default conversations.sqlite3)
+- SQL_CONVERSATION_MAX_TURNS: Previous turns given to a follow-up (default 5)
+- SQL_CONVERSATION_RESULT_CHARS: Length of the stored result summary (default 300)
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from langchain_core.messages import HumanMessage
+
+
+CONVERSATION_DB = os.getenv(
+    "SQL_CONVERSATION_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.sqlite3")
+)
+CONVERSATION_MAX_TURNS = int(os.getenv("SQL_CONVERSATION_MAX_TURNS", "5"))
+CONVERSATION_RESULT_CHARS = int(os.getenv("SQL_CONVERSATION_RESULT_CHARS", "300"))
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversation_turn (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL,
+        question TEXT NOT NULL,
+        sql_query TEXT NOT NULL,
+        result_summary TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS conversation_turn_thread ON conversation_turn (thread_id, id);
+"""
+
+
+class ConversationTurn(BaseModel):
+    """One answered question of a conversation, as kept for follow-ups"""
+    question: str = Field(description="The user's question")
+    sql_query: str = Field(description="SQL that answered it")
+    result_summary: str = Field(description="Start of the formatted result")
+
+
+def summarize_result_text(result: str, max_chars: int = CONVERSATION_RESULT_CHARS) -> str:
+    """Shorten a formatted result to the part worth keeping for follow-ups"""
+    result = (result or "").strip()
+    if len(result) <= max_chars:
+        return result
+    return result[:max_chars].rsplit("\n", 1)[0] + "\n..."
+
+
+class ConversationStore:
+    """SQLite-backed compact conversation history, safe to share between threads"""
+
+    def __init__(self, path: str = CONVERSATION_DB):
+        """
+        Args:
+            path: SQLite file, ":memory:" keeps conversations for the process only
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory_connection = None
+        if path == ":memory:":
+            self._memory_connection = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._connection() as connection:
+            if path != ":memory:":
+                # Readers in other processes (API workers) do not block writers
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Connection for one operation, committed when the block succeeds"""
+        with self._lock:
+            if self._memory_connection is not None:
+                with self._memory_connection:
+                    yield self._memory_connection
+                return
+            connection = sqlite3.connect(self.path, timeout=10)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                connection.close()
+
+    def append_turn(self, thread_id: str, question: str, sql_query: str, result: str) -> ConversationTurn:
+        """
+        Store an answered question.
+
+        Args:
+            thread_id: Conversation the question belongs to
+            question: The user's question
+            sql_query: SQL that answered it
+            result: Formatted result, compacted before it is stored
+
+        Returns:
+            The stored turn
+        """
+        turn = ConversationTurn(
+            question=question,
+            sql_query=sql_query.replace("```sql", "").replace("```", "").strip(),
+            result_summary=summarize_result_text(result),
+        )
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO conversation_turn (thread_id, question, sql_query, result_summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (thread_id, turn.question, turn.sql_query, turn.result_summary, time.time())
+            )
+        return turn
+
+    def get_history(self, thread_id: str, max_turns: int = CONVERSATION_MAX_TURNS) -> List[ConversationTurn]:
+        """
+        Most recent turns of a conversation, oldest first.
+
+        Args:
+            thread_id: Conversation to load
+            max_turns: Number of turns to return
+
+        Returns:
+            List of ConversationTurn
+        """
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT question, sql_query, result_summary FROM conversation_turn "
+                "WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+                (thread_id, max_turns)
+            ).fetchall()
+        return [
+            ConversationTurn(question=question, sql_query=sql_query, result_summary=summary)
+            for question, sql_query, summary in reversed(rows)
+        ]
+
+    def clear(self, thread_id: str) -> None:
+        """Forget a conversation"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM conversation_turn WHERE thread_id = ?", (thread_id,))
+
+
+def history_message(history: List[ConversationTurn]) -> Optional["HumanMessage"]:
+    """
+    Compact context message for a follow-up question.
+
+    Args:
+        history: Previous turns, oldest first
+
+    Returns:
+        One message listing the previous questions, SQL and results, or None without history
+    """
+    from langchain_core.messages import HumanMessage
+
+    if not history:
+        return None
+    lines = ["Earlier in this conversation (use it to resolve references in the new question):"]
+    for number, turn in enumerate(history, 1):
+        lines.append(f"{number}. Question: {turn.question}")
+        lines.append(f"   SQL: {turn.sql_query}")
+        lines.append(f"   Result: {turn.result_summary}")
+    return HumanMessage(content="\n".join(lines), name="conversation")
+
+
+# Global store, created on first use so processes without conversations never open the file
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """The process-wide conversation store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore()
+        return _store
+
+
+def conversation_inputs(message: str, thread_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Graph inputs for a question, preceded by the compact history of its thread.
+
+    Args:
+        message: The user's question
+        thread_id: Conversation the question belongs to, None for a standalone question
+
+    Returns:
+        Inputs for graph.stream()
+    """
+    messages: List[Any] = []
+    if thread_id:
+        context = history_message(get_conversation_store().get_history(thread_id))
+        if context is not None:
+            messages.append(context)
+    messages.append(("user", message))
+    return {"messages": messages}
+
+
+def record_turn(thread_id: Optional[str], message: str, sql_query: str, result: str) -> None:
+    """Store an answered question in its thread (no-op without a thread_id or SQL)"""
+    if thread_id and sql_query:
+        get_conversation_store().append_turn(thread_id, message, sql_query, result)
@@ -0,0 +1,236 @@
+"""
+DDL Snapshot - On-disk DDL cache with catalog fingerprint revalidation
+
+Extracting the DDL runs many catalog queries, and every worker process of
+the API and every Streamlit process repeated it at import time. The snapshot
+keeps the extracted DDL on disk together with a fingerprint of the catalog:
+
+- startup: the snapshot is loaded from disk; the DDL is only extracted when
+  there is no snapshot yet (or it belongs to another database)
+- revalidation: a background thread computes the fingerprint (a single
+  catalog query) and re-extracts only when it differs, then notifies the
+  agents so new prompts use the new DDL
+
+The fingerprint covers everything the DDL is built from: columns (order,
+type, nullability, default), constraints and indexes of the public schema.
+
+Configuration:
+- SQL_DDL_SNAPSHOT_ENABLED: Use the snapshot (default true); when disabled
+  the DDL is extracted at every start, as before
+- SQL_DDL_SNAPSHOT_PATH: Snapshot file (default ddl_snapshot.json)
+- SQL_DDL_SNAPSHOT_REVALIDATE: Revalidate a loaded snapshot in the
+  background (default true)
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, List, Optional
+import psycopg2
+from extract_ddl import DDL_DATABASE_URL, extract_ddl_from_database
+
+logger = logging.getLogger(__name__)
+
+
+DDL_SNAPSHOT_ENABLED = os.getenv("SQL_DDL_SNAPSHOT_ENABLED", "true").lower() == "true"
+DDL_SNAPSHOT_PATH = os.getenv(
+    "SQL_DDL_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ddl_snapshot.json")
+)
+DDL_SNAPSHOT_REVALIDATE = os.getenv("SQL_DDL_SNAPSHOT_REVALIDATE", "true").lower() == "true"
+
+_EXTRACTION_ERROR_PREFIX = "Error extracting DDL"
+
+# One row: a hash over every catalog entry the extracted DDL depends on
+CATALOG_FINGERPRINT_SQL = """
+    SELECT md5(coalesce(string_agg(item, E'\\n' ORDER BY item), ''))
+    FROM (
+        SELECT format('%s.%s %s %s %s %s', c.relname, a.attnum, a.attname,
+                      format_type(a.atttypid, a.atttypmod), a.attnotnull,
+                      pg_get_expr(d.adbin, d.adrelid)) AS item
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+        AND a.attnum > 0 AND NOT a.attisdropped
+        UNION ALL
+        SELECT format('%s %s %s', conrelid::regclass, conname, pg_get_constraintdef(oid))
+        FROM pg_constraint
+        WHERE connamespace = 'public'::regnamespace
+        UNION ALL
+        SELECT indexdef FROM pg_indexes WHERE schemaname = 'public'
+    ) catalog;
+"""
+
+
+def catalog_fingerprint(database_url: str = DDL_DATABASE_URL) -> str:
+    """
+    Fingerprint the schema of the database.
+
+    Args:
+        database_url: PostgreSQL connection URL
+
+    Returns:
+        MD5 hex digest that changes whenever the extracted DDL would change
+    """
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(CATALOG_FINGERPRINT_SQL)
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _database_id(database_url: str) -> str:
+    """Identifies the database of a snapshot without storing credentials"""
+    return hashlib.sha256(database_url.encode("utf-8")).hexdigest()[:16]
+
+
+class DDLSnapshot:
+    """DDL of a database, persisted with its catalog fingerprint"""
+
+    def __init__(self, path: Optional[str] = DDL_SNAPSHOT_PATH, database_url: str = DDL_DATABASE_URL,
+                 extract_fn: Callable[[str], str] = extract_ddl_from_database,
+                 fingerprint_fn: Callable[[str], str] = catalog_fingerprint):
+        """
+        Args:
+            path: Snapshot file, None disables persistence
+            database_url: Database the DDL is extracted from
+            extract_fn: Extracts the DDL for a database URL
+            fingerprint_fn: Fingerprints the catalog for a database URL
+        """
+        self.path = path
+        self.database_url = database_url
+        self.extract_fn = extract_fn
+        self.fingerprint_fn = fingerprint_fn
+
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self.ddl: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self.extracted_at: Optional[float] = None
+        self._validated = False
+
+    def load(self) -> Optional[str]:
+        """
+        Load the snapshot file.
+
+        Returns:
+            The DDL, or None if there is no usable snapshot for this database
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable DDL snapshot {self.path}: {e}")
+            return None
+        if data.get("database") != _database_id(self.database_url) or not data.get("ddl"):
+            return None
+
+        with self._lock:
+            self.ddl = data["ddl"]
+            self.fingerprint = data.get("fingerprint")
+            self.extracted_at = data.get("extracted_at")
+        return self.ddl
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {
+            "database": _database_id(self.database_url),
+            "fingerprint": self.fingerprint,
+            "extracted_at": self.extracted_at,
+            "ddl": self.ddl,
+        }
+        # Several worker processes may write at once; each writes its own temp file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self) -> bool:
+        """
+        Compare the catalog with the snapshot and re-extract the DDL if it changed.
+
+        Returns:
+            True if a new DDL was extracted
+        """
+        try:
+            fingerprint = self.fingerprint_fn(self.database_url)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint the catalog, keeping the current DDL: {e}")
+            return False
+
+        if self.ddl is not None and fingerprint == self.fingerprint:
+            self._validated = True
+            return False
+
+        # The fingerprint is taken before extracting, so a change made meanwhile is caught next time
+        ddl = self.extract_fn(self.database_url)
+        if ddl.startswith(_EXTRACTION_ERROR_PREFIX):
+            logger.warning(f"DDL snapshot not updated: {ddl}")
+            return False
+
+        with self._lock:
+            self.ddl = ddl
+            self.fingerprint = fingerprint
+            self.extracted_at = time.time()
+            self._validated = True
+            self._save()
+            listeners = list(self._listeners)
+
+        logger.info(f"DDL extracted, catalog fingerprint {fingerprint}")
+        for listener in listeners:
+            listener(ddl)
+        return True
+
+    def get_ddl(self) -> str:
+        """
+        DDL for prompts: the snapshot if there is one, otherwise extracted now.
+
+        Returns:
+            The DDL (or the extraction error message, as extract_ddl_from_database returns it)
+        """
+        if DDL_SNAPSHOT_ENABLED and self.load() is not None:
+            return self.ddl
+
+        ddl = self.extract_fn(self.database_url)
+        if ddl.startswith(_EXTRACTION_ERROR_PREFIX):
+            return ddl
+
+        if DDL_SNAPSHOT_ENABLED:
+            try:
+                fingerprint = self.fingerprint_fn(self.database_url)
+            except Exception as e:
+                logger.warning(f"Could not fingerprint the catalog, DDL snapshot not saved: {e}")
+                return ddl
+            with self._lock:
+                self.ddl, self.fingerprint, self.extracted_at = ddl, fingerprint, time.time()
+                self._validated = True
+                self._save()
+        return ddl
+
+    def on_change(self, listener: Callable[[str], None]) -> None:
+        """Call listener with the new DDL whenever revalidation re-extracts it"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def revalidate_in_background(self) -> Optional[threading.Thread]:
+        """
+        Start revalidating a snapshot loaded from disk.
+
+        Returns:
+            The revalidation thread, or None if there is nothing to revalidate
+        """
+        if not DDL_SNAPSHOT_ENABLED or not DDL_SNAPSHOT_REVALIDATE or self._validated or self.ddl is None:
+            return None
+        thread = threading.Thread(target=self.refresh, name="ddl-snapshot-revalidate", daemon=True)
+        thread.start()
+        return thread
@@ -9,7 +9,7 @@ import pandas as pd
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the process_query function from ai_sql_agent
-from ai_sql_agent_v2 import process_query
+from ai_sql_agent_v2 import process_query, fetch_result_page
 
 def format_result_as_table(result):
     """
@@ -91,11 +91,37 @@ with tabs[3]:
     st.image(erd_diagram, caption='ERD Diagram', use_container_width=True)
 
 if user_input:
-    response = process_query(user_input)
+    with tabs[2]:
+        sql_placeholder = st.empty()
+    
+    # Keep the response across reruns so paging does not regenerate the SQL
+    if st.session_state.get('last_query') != user_input:
+        st.session_state['last_query'] = user_input
+        # Show the SQL while it is being generated
+        st.session_state['last_response'] = process_query(
+            user_input,
+            on_partial=lambda partial_sql: sql_placeholder.code(partial_sql, language='sql')
+        )
+    response = st.session_state['last_response']
     sql_statement = response['sql_query']
     result = response['result']
     json_result = response['json_result']
     
+    if response.get('truncated'):
+        row_limit = response['row_limit']
+        estimate = response.get('estimated_total_rows')
+        total_text = f"about {estimate}" if estimate else "more"
+        st.info(f"Showing the first {row_limit} rows of {total_text}. Pick a page to see the rest.")
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+        if page > 1:
+            page_result = fetch_result_page(sql_statement, page=page, page_size=row_limit)
+            if page_result['success']:
+                result = page_result['result']
+                json_result = page_result['result']
+            else:
+                result = f"Error: {page_result['error']}"
+                json_result = None
+    
     with tabs[0]:
         # Format and display result as a table
         formatted_result = format_result_as_table(result)
@@ -110,5 +136,4 @@ if user_input:
         else:
             st.write("No JSON result available")
     
-    with tabs[2]:
-        st.code(sql_statement, language='sql')
+    sql_placeholder.code(sql_statement, language='sql')
@@ -0,0 +1,251 @@
+"""
+Direct Execution - Deterministic query_execute node without LLM round trips
+
+The query_execute node of the LangGraph pipelines used a ReAct agent whose
+only job was to call the SQL execution tool and restate its result, which
+costs at least two LLM calls per question. Direct execution runs the checked
+SQL itself and builds the answer with a local formatter:
+
+- a single value is answered as "column: value"
+- other results become a small text table (header plus up to
+  SQL_RESULT_MAX_ROWS rows, with a count of the rows left out)
+- errors and empty results get a fixed sentence
+
+The raw result keeps the format of SQLDatabase.run(), so json_result and
+everything built on it is unchanged.
+
+An LLM summary of the result is still available, but as a separate optional
+step: start_summary() runs it on a background event loop and returns a
+future that callers can wait on with a timeout or cancel, so the answer
+itself never waits for it. Other LLM calls that need a deadline (repairs,
+speculative generation) use the same long-lived loop via run_in_background(),
+so async clients stay bound to one loop.
+
+Configuration:
+- SQL_EXECUTE_MODE: "direct" (default) or "agent" (LLM executes and
+  restates the result, as before)
+- SQL_RESULT_MAX_ROWS: Rows shown in the formatted answer (default 20)
+- SQL_RESULT_SUMMARY_TIMEOUT: Seconds the API waits for an optional
+  summary before cancelling it (default 10)
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, List, Optional, Sequence, Tuple
+from pydantic import BaseModel, Field
+
+
+SQL_EXECUTE_MODE = os.getenv("SQL_EXECUTE_MODE", "direct").lower()
+RESULT_MAX_ROWS = int(os.getenv("SQL_RESULT_MAX_ROWS", "20"))
+RESULT_SUMMARY_TIMEOUT = float(os.getenv("SQL_RESULT_SUMMARY_TIMEOUT", "10"))
+
+_MAX_CELL_WIDTH = 40
+# Value length of the raw result, the default max_string_length of SQLDatabase
+_RAW_MAX_STRING_LENGTH = 300
+
+RESULT_SUMMARY_PROMPT = """You are a helpful data analyst.
+Answer the user's question in one or two sentences using only the query result below.
+
+Question: {question}
+
+SQL query:
+{sql_query}
+
+Result:
+{answer}
+"""
+
+
+class DirectExecutionResult(BaseModel):
+    """Outcome of running a query without the LLM"""
+    sql_query: str = Field(description="The SQL query that was executed")
+    raw_result: str = Field(description="Result in the SQLDatabase.run() format, or the error message")
+    columns: List[str] = Field(default_factory=list, description="Column names of the result")
+    rows: List[Tuple[Any, ...]] = Field(default_factory=list, description="Result rows")
+    error: Optional[str] = Field(default=None, description="Database error, if the query failed")
+    answer: str = Field(description="Human readable answer built from the result")
+
+
+def clean_sql(query: str) -> str:
+    """Remove markdown code fences around a generated query"""
+    return query.replace("```sql", "").replace("```", "").strip()
+
+
+def _format_cell(value: Any) -> str:
+    text = "NULL" if value is None else str(value)
+    return text if len(text) <= _MAX_CELL_WIDTH else text[:_MAX_CELL_WIDTH - 3] + "..."
+
+
+def format_result(columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                  error: Optional[str] = None, max_rows: int = RESULT_MAX_ROWS) -> str:
+    """
+    Build a human readable answer from a query result.
+
+    Args:
+        columns: Column names
+        rows: Result rows
+        error: Database error message, if the query failed
+        max_rows: Rows shown before the rest is summarized as a count
+
+    Returns:
+        Answer text
+    """
+    if error:
+        return f"The query could not be executed. {error}"
+    if not rows:
+        return "The query returned no rows."
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{columns[0]}: {_format_cell(rows[0][0])}"
+
+    shown = [[_format_cell(value) for value in row] for row in rows[:max_rows]]
+    widths = [max([len(column)] + [len(row[i]) for row in shown]) for i, column in enumerate(columns)]
+
+    def line(cells):
+        return " | ".join(cell.ljust(width) for cell, width in zip(cells, widths)).rstrip()
+
+    row_word = "row" if len(rows) == 1 else "rows"
+    lines = [f"The query returned {len(rows)} {row_word}:", line(columns), "-+-".join("-" * width for width in widths)]
+    lines.extend(line(row) for row in shown)
+    if len(rows) > max_rows:
+        lines.append(f"... and {len(rows) - max_rows} more rows")
+    return "\n".join(lines)
+
+
+def fetch_result(db: Any, sql_query: str) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """
+    Run a query on the engine of a SQLDatabase and return its columns and rows.
+
+    SQLDatabase.run() only returns the result as a string, so the query runs
+    on the SQLDatabase's engine the way run() does: in one transaction that
+    is committed at the end. This is the only place that relies on the
+    engine attribute of SQLDatabase.
+
+    Args:
+        db: SQLDatabase the pipeline uses
+        sql_query: SQL query
+
+    Returns:
+        Column names and rows, both empty for a statement without a result
+
+    Raises:
+        SQLAlchemyError: The database rejected the query
+    """
+    from sqlalchemy import text
+
+    with db._engine.begin() as connection:
+        cursor = connection.execute(text(sql_query))
+        if not cursor.returns_rows:
+            return [], []
+        return list(cursor.keys()), [tuple(row) for row in cursor.fetchall()]
+
+
+def execute_query(db: Any, query: str) -> DirectExecutionResult:
+    """
+    Run a query and format its result locally.
+
+    Args:
+        db: SQLDatabase the pipeline uses
+        query: SQL query, possibly wrapped in code fences
+
+    Returns:
+        DirectExecutionResult with the raw result and the answer
+    """
+    from sqlalchemy.exc import SQLAlchemyError
+    from langchain_community.utilities.sql_database import truncate_word
+
+    sql_query = clean_sql(query)
+    try:
+        columns, rows = fetch_result(db, sql_query)
+    except SQLAlchemyError as e:
+        # Same message SQLDatabase.run_no_throw() returns
+        error = f"Error: {e}"
+        return DirectExecutionResult(sql_query=sql_query, raw_result=error, error=error,
+                                     answer=format_result([], [], error=error))
+
+    truncated = [tuple(truncate_word(value, length=_RAW_MAX_STRING_LENGTH) for value in row) for row in rows]
+    return DirectExecutionResult(
+        sql_query=sql_query,
+        raw_result=str(truncated) if truncated else "",
+        columns=columns,
+        rows=rows,
+        answer=format_result(columns, rows),
+    )
+
+
+async def summarize_result(llm: Any, question: str, sql_query: str, answer: str) -> str:
+    """
+    Ask the LLM for a short natural language summary of a result.
+
+    Args:
+        llm: Chat model
+        question: The user's question
+        sql_query: The executed query
+        answer: The formatted answer from format_result()
+
+    Returns:
+        Summary text
+    """
+    from langchain_core.messages import HumanMessage
+
+    prompt = RESULT_SUMMARY_PROMPT.format(question=question, sql_query=sql_query, answer=answer)
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
+    return response.content
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="llm-background", daemon=True).start()
+        return _background_loop
+
+
+def run_in_background(coroutine: Any) -> Future:
+    """
+    Run a coroutine on the process-wide background event loop.
+
+    Returns:
+        Future with the result; cancelling it cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_background_loop())
+
+
+def start_summary(llm: Any, question: str, sql_query: str, answer: str) -> Future:
+    """
+    Start summarize_result() in the background.
+
+    Args:
+        llm: Chat model
+        question: The user's question
+        sql_query: The executed query
+        answer: The formatted answer from format_result()
+
+    Returns:
+        Future with the summary; cancelling it cancels the LLM call
+    """
+    return run_in_background(summarize_result(llm, question, sql_query, answer))
+
+
+async def await_summary(future: Future, timeout: float = RESULT_SUMMARY_TIMEOUT) -> Optional[str]:
+    """
+    Wait for a summary from an async caller, cancelling it after the timeout.
+
+    Args:
+        future: Future returned by start_summary()
+        timeout: Seconds to wait
+
+    Returns:
+        The summary, or None if it failed or timed out
+    """
+    # On timeout wait_for cancels the wrapped future, which cancels the summary task
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except Exception:
+        return None
@@ -0,0 +1,200 @@
+"""
+Engine Resources - Process-wide database, LLM, tool and DDL instances
+
+Every pipeline module used to build its own chat model, SQLDatabase (which
+reflects the schema and opens a connection pool), SQL toolkit and DDL
+snapshot at import time. A process importing two of them - the SQL API
+imports the DDL agent and the v2 agent, the benchmark imports all of them -
+held duplicate engines, LLM clients and DDL revalidation threads.
+
+The resources are now created on first use and shared by everything that
+asks for the same database URL or model (their libraries are imported then
+too, so importing an agent stays cheap):
+- get_database(): one SQLDatabase (and SQLAlchemy pool) per URL
+- get_llm(): one chat model per model name and default backend
+- get_sql_tools() / get_exec_tool(): list/schema tools and the execution
+  tool per database, so the compiled sub-agents of agent_cache.py are
+  shared by all engines too
+- get_ddl_snapshot() / get_database_ddl(): one DDL snapshot, loaded once and
+  revalidated in the background
+
+Configuration:
+- DATABASE_URL: Database used when no URL is given
+- LLM_BACKEND: Backend of the chat models (see llm_factory.py)
+"""
+
+import os
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from llm_factory import get_backend, get_chat_model
+from result_capture import record_raw_result
+
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
+    from ddl_snapshot import DDLSnapshot
+
+logger = logging.getLogger(__name__)
+
+_DDL_NOT_AVAILABLE = "DDL not available"
+
+_databases_lock = threading.Lock()
+_databases: Dict[str, "SQLDatabase"] = {}
+
+_llms_lock = threading.Lock()
+_llms: Dict[Tuple, Any] = {}
+
+_tools_lock = threading.Lock()
+# id(db) -> (db, list tables tool, schema tool, execution tool); the db is kept so its id is not reused
+_tools: Dict[int, Tuple[Any, Any, Any, Any]] = {}
+
+_ddl_lock = threading.Lock()
+_ddl_snapshot: Optional["DDLSnapshot"] = None
+_database_ddl = _DDL_NOT_AVAILABLE
+
+
+def get_database(url: Optional[str] = None) -> "SQLDatabase":
+    """
+    SQLDatabase for a URL, created (and the schema reflected) on first use.
+
+    Args:
+        url: Database URL, DATABASE_URL when not given
+
+    Returns:
+        The shared SQLDatabase of the URL
+    """
+    url = url or os.getenv("DATABASE_URL")
+    if not url:
+        raise ValueError("No database URL given and DATABASE_URL is not set")
+
+    with _databases_lock:
+        db = _databases.get(url)
+        if db is None:
+            from langchain_community.utilities import SQLDatabase
+            db = SQLDatabase.from_uri(url)
+            _databases[url] = db
+        return db
+
+
+def get_llm(model: str = "gemini-2.5-flash", default: Optional[Callable[[], Any]] = None) -> Any:
+    """
+    Chat model for a model name and default backend, created on first use.
+
+    Args:
+        model: Gemini model name
+        default: Factory of the agent's own model (see get_chat_model())
+
+    Returns:
+        The shared chat model
+    """
+    # Per backend, so a model created before LLM_BACKEND was changed is not reused
+    key = (model, default, get_backend())
+    with _llms_lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = get_chat_model(model, default=default)
+            _llms[key] = llm
+        return llm
+
+
+def _build_tools(db: "SQLDatabase") -> Tuple[Any, Any, Any, Any]:
+    from langchain_core.tools import tool
+    from langchain_community.tools.sql_database.tool import InfoSQLDatabaseTool, ListSQLDatabaseTool
+
+    @tool
+    def db_exec_tool_with_capture(query: str) -> str:
+        """
+        Execute a SQL query against the database and return the result.
+        Also captures the raw result for JSON formatting.
+        If the query is invalid or returns no result, an error message will be returned.
+        In case of an error, the user is advised to rewrite the query and try again.
+        """
+        # Remove ```sql and ``` if present
+        query = query.replace("```sql", "").replace("```", "").strip()
+
+        result = db.run_no_throw(query)
+
+        # Store the raw result for JSON formatting
+        record_raw_result(result)
+
+        return {"result": result}
+
+    # Only the tools the pipelines use: SQLDatabaseToolkit would also build a query checker chain per LLM
+    list_tables_tool = ListSQLDatabaseTool(db=db)
+    get_schema_tool = InfoSQLDatabaseTool(db=db, description=(
+        "Input to this tool is a comma-separated list of tables, output is the "
+        "schema and sample rows for those tables. "
+        f"Be sure that the tables actually exist by calling {list_tables_tool.name} first! "
+        "Example Input: table1, table2, table3"
+    ))
+    return db, list_tables_tool, get_schema_tool, db_exec_tool_with_capture
+
+
+def _tools_for(db: "SQLDatabase") -> Tuple[Any, Any, Any, Any]:
+    with _tools_lock:
+        entry = _tools.get(id(db))
+        if entry is None:
+            entry = _build_tools(db)
+            _tools[id(db)] = entry
+        return entry
+
+
+def get_sql_tools(db: "SQLDatabase") -> Tuple[Any, Any]:
+    """
+    The sql_db_list_tables and sql_db_schema tools of a database.
+
+    Returns:
+        (list tables tool, schema tool), shared by every engine using the database
+    """
+    _, list_tables_tool, get_schema_tool, _ = _tools_for(db)
+    return list_tables_tool, get_schema_tool
+
+
+def get_exec_tool(db: "SQLDatabase") -> Any:
+    """The db_exec_tool_with_capture tool of a database (records the raw result of the request)"""
+    return _tools_for(db)[3]
+
+
+def _update_ddl(ddl: str) -> None:
+    """Use a DDL re-extracted after a schema change for new queries"""
+    global _database_ddl
+    _database_ddl = ddl
+
+
+def get_ddl_snapshot() -> "DDLSnapshot":
+    """
+    The process-wide DDL snapshot, loaded (or extracted) on first use.
+
+    Revalidation against the catalog starts in the background; agents that
+    keep their own copy of the DDL can subscribe with on_change().
+    """
+    global _ddl_snapshot, _database_ddl
+    with _ddl_lock:
+        if _ddl_snapshot is None:
+            from ddl_snapshot import DDLSnapshot
+            snapshot = DDLSnapshot()
+            try:
+                _database_ddl = snapshot.get_ddl()
+                logger.info("DDL loaded successfully for enhanced query generation")
+            except Exception as e:
+                logger.warning(f"Could not extract DDL: {e}")
+            snapshot.on_change(_update_ddl)
+            snapshot.revalidate_in_background()
+            _ddl_snapshot = snapshot
+        return _ddl_snapshot
+
+
+def get_database_ddl() -> str:
+    """Current DDL for prompts ("DDL not available" if it could not be extracted)"""
+    get_ddl_snapshot()
+    return _database_ddl
+
+
+def get_resource_stats() -> Dict[str, Any]:
+    """Number of shared resources created in this process"""
+    return {
+        "databases": len(_databases),
+        "llms": len(_llms),
+        "tool_sets": len(_tools),
+        "ddl_loaded": _ddl_snapshot is not None,
+    }
@@ -0,0 +1,363 @@
+"""
+Example Store - Few-shot examples for SQL generation
+
+Keeps (question, SQL) pairs whose SQL executed successfully and retrieves
+the ones closest to a new question, so they can be shown to the LLM as
+worked examples. The store is seeded with the curated queries from the API
+/examples endpoint and grows from successful pipeline runs.
+
+- Persistence: a JSON file, rewritten atomically at most once per flush
+  interval (and at exit), including the usage fields used for eviction
+- Retrieval: TF-IDF weighted bag of words with cosine similarity over an
+  inverted index, no external services or models; rebuilt on the first
+  search after a change, so a burst of additions costs one rebuild
+- Size cap: least recently used learned examples are evicted first, seed
+  examples are never evicted
+
+Accuracy per token spent is tracked with and without examples in the
+prompt (FewShotStats) so the benefit of the examples can be measured.
+
+Configuration:
+- SQL_FEW_SHOT_ENABLED: Inject examples into the prompt (default true)
+- SQL_FEW_SHOT_K: Number of examples per question (default 3)
+- SQL_FEW_SHOT_MIN_SIMILARITY: Minimum cosine similarity of an example (default 0.2)
+- SQL_EXAMPLE_STORE_PATH: JSON file of the store (default sql_examples.json in
+  the user cache directory, $XDG_CACHE_HOME or ~/.cache); empty keeps the store
+  in memory. Read when the store is created.
+- SQL_EXAMPLE_STORE_MAX_SIZE: Maximum number of examples kept (default 500)
+- SQL_EXAMPLE_STORE_FLUSH_SECONDS: Delay before changes are written to the file (default 5)
+"""
+
+import os
+import re
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+FEW_SHOT_ENABLED = os.getenv("SQL_FEW_SHOT_ENABLED", "true").lower() == "true"
+FEW_SHOT_K = int(os.getenv("SQL_FEW_SHOT_K", "3"))
+FEW_SHOT_MIN_SIMILARITY = float(os.getenv("SQL_FEW_SHOT_MIN_SIMILARITY", "0.2"))
+EXAMPLE_STORE_MAX_SIZE = int(os.getenv("SQL_EXAMPLE_STORE_MAX_SIZE", "500"))
+EXAMPLE_STORE_FLUSH_SECONDS = float(os.getenv("SQL_EXAMPLE_STORE_FLUSH_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "with", "and", "or", "is", "are", "was", "were",
+    "me", "show", "list", "give", "find", "get", "what", "which", "who", "how", "do", "does", "there",
+    "all", "each", "that", "have", "has", "been", "from", "please", "can", "you", "i", "it", "this",
+}
+
+# Curated pairs from the /examples endpoint and the complex query tests
+SEED_EXAMPLES = [
+    ("How many actors are in the database?", "SELECT COUNT(*) FROM actor;"),
+    (
+        "What are the top 5 most popular film categories?",
+        "SELECT name, COUNT(*) as film_count FROM category c JOIN film_category fc ON c.category_id = fc.category_id "
+        "GROUP BY name ORDER BY film_count DESC LIMIT 5;"
+    ),
+    (
+        "Show me all customers from the United States",
+        "SELECT first_name, last_name, email FROM customer WHERE address_id IN (SELECT address_id FROM address a "
+        "JOIN city ci ON a.city_id = ci.city_id JOIN country co ON ci.country_id = co.country_id "
+        "WHERE co.country = 'United States');"
+    ),
+    (
+        "Which actors have appeared in action movies?",
+        "SELECT DISTINCT a.first_name, a.last_name FROM actor a JOIN film_actor fa ON a.actor_id = fa.actor_id "
+        "JOIN film_category fc ON fa.film_id = fc.film_id JOIN category c ON fc.category_id = c.category_id "
+        "WHERE c.name = 'Action' ORDER BY a.last_name, a.first_name;"
+    ),
+    (
+        "Show me customers who have rented comedy films",
+        "SELECT DISTINCT cu.first_name, cu.last_name FROM customer cu JOIN rental r ON cu.customer_id = r.customer_id "
+        "JOIN inventory i ON r.inventory_id = i.inventory_id JOIN film_category fc ON i.film_id = fc.film_id "
+        "JOIN category c ON fc.category_id = c.category_id WHERE c.name = 'Comedy' ORDER BY cu.last_name, cu.first_name;"
+    ),
+    (
+        "What is the average rental price for each film category?",
+        "SELECT c.name, ROUND(AVG(f.rental_rate), 2) AS avg_rental_rate FROM category c "
+        "JOIN film_category fc ON c.category_id = fc.category_id JOIN film f ON fc.film_id = f.film_id "
+        "GROUP BY c.name ORDER BY avg_rental_rate DESC;"
+    ),
+    (
+        "Which store has more inventory?",
+        "SELECT store_id, COUNT(*) AS inventory_count FROM inventory GROUP BY store_id ORDER BY inventory_count DESC;"
+    ),
+]
+
+
+def example_store_path() -> Optional[str]:
+    """File of the default store, None to keep it in memory"""
+    cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.getenv("SQL_EXAMPLE_STORE_PATH", os.path.join(cache_dir, "dvdrental-sql-agent", "sql_examples.json"))
+    return path or None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case content words with a naive plural strip"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class SQLExample(BaseModel):
+    """A question with SQL that executed successfully"""
+    question: str = Field(description="Natural language question")
+    sql_query: str = Field(description="SQL query that answered the question")
+    source: str = Field(default="learned", description="'seed' for curated examples, 'learned' for pipeline runs")
+    hits: int = Field(default=0, description="Number of times the example was retrieved")
+    last_used: float = Field(default=0.0, description="Unix time the example was last added or retrieved")
+
+
+class ExampleStore:
+    """Persistent, size-capped few-shot example store with a local similarity index"""
+
+    def __init__(self, path: Optional[str] = None, max_size: int = EXAMPLE_STORE_MAX_SIZE,
+                 seed_examples=SEED_EXAMPLES, flush_seconds: float = EXAMPLE_STORE_FLUSH_SECONDS):
+        """
+        Args:
+            path: JSON file to load and persist the store (see example_store_path()), None keeps it in memory
+            max_size: Maximum number of examples kept
+            seed_examples: (question, sql) pairs added when the store is created
+            flush_seconds: Delay before changes are written to the file, 0 writes on every change
+        """
+        self.path = path
+        self.max_size = max_size
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._examples: Dict[str, SQLExample] = {}
+        self._dirty = False
+        self._index_stale = False
+        self._flush_timer: Optional[threading.Timer] = None
+
+        if path and os.path.exists(path):
+            self._load()
+        else:
+            for question, sql_query in seed_examples:
+                self._examples[self._key(question)] = SQLExample(question=question, sql_query=sql_query, source="seed")
+            self._dirty = True
+            self.flush()
+
+        self._rebuild_index()
+        if path:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for item in data.get("examples", []):
+            example = SQLExample(**item)
+            self._examples[self._key(example.question)] = example
+
+    def _mark_dirty(self) -> None:
+        """Schedule a write of the store; called with self._lock held"""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_seconds, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write pending changes (new examples, hits and last_used) to the file now"""
+        with self._save_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self.path or not self._dirty:
+                    return
+                data = {"examples": [example.model_dump() for example in self._examples.values()]}
+                self._dirty = False
+
+            # Several worker processes may write at once; each writes its own temp file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save the example store to {self.path}: {e}")
+
+    def _rebuild_index(self) -> None:
+        """Recompute document frequencies and the inverted index (token -> example keys)"""
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._index: Dict[str, set] = {}
+        document_frequency = Counter()
+        token_counts = {}
+
+        for key, example in self._examples.items():
+            counts = Counter(tokenize(example.question))
+            token_counts[key] = counts
+            document_frequency.update(counts.keys())
+
+        total = len(self._examples)
+        self._idf = {token: math.log((1 + total) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+        for key, counts in token_counts.items():
+            self._vectors[key] = self._normalize({token: count * self._idf[token] for token, count in counts.items()})
+            for token in counts:
+                self._index.setdefault(token, set()).add(key)
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {token: weight / norm for token, weight in vector.items()} if norm else {}
+
+    def _evict(self) -> None:
+        """Drop least recently used learned examples until the store fits its cap"""
+        learned = sorted(
+            (example for example in self._examples.values() if example.source != "seed"),
+            key=lambda example: (example.last_used, example.hits)
+        )
+        while len(self._examples) > self.max_size and learned:
+            self._examples.pop(self._key(learned.pop(0).question))
+
+    def add(self, question: str, sql_query: str) -> None:
+        """
+        Add a question and the SQL that answered it, replacing the SQL of a known question.
+
+        Args:
+            question: Natural language question
+            sql_query: SQL query that executed successfully
+        """
+        key = self._key(question)
+        with self._lock:
+            existing = self._examples.get(key)
+            if existing and existing.source == "seed":
+                return
+            self._examples[key] = SQLExample(
+                question=question,
+                sql_query=sql_query,
+                hits=existing.hits if existing else 0,
+                last_used=time.time()
+            )
+            self._evict()
+            self._index_stale = True
+            self._mark_dirty()
+
+    def search(self, question: str, k: int = FEW_SHOT_K, min_similarity: float = FEW_SHOT_MIN_SIMILARITY) -> List[SQLExample]:
+        """
+        Find the examples most similar to a question.
+
+        Args:
+            question: Natural language question
+            k: Maximum number of examples
+            min_similarity: Minimum cosine similarity
+
+        Returns:
+            Up to k examples, most similar first; an identical question is excluded
+        """
+        key = self._key(question)
+        with self._lock:
+            if self._index_stale:
+                self._rebuild_index()
+                self._index_stale = False
+
+            counts = Counter(tokenize(question))
+            query_vector = self._normalize({
+                token: count * self._idf[token] for token, count in counts.items() if token in self._idf
+            })
+
+            scores = Counter()
+            for token, weight in query_vector.items():
+                for candidate in self._index.get(token, ()):
+                    scores[candidate] += weight * self._vectors[candidate][token]
+
+            results = []
+            for candidate, score in scores.most_common():
+                if len(results) >= k or score < min_similarity:
+                    break
+                if candidate == key:
+                    continue
+                example = self._examples[candidate]
+                example.hits += 1
+                example.last_used = time.time()
+                results.append(example)
+
+            if results:
+                self._mark_dirty()
+            return results
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+
+def format_examples(examples: List[SQLExample]) -> str:
+    """
+    Format examples for the per-request part of the prompt.
+
+    Args:
+        examples: Examples from ExampleStore.search()
+
+    Returns:
+        Text block with one question/SQL pair per example, empty when there are none
+    """
+    if not examples:
+        return ""
+    lines = ["Examples of similar questions with SQL that executed successfully:"]
+    for example in examples:
+        lines.append(f"Question: {example.question}\nSQL: {example.sql_query}")
+    return "\n\n".join(lines) + "\n\n"
+
+
+class FewShotStats:
+    """Thread-safe accuracy and token totals for questions with and without examples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.groups = {
+            "with_examples": {"queries": 0, "successes": 0, "tokens": 0},
+            "without_examples": {"queries": 0, "successes": 0, "tokens": 0},
+        }
+
+    def record(self, examples_used: int, success: bool, tokens: int) -> None:
+        """
+        Record the outcome of one question.
+
+        Args:
+            examples_used: Number of examples injected into the prompt
+            success: Whether the question ended with a successful execution
+            tokens: LLM tokens spent on the question (generation and repairs)
+        """
+        group = "with_examples" if examples_used else "without_examples"
+        with self._lock:
+            self.groups[group]["queries"] += 1
+            self.groups[group]["successes"] += int(success)
+            self.groups[group]["tokens"] += tokens
+
+    def summary(self) -> Dict[str, Any]:
+        """Success rate, tokens per question and successes per 1k tokens for each group"""
+        with self._lock:
+            summary = {}
+            for group, counts in self.groups.items():
+                summary[group] = {
+                    **counts,
+                    "success_rate": counts["successes"] / counts["queries"] if counts["queries"] else 0.0,
+                    "avg_tokens": counts["tokens"] / counts["queries"] if counts["queries"] else 0.0,
+                    "successes_per_1k_tokens": 1000 * counts["successes"] / counts["tokens"] if counts["tokens"] else 0.0,
+                }
+            return summary
+
+
+few_shot_stats = FewShotStats()
@@ -1,10 +1,18 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
-import os
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
-from ai_sql_agent_ddl import process_query
-from langchain_community.utilities import SQLDatabase
+from ai_sql_agent_ddl import engine as agent_engine, process_query
+from direct_execution import await_summary, start_summary
+from node_stream import SSE_MEDIA_TYPE, iter_sse
+from ai_sql_agent_v2 import get_template_router, process_natural_language_batch
+from pipeline_metrics import pipeline_stats
+from prompt_cache import token_usage_stats
+from sql_repair import repair_stats
+from example_store import few_shot_stats
+from engine_resources import get_database, get_resource_stats
 
 load_dotenv()
 
@@ -14,12 +22,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize database connection
-db = SQLDatabase.from_uri(os.getenv("DATABASE_URL"))
 
 class QueryRequest(BaseModel):
     query: str
     description: Optional[str] = None
+    summarize: bool = False
+    stream: bool = False
+    thread_id: Optional[str] = None
 
 class QueryResponse(BaseModel):
     sql_query: str
@@ -27,6 +36,11 @@ class QueryResponse(BaseModel):
     json_result: Any
     success: bool
     error: Optional[str] = None
+    summary: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_rows: Optional[int] = None
 
 class DirectSQLRequest(BaseModel):
     sql: str
@@ -45,6 +59,8 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/query": "Execute natural language queries (converted to SQL)",
+            "/query/batch": "Execute many natural language queries, results streamed as NDJSON",
+            "/stats": "Pipeline stage timings, token usage and cache statistics",
             "/execute": "Execute direct SQL statements",
             "/health": "Health check endpoint"
         }
@@ -55,7 +71,7 @@ async def health():
     """Health check endpoint"""
     try:
         # Test database connection
-        result = db.run_no_throw("SELECT 1 as test")
+        result = get_database().run_no_throw("SELECT 1 as test")
         return {
             "status": "healthy",
             "database": "connected",
@@ -69,16 +85,32 @@ async def execute_natural_language_query(request: QueryRequest):
     """
     Execute a natural language query against the DVD Rental database.
     The query will be converted to SQL using AI and then executed.
+    With "stream": true, each pipeline step is sent as a Server-Sent Event
+    (sql, checked_sql, result, summary, done) as soon as it completes.
     """
+    if request.stream:
+        events = agent_engine.stream_events(request.query, thread_id=request.thread_id,
+                                            summarize=request.summarize)
+        return StreamingResponse(iter_sse(events), media_type=SSE_MEDIA_TYPE)
+
     try:
-        # Process the natural language query using the DDL-enhanced agent
-        result = process_query(request.query)
+        # Process the natural language query using the DDL-enhanced agent;
+        # results are captured per request, so queries can run concurrently
+        result = await run_in_threadpool(process_query, request.query, request.thread_id)
+
+        # Optional LLM summary, cancelled if it takes longer than SQL_RESULT_SUMMARY_TIMEOUT
+        summary = None
+        if request.summarize:
+            summary = await await_summary(
+                start_summary(agent_engine.llm, request.query, result["sql_query"], result["result"])
+            )
         
         return QueryResponse(
             sql_query=result["sql_query"],
             result=result["result"],
             json_result=result["json_result"],
-            success=True
+            success=True,
+            summary=summary
         )
     
     except Exception as e:
@@ -90,6 +122,23 @@ async def execute_natural_language_query(request: QueryRequest):
             error=str(e)
         )
 
+@app.post("/query/batch")
+async def execute_natural_language_batch(request: BatchQueryRequest):
+    """
+    Execute a batch of natural language queries.
+    Duplicate queries are answered once and related queries share LLM calls.
+    One JSON line is streamed per distinct query as soon as it completes,
+    with query_indices pointing back into the submitted list.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries cannot be empty")
+
+    def stream_results():
+        for item in process_natural_language_batch(request.queries, max_rows=request.max_rows):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.post("/execute", response_model=DirectSQLResponse)
 async def execute_direct_sql(request: DirectSQLRequest):
     """
@@ -104,7 +153,7 @@ async def execute_direct_sql(request: DirectSQLRequest):
             raise ValueError("SQL query cannot be empty")
         
         # Execute the SQL query
-        result = db.run_no_throw(sql_query)
+        result = get_database().run_no_throw(sql_query)
         
         return DirectSQLResponse(
             result=result,
@@ -125,7 +174,7 @@ async def get_database_schema():
     """
     try:
         # Get list of tables
-        tables_result = db.run_no_throw("""
+        tables_result = get_database().run_no_throw("""
             SELECT table_name 
             FROM information_schema.tables 
             WHERE table_schema = 'public' 
@@ -134,7 +183,7 @@ async def get_database_schema():
         """)
         
         # Get basic statistics
-        stats_result = db.run_no_throw("""
+        stats_result = get_database().run_no_throw("""
             SELECT 
                 'Tables' as metric, 
                 COUNT(*) as count
@@ -161,6 +210,24 @@ async def get_database_schema():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving schema: {str(e)}")
 
+@app.get("/stats")
+async def get_pipeline_stats():
+    """
+    Get rolling per-stage timing percentiles and LLM token usage of the v2 pipeline,
+    plus template, repair, few-shot and LLM routing statistics and the shared resource counts.
+    """
+    # Imported here: the router (and its chat model base classes) is only loaded with LLM_BACKEND=router
+    from llm_router import get_router_stats
+    return {
+        "pipeline": pipeline_stats.summary(),
+        "token_usage": token_usage_stats.summary(),
+        "template_router": get_template_router().stats(),
+        "repair": repair_stats.summary(),
+        "few_shot": few_shot_stats.summary(),
+        "llm_router": get_router_stats(),
+        "shared_resources": get_resource_stats()
+    }
+
 @app.get("/examples")
 async def get_example_queries():
     """
@@ -0,0 +1,427 @@
+"""
+Intent Router - Template fast path for common natural language questions
+
+A large share of questions are a handful of intents: row counts per table,
+top-N rankings, a customer's rentals, an actor's films, database name and
+version. This module answers those with parameterized SQL templates instead
+of an LLM call.
+
+Questions are matched locally:
+- lexical matching: every keyword group of a template must be present, and
+  the template must explain the question's content words (all of them by
+  default): "how many rentals in 2005" is not a plain row count
+- entity check: a category, city, name or number found in the question that
+  is not a slot of the template rejects it, so "how many customers in London"
+  never becomes a count of all customers
+- veto words: a metric, ordering or negation the template does not name
+  ("by revenue", "least popular", "never rented") sends the question to the
+  LLM whatever the coverage, since the template would answer another question
+- entity extraction: table names come from the DDL, while category names,
+  cities, actor and customer names are looked up in dimension values that are
+  loaded once through the SQL execution API and cached
+
+Only confident matches are answered; everything else falls through to the
+LLM. Hits per template are counted so the library can be tuned.
+
+Configuration:
+- SQL_TEMPLATE_ROUTER_ENABLED: "true" / "false" (default "true")
+- SQL_TEMPLATE_MIN_CONFIDENCE: share of content words a template must explain (default 1.0)
+- SQL_TEMPLATE_DIMENSION_TTL: seconds before dimension values are reloaded (default 3600)
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+TEMPLATE_ROUTER_ENABLED = os.getenv("SQL_TEMPLATE_ROUTER_ENABLED", "true").lower() == "true"
+MIN_CONFIDENCE = float(os.getenv("SQL_TEMPLATE_MIN_CONFIDENCE", "1.0"))
+DIMENSION_TTL_SECONDS = int(os.getenv("SQL_TEMPLATE_DIMENSION_TTL", "3600"))
+
+# Retry interval when dimension values could not be loaded (e.g. API down)
+_DIMENSION_RETRY_SECONDS = 60
+
+# Words that carry no intent and are ignored when scoring coverage
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "me", "us", "show", "list", "give",
+    "get", "find", "what", "whats", "which", "is", "are", "there", "do", "does", "we",
+    "have", "has", "please", "all", "by", "with", "from", "and", "our", "tell", "display",
+    "i", "you", "can", "could", "would", "currently", "this", "that", "it", "their", "s", "did"
+}
+
+# Words that change what is measured, the ranking direction or negate the question;
+# a template must name them itself, otherwise its answer would be confidently wrong
+_VETO_WORDS = {
+    # metrics
+    "revenue", "sales", "sold", "payment", "paid", "income", "earning", "profit", "amount",
+    "spent", "spend", "spending", "average", "avg", "mean", "median", "sum", "duration",
+    "length", "price", "cost", "rate", "ratio", "percent", "percentage", "longest",
+    "shortest", "cheapest", "expensive", "late", "overdue",
+    # direction and comparisons
+    "least", "fewest", "fewer", "lowest", "bottom", "worst", "smallest", "minimum", "min",
+    "unpopular", "ascending", "asc", "reverse", "less", "more", "than", "between", "above",
+    "below", "over", "under", "each", "per",
+    # negation
+    "not", "no", "never", "without", "none", "nobody", "inactive", "except", "excluding",
+    "exclude", "only", "dont", "didnt", "doesnt", "havent", "hasnt",
+}
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20, "fifty": 50, "hundred": 100
+}
+
+# Synonyms that name a table without using its exact name
+_TABLE_SYNONYMS = {"movie": "film", "movies": "film", "genre": "category", "genres": "category"}
+
+# Dimension values used for entity extraction
+_DIMENSION_QUERIES = {
+    "category": "SELECT name AS value FROM category;",
+    "city": "SELECT city AS value FROM city;",
+    "actor": "SELECT first_name || ' ' || last_name AS value FROM actor;",
+    "customer": "SELECT first_name || ' ' || last_name AS value FROM customer;",
+}
+
+# Longest entity (in words) looked up in the dimension values
+_MAX_ENTITY_WORDS = 3
+
+
+class TemplateMatch(BaseModel):
+    """A question answered by a SQL template"""
+    template_id: str = Field(description="Id of the matched template")
+    sql_query: str = Field(description="SQL generated from the template")
+    confidence: float = Field(description="Share of the question's content words explained by the template")
+    description: str = Field(description="What the template answers")
+
+
+class SQLTemplate:
+    """A parameterized SQL template and the words that select it"""
+
+    def __init__(self, template_id: str, description: str, keyword_groups: List[set],
+                 slots: List[str], build: Callable[[Dict[str, Any]], str],
+                 optional_words: Optional[set] = None, optional_slots: Optional[List[str]] = None):
+        self.template_id = template_id
+        self.description = description
+        self.keyword_groups = keyword_groups
+        self.slots = slots
+        self.build = build
+        # Words that may appear without changing the meaning (count towards coverage only)
+        self.optional_words = optional_words or set()
+        # Slots used when present, with a default otherwise (e.g. the N of a top-N)
+        self.optional_slots = optional_slots or []
+
+
+def _sql_literal(value: str) -> str:
+    """Quote a value as a SQL string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _split_name(value: str) -> List[str]:
+    """Split a 'FIRST LAST' dimension value back into its columns"""
+    first, _, last = value.partition(" ")
+    return [first, last]
+
+
+def _customer_rentals_sql(slots: Dict[str, Any]) -> str:
+    first_name, last_name = _split_name(slots["customer"])
+    return f"""SELECT r.rental_id, r.rental_date, r.return_date, f.title
+FROM rental r
+JOIN customer c ON r.customer_id = c.customer_id
+JOIN inventory i ON r.inventory_id = i.inventory_id
+JOIN film f ON i.film_id = f.film_id
+WHERE c.first_name = {_sql_literal(first_name)} AND c.last_name = {_sql_literal(last_name)}
+ORDER BY r.rental_date DESC;"""
+
+
+def _actor_films_sql(slots: Dict[str, Any]) -> str:
+    first_name, last_name = _split_name(slots["actor"])
+    return f"""SELECT f.title, f.release_year, f.rating
+FROM film f
+JOIN film_actor fa ON f.film_id = fa.film_id
+JOIN actor a ON fa.actor_id = a.actor_id
+WHERE a.first_name = {_sql_literal(first_name)} AND a.last_name = {_sql_literal(last_name)}
+ORDER BY f.title;"""
+
+
+DEFAULT_TEMPLATES = [
+    SQLTemplate(
+        "database_name", "Name of the current database",
+        [{"database"}, {"name", "called"}], [],
+        lambda slots: "SELECT current_database();",
+        {"current"}
+    ),
+    SQLTemplate(
+        "database_version", "PostgreSQL server version",
+        [{"version"}], [],
+        lambda slots: "SELECT version();",
+        {"database", "postgres", "postgresql", "server", "db"}
+    ),
+    SQLTemplate(
+        "table_row_count", "Number of rows in a table",
+        [{"how", "count", "number", "total"}, {"many", "count", "number", "total"}], ["table"],
+        lambda slots: f"SELECT COUNT(*) AS {slots['table']}_count FROM {slots['table']};",
+        {"database", "db", "records", "rows", "table", "exist"}
+    ),
+    SQLTemplate(
+        "category_film_count", "Number of films in a category",
+        [{"how", "count", "number", "total"}, {"many", "count", "number", "total"}, {"film", "films", "movie", "movies"}],
+        ["category"],
+        lambda slots: f"""SELECT COUNT(*) AS film_count
+FROM film_category fc
+JOIN category c ON fc.category_id = c.category_id
+WHERE c.name = {_sql_literal(slots['category'])};""",
+        {"category", "genre"}
+    ),
+    SQLTemplate(
+        "top_categories_by_films", "Categories ranked by number of films",
+        [{"top", "most", "popular", "largest", "biggest"}, {"category", "categories", "genre", "genres"}], [],
+        lambda slots: f"""SELECT c.name AS category, COUNT(fc.film_id) AS film_count
+FROM category c
+JOIN film_category fc ON c.category_id = fc.category_id
+GROUP BY c.name
+ORDER BY film_count DESC
+LIMIT {slots.get('number', 10)};""",
+        {"film", "films", "movie", "movies", "number", "count", "ranked"},
+        ["number"]
+    ),
+    SQLTemplate(
+        "top_actors_by_films", "Actors ranked by number of films",
+        [{"top", "most"}, {"actor", "actors"}], [],
+        lambda slots: f"""SELECT a.first_name, a.last_name, COUNT(fa.film_id) AS film_count
+FROM actor a
+JOIN film_actor fa ON a.actor_id = fa.actor_id
+GROUP BY a.actor_id, a.first_name, a.last_name
+ORDER BY film_count DESC
+LIMIT {slots.get('number', 10)};""",
+        {"film", "films", "movie", "movies", "number", "count", "ranked", "appearances"},
+        ["number"]
+    ),
+    SQLTemplate(
+        "top_films_in_category", "Most rented films in a category",
+        [{"top", "most", "popular"}, {"film", "films", "movie", "movies", "rented"}], ["category"],
+        lambda slots: f"""SELECT f.title, COUNT(r.rental_id) AS rental_count
+FROM film f
+JOIN film_category fc ON f.film_id = fc.film_id
+JOIN category c ON fc.category_id = c.category_id
+JOIN inventory i ON f.film_id = i.film_id
+JOIN rental r ON i.inventory_id = r.inventory_id
+WHERE c.name = {_sql_literal(slots['category'])}
+GROUP BY f.film_id, f.title
+ORDER BY rental_count DESC
+LIMIT {slots.get('number', 10)};""",
+        {"category", "genre", "rentals", "rental"},
+        ["number"]
+    ),
+    SQLTemplate(
+        "customer_rentals", "Rentals of a customer",
+        [{"rental", "rentals", "rented"}], ["customer"],
+        _customer_rentals_sql,
+        {"customer", "history", "film", "films", "movie", "movies"}
+    ),
+    SQLTemplate(
+        "actor_films", "Films an actor appeared in",
+        [{"film", "films", "movie", "movies"}], ["actor"],
+        _actor_films_sql,
+        {"actor", "appear", "appeared", "appears", "star", "starred", "acted", "played"}
+    ),
+    SQLTemplate(
+        "customers_in_city", "Customers living in a city",
+        [{"customer", "customers"}], ["city"],
+        lambda slots: f"""SELECT cu.first_name, cu.last_name, cu.email
+FROM customer cu
+JOIN address a ON cu.address_id = a.address_id
+JOIN city ci ON a.city_id = ci.city_id
+WHERE ci.city = {_sql_literal(slots['city'])}
+ORDER BY cu.last_name, cu.first_name;""",
+        {"city", "live", "living", "located", "based"}
+    ),
+]
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lower-case word tokens of a question"""
+    return re.findall(r"[a-z0-9]+", text.lower().replace("'", ""))
+
+
+def _singular(word: str) -> str:
+    """Naive singular form, enough to map 'actors' to 'actor' or 'categories' to 'category'"""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses") or word.endswith("xes"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+class IntentRouter:
+    """Matches questions against the template library and tracks hit statistics"""
+
+    def __init__(self, ddl: str, execute_fn: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 templates: Optional[List[SQLTemplate]] = None,
+                 min_confidence: float = MIN_CONFIDENCE):
+        self.templates = templates if templates is not None else DEFAULT_TEMPLATES
+        self.min_confidence = min_confidence
+        self.execute_fn = execute_fn
+        self.tables = set(re.findall(r"CREATE TABLE (\w+)", ddl))
+
+        self._lock = threading.Lock()
+        self._dimensions: Dict[str, Dict[str, str]] = {}
+        self._dimensions_expire_at = 0.0
+        self._hits = {template.template_id: 0 for template in self.templates}
+        self._misses = 0
+
+    def update_ddl(self, ddl: str) -> None:
+        """Take the table names from a new DDL (e.g. after a schema change)"""
+        self.tables = set(re.findall(r"CREATE TABLE (\w+)", ddl))
+
+    def _load_dimensions(self) -> Dict[str, Dict[str, str]]:
+        """Load (or reuse cached) dimension values, keyed by their lower-case form"""
+        with self._lock:
+            if time.time() < self._dimensions_expire_at or self.execute_fn is None:
+                return self._dimensions
+
+            dimensions = {}
+            complete = True
+            for name, sql in _DIMENSION_QUERIES.items():
+                result = self.execute_fn(sql)
+                if result.get("success") and isinstance(result.get("result"), list):
+                    dimensions[name] = {
+                        " ".join(_tokenize(row["value"])): row["value"]
+                        for row in result["result"] if row.get("value")
+                    }
+                else:
+                    complete = False
+
+            self._dimensions = dimensions
+            ttl = DIMENSION_TTL_SECONDS if complete else _DIMENSION_RETRY_SECONDS
+            self._dimensions_expire_at = time.time() + ttl
+            return self._dimensions
+
+    def _extract_entities(self, tokens: List[str]) -> Dict[str, Any]:
+        """
+        Find table names, numbers and dimension values in the question tokens.
+
+        Returns:
+            Dictionary of slot name to (value, token positions) pairs
+        """
+        entities: Dict[str, Any] = {}
+        dimensions = self._load_dimensions()
+        used = set()
+
+        # Dimension values first, longest spans win ("new york" before "york")
+        for size in range(_MAX_ENTITY_WORDS, 0, -1):
+            for start in range(len(tokens) - size + 1):
+                span = set(range(start, start + size))
+                if span & used:
+                    continue
+                phrase = " ".join(tokens[start:start + size])
+                for name, values in dimensions.items():
+                    if name not in entities and phrase in values:
+                        entities[name] = (values[phrase], span)
+                        used |= span
+                        break
+
+        for position, token in enumerate(tokens):
+            if position in used:
+                continue
+            table = _TABLE_SYNONYMS.get(token, _singular(token))
+            if "table" not in entities and (token in self.tables or table in self.tables):
+                entities["table"] = (token if token in self.tables else table, {position})
+            elif "number" not in entities and (token.isdigit() or token in _NUMBER_WORDS):
+                number = int(token) if token.isdigit() else _NUMBER_WORDS[token]
+                if 0 < number <= 1000:
+                    entities["number"] = (number, {position})
+
+        return entities
+
+    def _score(self, template: SQLTemplate, tokens: List[str], entities: Dict[str, Any]) -> Optional[float]:
+        """Share of content tokens explained by a template, or None if it does not apply"""
+        if any(slot not in entities for slot in template.slots):
+            return None
+
+        token_set = set(tokens)
+        if not all(group & token_set for group in template.keyword_groups):
+            return None
+
+        keywords = set().union(*template.keyword_groups) | template.optional_words
+        vetoed = {token for token in tokens if token in _VETO_WORDS or _singular(token) in _VETO_WORDS}
+        if any(token not in keywords and _singular(token) not in keywords for token in vetoed):
+            return None
+
+        # An entity the template does not take (a city for a row count, a year, a name)
+        # would be dropped from the SQL; table names that are also keywords are fine
+        slots = template.slots + template.optional_slots
+        for name, (_, positions) in entities.items():
+            if name not in slots and any(
+                    tokens[i] not in keywords and _singular(tokens[i]) not in keywords for i in positions):
+                return None
+
+        explained = set()
+        for slot in slots:
+            if slot in entities:
+                explained |= entities[slot][1]
+
+        content_positions = [i for i, token in enumerate(tokens) if token not in _STOPWORDS]
+        if not content_positions:
+            return None
+
+        covered = [
+            i for i in content_positions
+            if i in explained or tokens[i] in keywords or _singular(tokens[i]) in keywords
+        ]
+        return len(covered) / len(content_positions)
+
+    def route(self, question: str) -> Optional[TemplateMatch]:
+        """
+        Answer a question with a SQL template if one matches confidently.
+
+        Args:
+            question: Natural language question
+
+        Returns:
+            TemplateMatch, or None when the question should go to the LLM
+        """
+        tokens = _tokenize(question)
+        entities = self._extract_entities(tokens)
+
+        best = None
+        for template in self.templates:
+            confidence = self._score(template, tokens, entities)
+            if confidence is None or confidence < self.min_confidence:
+                continue
+            # Prefer higher coverage, then the more specific template (more slots)
+            rank = (confidence, len(template.slots), len(template.keyword_groups))
+            if best is None or rank > best[0]:
+                best = (rank, template)
+
+        if best is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        template = best[1]
+        slots = {name: value for name, (value, _) in entities.items()}
+        with self._lock:
+            self._hits[template.template_id] += 1
+
+        return TemplateMatch(
+            template_id=template.template_id,
+            sql_query=template.build(slots),
+            confidence=best[0][0],
+            description=template.description
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts per template and the overall fast-path hit ratio"""
+        with self._lock:
+            hits = sum(self._hits.values())
+            total = hits + self._misses
+            return {
+                "template_hits": dict(self._hits),
+                "misses": self._misses,
+                "hit_ratio": hits / total if total else 0.0,
+            }
@@ -0,0 +1,349 @@
+"""
+Lambda Bedrock Chat - Chat model that calls Bedrock through an AWS Lambda function
+
+The Lambda function (ml-discovery-test_beedrock, see README_LAMBDA.md) keeps
+the Bedrock credentials; clients only need lambda:InvokeFunction. Used by
+text_to_sql_ai_agent_v2.py and as the "lambda" backend of the LLM router.
+"""
+
+import os
+import time
+import json
+import codecs
+import random
+import asyncio
+import boto3
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, ConnectTimeoutError, EndpointConnectionError
+from pydantic import Field, PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from structured_output import (
+    STRUCTURED_MAX_TOKENS,
+    STRUCTURED_OUTPUT_MODE,
+    StructuredOutputError,
+    json_schema_instruction,
+    parse_stream,
+    structured_output_stats,
+    text_fallback
+)
+from typing import List, Optional, Any, Dict, Iterator
+
+
+class LambdaInvocationError(Exception):
+    """The Lambda function did not return a completion"""
+
+    def __init__(self, message: str, throttled: bool = False, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.throttled = throttled
+        # Safe to send again: throttled, or the request never reached Lambda
+        self.retryable = throttled if retryable is None else retryable
+
+
+# Error types / messages of Lambda function errors caused by Bedrock throttling
+_THROTTLING_MARKERS = ("Throttling", "TooManyRequests", "Rate exceeded", "ServiceUnavailable")
+
+# Invoke error codes of throttled calls (the function did not run)
+_THROTTLING_CODES = ("TooManyRequestsException", "ThrottlingException", "ServiceUnavailableException")
+
+
+class LambdaBedrockChat(BaseChatModel):
+    """Custom chat model that invokes Bedrock through AWS Lambda function
+
+    The boto3 client is created once per model with a connection pool, timeouts
+    and botocore's adaptive mode for client-side rate limiting. botocore itself
+    makes a single attempt: it would also retry read timeouts, re-running a
+    generation the function may still be working on. Throttled calls (of Invoke
+    or reported by the function when Bedrock throttled it) and connections that
+    could not be opened are retried here with full jitter backoff, all within
+    one deadline per call. Errors are raised as LambdaInvocationError instead of
+    being returned as AI messages.
+
+    Configuration:
+    - LAMBDA_MAX_POOL_CONNECTIONS: HTTP connections shared by concurrent calls (default 10)
+    - LAMBDA_CONNECT_TIMEOUT / LAMBDA_READ_TIMEOUT: Timeouts of one attempt in seconds (default 5 / 120)
+    - LAMBDA_CALL_TIMEOUT: Deadline of a call including retries and backoff, in seconds (default 120)
+    - LAMBDA_MAX_ATTEMPTS: Attempts per call, including the first (default 5)
+    - LAMBDA_BACKOFF_BASE / LAMBDA_BACKOFF_MAX: Backoff of throttled function calls in seconds (default 0.5 / 20)
+    - LAMBDA_STRUCTURED_STREAMING: Read structured responses with InvokeWithResponseStream and stop once
+      the needed field is complete; needs a response-streaming function (default false)
+    - LAMBDA_TEMPERATURE: Sampling temperature sent to Bedrock (default 0.1)
+    """
+    
+    lambda_function_name: str = "ml-discovery-test_beedrock"
+    aws_region: str = "us-east-1"
+    max_pool_connections: int = Field(default_factory=lambda: int(os.getenv("LAMBDA_MAX_POOL_CONNECTIONS", "10")))
+    connect_timeout: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_CONNECT_TIMEOUT", "5")))
+    read_timeout: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_READ_TIMEOUT", "120")))
+    call_timeout: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_CALL_TIMEOUT", "120")))
+    max_attempts: int = Field(default_factory=lambda: int(os.getenv("LAMBDA_MAX_ATTEMPTS", "5")))
+    backoff_base: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_BACKOFF_BASE", "0.5")))
+    backoff_max: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_BACKOFF_MAX", "20")))
+    structured_streaming: bool = Field(
+        default_factory=lambda: os.getenv("LAMBDA_STRUCTURED_STREAMING", "false").lower() == "true"
+    )
+    temperature: float = Field(default_factory=lambda: float(os.getenv("LAMBDA_TEMPERATURE", "0.1")))
+    lambda_client: Any = Field(default=None, exclude=True)
+
+    _executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.lambda_client is None:
+            self.lambda_client = boto3.client(
+                'lambda',
+                region_name=os.getenv("AWS_DEFAULT_REGION", self.aws_region),
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                config=Config(
+                    max_pool_connections=self.max_pool_connections,
+                    connect_timeout=self.connect_timeout,
+                    read_timeout=self.read_timeout,
+                    # Retried in _invoke_with_retries(), where read timeouts are not
+                    retries={"total_max_attempts": 1, "mode": "adaptive"},
+                )
+            )
+        # boto3 has no asyncio support: calls run on threads bounded by the connection pool,
+        # so the caller can stop waiting at the deadline
+        self._executor = ThreadPoolExecutor(max_workers=self.max_pool_connections,
+                                            thread_name_prefix="lambda-bedrock")
+
+    def _build_payload(self, messages: List[BaseMessage], max_tokens: int = 4096,
+                       response_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Convert messages to the payload expected by the Lambda function"""
+        lambda_messages = []
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                lambda_messages.append({"role": "user", "content": msg.content})
+            elif isinstance(msg, AIMessage):
+                lambda_messages.append({"role": "assistant", "content": msg.content})
+            else:
+                lambda_messages.append({"role": "user", "content": msg.content})
+        
+        payload = {
+            "messages": lambda_messages,
+            "model_kwargs": {
+                "maxTokenCount": max_tokens,
+                "temperature": self.temperature,
+                "topP": 0.9
+            }
+        }
+        if response_format is not None:
+            # Outside model_kwargs: functions that do not know it ignore it instead of passing it to Bedrock
+            payload["response_format"] = response_format
+        return payload
+
+    def _invoke_once(self, payload: Dict[str, Any]) -> str:
+        """
+        Invoke the Lambda function once.
+
+        Raises:
+            LambdaInvocationError: The call failed or the function returned an error
+        """
+        try:
+            response = self.lambda_client.invoke(
+                FunctionName=self.lambda_function_name,
+                InvocationType='RequestResponse',
+                Payload=json.dumps(payload)
+            )
+            response_payload = json.loads(response['Payload'].read())
+        except ClientError as e:
+            throttled = e.response.get("Error", {}).get("Code") in _THROTTLING_CODES
+            raise LambdaInvocationError(f"Error invoking Lambda function: {e}", throttled=throttled) from e
+        except (ConnectTimeoutError, EndpointConnectionError) as e:
+            # The request was not sent, so it can be sent again
+            raise LambdaInvocationError(f"Error invoking Lambda function: {e}", retryable=True) from e
+        except BotoCoreError as e:
+            # Includes read timeouts: the function may still be generating, so it is not retried
+            raise LambdaInvocationError(f"Error invoking Lambda function: {e}") from e
+        except ValueError as e:
+            raise LambdaInvocationError(f"Lambda function returned invalid JSON: {e}") from e
+        
+        # Handle Lambda errors
+        if isinstance(response_payload, dict) and ('errorMessage' in response_payload or response.get('FunctionError')):
+            error = f"{response_payload.get('errorType', 'Error')}: {response_payload.get('errorMessage', '')}"
+            throttled = any(marker in error for marker in _THROTTLING_MARKERS)
+            raise LambdaInvocationError(f"Lambda error: {error}", throttled=throttled)
+        
+        # Extract the generated text from Lambda response
+        generated_text = response_payload.get('response', {}).get('content', '')
+        
+        if not generated_text:
+            generated_text = str(response_payload.get('body', ''))
+        if not generated_text:
+            raise LambdaInvocationError("Lambda function returned an empty completion")
+        return generated_text
+
+    def _retry_delay(self, error: LambdaInvocationError, attempt: int, deadline: float) -> Optional[float]:
+        """Backoff before the next attempt, or None when the error is final"""
+        if not error.retryable or attempt == self.max_attempts - 1:
+            return None
+        delay = self._backoff_seconds(attempt)
+        return delay if time.monotonic() + delay < deadline else None
+
+    def _timed_out(self) -> LambdaInvocationError:
+        return LambdaInvocationError(f"Lambda call did not complete within {self.call_timeout:g}s")
+
+    def _invoke_with_retries(self, payload: Dict[str, Any]) -> str:
+        """Invoke the Lambda function, retrying throttled calls with backoff until the call deadline"""
+        deadline = time.monotonic() + self.call_timeout
+        for attempt in range(self.max_attempts):
+            future = self._executor.submit(self._invoke_once, payload)
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                raise self._timed_out() from None
+            except LambdaInvocationError as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _open_stream(self, payload: Dict[str, Any]) -> Any:
+        """
+        Invoke the Lambda function with a streamed response.
+
+        Returns:
+            The response event stream (close it to stop reading)
+        """
+        try:
+            response = self.lambda_client.invoke_with_response_stream(
+                FunctionName=self.lambda_function_name,
+                InvocationType='RequestResponse',
+                Payload=json.dumps(payload)
+            )
+        except (BotoCoreError, ClientError) as e:
+            raise LambdaInvocationError(f"Error invoking Lambda function: {e}") from e
+        return response['EventStream']
+
+    @staticmethod
+    def _iter_stream_text(event_stream: Any) -> Iterator[str]:
+        """Text of the streamed response chunks, as they arrive"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for event in event_stream:
+            if 'PayloadChunk' in event:
+                text = decoder.decode(event['PayloadChunk']['Payload'])
+                if text:
+                    yield text
+            elif 'InvokeComplete' in event and event['InvokeComplete'].get('ErrorCode'):
+                details = event['InvokeComplete']
+                error = f"{details['ErrorCode']}: {details.get('ErrorDetails', '')}"
+                raise LambdaInvocationError(
+                    f"Lambda error: {error}", throttled=any(marker in error for marker in _THROTTLING_MARKERS)
+                )
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        """Full jitter: uniform between 0 and the capped exponential delay"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _chat_result(generated_text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=generated_text))])
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Generate chat response by invoking Lambda function"""
+        return self._chat_result(self._invoke_with_retries(self._build_payload(messages)))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Generate chat response without blocking the event loop, sharing the client's connection pool"""
+        payload = self._build_payload(messages)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.call_timeout
+        for attempt in range(self.max_attempts):
+            try:
+                generated_text = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._invoke_once, payload),
+                    timeout=max(0.0, deadline - time.monotonic())
+                )
+                return self._chat_result(generated_text)
+            except asyncio.TimeoutError:
+                raise self._timed_out() from None
+            except LambdaInvocationError as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+    
+    def with_structured_output(self, schema):
+        """Return a wrapper that handles structured output"""
+        return StructuredOutputWrapper(self, schema)
+    
+    @property
+    def _llm_type(self) -> str:
+        return "lambda_bedrock_chat"
+
+
+class StructuredOutputWrapper:
+    """Wrapper to handle structured output for the Lambda Bedrock chat model
+
+    In JSON-schema mode (SQL_STRUCTURED_OUTPUT_MODE, see structured_output.py) the model
+    is asked for a JSON object matching the schema with a smaller token budget, and the
+    response is parsed field by field. With a streaming function the stream is closed as
+    soon as the schema's first field is complete. Responses that are not JSON fall back
+    to the text extraction and are counted in structured_output_stats.
+    """
+    
+    def __init__(self, llm: LambdaBedrockChat, schema):
+        self.llm = llm
+        self.schema = schema
+    
+    def invoke(self, prompt: Any, **kwargs) -> Any:
+        """
+        Invoke the LLM and parse the response according to the schema.
+
+        Raises:
+            StructuredOutputError: The response contains nothing usable for the schema
+        """
+        # Create a human message from the prompt
+        messages = [HumanMessage(content=prompt)] if isinstance(prompt, str) else list(prompt)
+
+        if STRUCTURED_OUTPUT_MODE != "json_schema":
+            # Get response from Lambda and use it as the first field
+            result = self.llm._generate(messages, **kwargs)
+            response_text = result.generations[0].message.content
+            instance = text_fallback(response_text, self.schema)
+            structured_output_stats.record("text", len(response_text))
+            return instance
+
+        messages = [*messages[:-1], HumanMessage(content=f"{messages[-1].content}\n\n{json_schema_instruction(self.schema)}")]
+        payload = self.llm._build_payload(
+            messages,
+            max_tokens=STRUCTURED_MAX_TOKENS,
+            response_format={"type": "json_schema", "schema": self.schema.model_json_schema()},
+        )
+        try:
+            if self.llm.structured_streaming:
+                event_stream = self.llm._open_stream(payload)
+                try:
+                    instance, method, parser = parse_stream(self.llm._iter_stream_text(event_stream), self.schema)
+                finally:
+                    # Stop reading (and waiting for) the rest of the generation
+                    event_stream.close()
+            else:
+                instance, method, parser = parse_stream([self.llm._invoke_with_retries(payload)], self.schema)
+        except StructuredOutputError:
+            structured_output_stats.record_fallback("unparseable")
+            raise
+
+        structured_output_stats.record(method, len(parser.text))
+        if method == "text":
+            structured_output_stats.record_fallback("not_json")
+        return instance
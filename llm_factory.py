@@ -0,0 +1,117 @@
+"""
+LLM Factory - Chat model selection for all agents
+
+Agents create their chat model through get_chat_model() so the backend can
+be switched by configuration, e.g. to the offline mock model for benchmarks
+and CI.
+
+Configuration:
+- LLM_BACKEND:
+  - "default": the model the agent was written for (Gemini, or the agent's own
+    default such as the Bedrock Lambda model)
+  - "gemini": Google Gemini for every agent
+  - "mock": MockChatModel replaying fixture responses (see mock_llm.py)
+  - "router": every call goes to the fastest healthy backend of
+    LLM_ROUTER_BACKENDS, with hedging and failover (see llm_router.py)
+  Read when a model is created, so tests and scripts can set it after import.
+"""
+
+import os
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+
+_BACKENDS = ("default", "gemini", "mock", "router")
+
+
+def get_backend() -> str:
+    """The configured LLM_BACKEND"""
+    return os.getenv("LLM_BACKEND", "default").lower()
+
+
+def bedrock_titan_model() -> "BaseChatModel":
+    """Amazon Titan Text Express on Bedrock (most cost-efficient model for text-to-SQL)"""
+    import boto3
+    from langchain_aws import ChatBedrock
+
+    bedrock_runtime = boto3.client(
+        "bedrock-runtime",
+        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+    )
+    return ChatBedrock(
+        client=bedrock_runtime,
+        model_id="amazon.titan-text-express-v1",
+        model_kwargs={
+            "maxTokenCount": 4096,
+            "temperature": 0.1,  # Low temperature for more deterministic SQL generation
+            "topP": 0.9
+        }
+    )
+
+
+def lambda_bedrock_model() -> "BaseChatModel":
+    """Bedrock through the Lambda proxy (see lambda_bedrock_chat.py)"""
+    from lambda_bedrock_chat import LambdaBedrockChat
+    return LambdaBedrockChat()
+
+
+def create_backend(name: str, model: str = "gemini-2.5-flash", **kwargs: Any) -> "BaseChatModel":
+    """
+    Create the chat model of one backend, as used by the LLM router.
+
+    Args:
+        name: "gemini", "bedrock" (Titan on Bedrock), "lambda" (Bedrock through the Lambda proxy) or "mock"
+        model: Gemini model name
+        **kwargs: Extra arguments for the Gemini model
+
+    Returns:
+        Chat model of the backend
+    """
+    if name == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, **kwargs)
+    if name == "bedrock":
+        return bedrock_titan_model()
+    if name == "lambda":
+        return lambda_bedrock_model()
+    if name == "mock":
+        from mock_llm import MockChatModel
+        return MockChatModel()
+    raise ValueError(f"Unknown LLM backend '{name}', expected one of: gemini, bedrock, lambda, mock")
+
+
+def get_chat_model(model: str = "gemini-2.5-flash", default: Optional[Callable[[], "BaseChatModel"]] = None,
+                   **kwargs: Any) -> "BaseChatModel":
+    """
+    Create the chat model for an agent.
+
+    Args:
+        model: Gemini model name
+        default: Factory of the agent's own model, used for the "default" backend
+            instead of Gemini
+        **kwargs: Extra arguments for the Gemini model
+
+    Returns:
+        Chat model for the configured backend
+    """
+    backend = get_backend()
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of: {', '.join(_BACKENDS)}")
+
+    if backend == "mock":
+        from mock_llm import MockChatModel
+        return MockChatModel()
+
+    if backend == "router":
+        from llm_router import RouterChatModel, get_llm_router
+        return RouterChatModel(router=get_llm_router(model, **kwargs))
+
+    if backend == "default" and default is not None:
+        return default()
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, **kwargs)
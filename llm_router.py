@@ -0,0 +1,557 @@
+"""
+LLM Router - Latency-aware routing between chat model backends
+
+Gemini, Bedrock Titan and the Bedrock Lambda proxy used to be hard-wired per
+script. With LLM_BACKEND=router every agent gets a RouterChatModel, and each
+call goes to one of the configured backends:
+
+- Rolling latency (successful calls) and error rate are kept per backend.
+- Calls go to the healthy backend with the lowest median latency. Backends
+  with fewer than LLM_ROUTER_MIN_SAMPLES successful calls are tried first,
+  one call at a time, so every backend gets measured.
+- A backend whose error rate exceeds LLM_ROUTER_MAX_ERROR_RATE is skipped for
+  LLM_ROUTER_COOLDOWN_SECONDS and then probed again; a failed probe starts
+  another cooldown.
+- Hedging: when the first backend has not answered within its p95 latency,
+  the same request is sent to the next backend and the first answer wins.
+  The delay counts from when the call starts running, not while it waits for
+  a worker thread. A slower request already running is not cancelled (its
+  latency still counts); one that has not started yet is.
+- Failover: when a backend fails, the request moves on to the next one
+  immediately, without waiting for a hedged request still in flight.
+- Capabilities: tool-bound and structured-output calls only go to backends
+  that support them (e.g. the Lambda proxy has no tool calling). A backend
+  raising NotImplementedError is remembered as not supporting the operation
+  and skipped for it, without counting as a health failure.
+
+Every request produces a RoutingDecision (chosen backend, order, reason,
+hedging, failovers), kept in a rolling list, logged, and reported by
+summary() together with per-backend health.
+
+Configuration:
+- LLM_ROUTER_BACKENDS: Backends in order of preference (default "gemini,bedrock,lambda")
+- LLM_ROUTER_WINDOW: Recent calls per backend used for latency and error rate (default 50)
+- LLM_ROUTER_MIN_SAMPLES: Calls before a backend's latency is trusted (default 3)
+- LLM_ROUTER_MAX_ERROR_RATE: Error rate above which a backend is unhealthy (default 0.5)
+- LLM_ROUTER_COOLDOWN_SECONDS: Time an unhealthy backend is skipped (default 30)
+- LLM_ROUTER_HEDGE: "true" / "false" (default "true")
+- LLM_ROUTER_HEDGE_AFTER_MS: Hedge delay while the first backend has too few samples for a p95 (default 2000)
+- LLM_ROUTER_DECISIONS: Recent routing decisions kept (default 100)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pipeline_metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+ROUTER_BACKENDS = [name.strip() for name in os.getenv("LLM_ROUTER_BACKENDS", "gemini,bedrock,lambda").split(",") if name.strip()]
+ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "3"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", "30"))
+ROUTER_HEDGE = os.getenv("LLM_ROUTER_HEDGE", "true").lower() == "true"
+ROUTER_HEDGE_AFTER_MS = float(os.getenv("LLM_ROUTER_HEDGE_AFTER_MS", "2000"))
+ROUTER_DECISIONS = int(os.getenv("LLM_ROUTER_DECISIONS", "100"))
+
+# Operations a backend may not support
+CAPABILITIES = ("tools", "structured_output")
+
+
+class RoutingDecision(BaseModel):
+    """How one request was routed"""
+    backend: str = Field(description="Backend whose response was used")
+    order: List[str] = Field(description="Backends in the order they were to be tried")
+    reason: str = Field(description="Why the first backend was chosen: 'fastest', 'explore', 'only_healthy' or 'all_unhealthy'")
+    hedged: bool = Field(default=False, description="A hedged request was sent to a second backend")
+    failovers: List[str] = Field(default_factory=list, description="Backends that failed during the request")
+    latency_ms: float = Field(description="Time until the response that was used")
+    timestamp: float = Field(description="Unix time of the decision")
+
+
+class BackendHealth:
+    """Rolling latency and outcomes of one backend (guarded by the router's lock)"""
+
+    def __init__(self, window: int):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.unhealthy_until = 0.0
+        self.probation = False
+        self.in_flight = 0
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_ms(self, fraction: float) -> Optional[float]:
+        return percentile(sorted(self.latencies), fraction) if self.latencies else None
+
+
+def supports(backend: Any, capability: str) -> bool:
+    """Whether a chat model implements an operation (BaseChatModel's own bind_tools raises NotImplementedError)"""
+    own_bind_tools = type(backend).bind_tools is not BaseChatModel.bind_tools
+    if capability == "tools":
+        return own_bind_tools
+    if capability == "structured_output":
+        return own_bind_tools or type(backend).with_structured_output is not BaseChatModel.with_structured_output
+    raise ValueError(f"Unknown capability '{capability}', expected one of: {', '.join(CAPABILITIES)}")
+
+
+class LLMRouter:
+    """Routes calls to the fastest healthy backend, with hedging and failover; thread-safe"""
+
+    def __init__(self, backends: Dict[str, Any], window: int = ROUTER_WINDOW,
+                 min_samples: int = ROUTER_MIN_SAMPLES, max_error_rate: float = ROUTER_MAX_ERROR_RATE,
+                 cooldown_seconds: float = ROUTER_COOLDOWN_SECONDS, hedge: bool = ROUTER_HEDGE,
+                 hedge_after_ms: float = ROUTER_HEDGE_AFTER_MS, max_decisions: int = ROUTER_DECISIONS):
+        """
+        Args:
+            backends: Backend name -> chat model, in order of preference
+        """
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = dict(backends)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.hedge = hedge
+        self.hedge_after_ms = hedge_after_ms
+        self.decisions: deque = deque(maxlen=max_decisions)
+        self.hedged_requests = 0
+        self.failed_requests = 0
+        self._health = {name: BackendHealth(window) for name in self.backends}
+        # Capability -> backends that cannot do it (known from their class, or learned from NotImplementedError)
+        self._unsupported = {
+            capability: {name for name, backend in self.backends.items()
+                         if isinstance(backend, BaseChatModel) and not supports(backend, capability)}
+            for capability in CAPABILITIES
+        }
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8 * len(self.backends), thread_name_prefix="llm-router")
+        self._background: set = set()
+
+    # Health
+
+    def _is_healthy(self, name: str, now: float) -> bool:
+        return now >= self._health[name].unhealthy_until
+
+    def _started(self, name: str) -> None:
+        with self._lock:
+            self._health[name].in_flight += 1
+
+    def _record_unsupported(self, name: str, capability: str) -> None:
+        """The backend cannot do the operation; this says nothing about its health"""
+        with self._lock:
+            self._health[name].in_flight -= 1
+            self._unsupported[capability].add(name)
+        logger.info(f"LLM backend '{name}' does not support {capability}, skipping it for such calls")
+
+    def _record(self, name: str, success: bool, latency_ms: float) -> None:
+        with self._lock:
+            health = self._health[name]
+            health.in_flight -= 1
+            health.calls += 1
+            health.outcomes.append(success)
+            if success:
+                health.latencies.append(latency_ms)
+                health.probation = False
+                return
+            health.errors += 1
+            # After a cooldown, the first failure (a failed probe) makes the backend unhealthy again
+            if health.probation or (
+                len(health.outcomes) >= self.min_samples and health.error_rate() > self.max_error_rate
+            ):
+                # Skip the backend for a while; it starts with a clean error window when probed again
+                health.unhealthy_until = time.monotonic() + self.cooldown_seconds
+                health.outcomes.clear()
+                health.probation = True
+                logger.warning(f"LLM backend '{name}' is unhealthy, skipping it for {self.cooldown_seconds:.0f}s")
+
+    def plan(self, capability: Optional[str] = None) -> Tuple[List[str], str]:
+        """
+        Order in which the backends are tried for the next request.
+
+        Args:
+            capability: Operation the request needs ("tools" or "structured_output"),
+                backends without it are left out
+
+        Returns:
+            (backend names, reason for the first one)
+
+        Raises:
+            NotImplementedError: No backend supports the capability
+        """
+        now = time.monotonic()
+        with self._lock:
+            names = [name for name in self.backends
+                     if capability is None or name not in self._unsupported[capability]]
+            if not names:
+                raise NotImplementedError(f"None of the LLM backends supports {capability}")
+            healthy = [name for name in names if self._is_healthy(name, now)]
+            unhealthy = sorted((name for name in names if name not in healthy),
+                               key=lambda name: self._health[name].unhealthy_until)
+
+            def rank(name: str) -> Tuple[int, float, int]:
+                health = self._health[name]
+                if len(health.latencies) >= self.min_samples:
+                    return 1, health.latency_ms(0.5), names.index(name)
+                # Unmeasured backends are explored one call at a time; one that has not answered yet goes last
+                return (0 if health.in_flight == 0 else 2), 0.0, names.index(name)
+
+            healthy.sort(key=rank)
+            if not healthy:
+                reason = "all_unhealthy"
+            elif len(healthy) == 1:
+                reason = "only_healthy"
+            elif rank(healthy[0])[0] != 1:
+                reason = "explore"
+            else:
+                reason = "fastest"
+        return healthy + unhealthy, reason
+
+    def _hedge_delay_seconds(self, name: str) -> float:
+        with self._lock:
+            health = self._health[name]
+            if len(health.latencies) >= self.min_samples:
+                return health.latency_ms(0.95) / 1000
+        return self.hedge_after_ms / 1000
+
+    def _decide(self, backend: str, order: List[str], reason: str, hedged: bool,
+                failovers: List[str], start: float) -> None:
+        decision = RoutingDecision(
+            backend=backend, order=order, reason=reason, hedged=hedged, failovers=failovers,
+            latency_ms=round((time.perf_counter() - start) * 1000, 2), timestamp=time.time()
+        )
+        with self._lock:
+            self._health[backend].wins += 1
+            self.hedged_requests += hedged
+            self.decisions.append(decision)
+        logger.info(f"LLM routed to '{backend}' ({reason}{', hedged' if hedged else ''}"
+                    f"{', after ' + ', '.join(failovers) + ' failed' if failovers else ''}) in {decision.latency_ms}ms")
+
+    # Calls
+
+    def _timed_call(self, name: str, call: Callable[[str, Any], Any], capability: Optional[str],
+                    started: threading.Event) -> Any:
+        self._started(name)
+        started.set()
+        start = time.perf_counter()
+        try:
+            result = call(name, self.backends[name])
+        except NotImplementedError:
+            if capability is None:
+                self._record(name, False, (time.perf_counter() - start) * 1000)
+            else:
+                self._record_unsupported(name, capability)
+            raise
+        except BaseException:
+            self._record(name, False, (time.perf_counter() - start) * 1000)
+            raise
+        self._record(name, True, (time.perf_counter() - start) * 1000)
+        return result
+
+    def run(self, call: Callable[[str, Any], Any], capability: Optional[str] = None) -> Any:
+        """
+        Run a call on the best backend, hedging and failing over as configured.
+
+        Args:
+            call: Function of (backend name, chat model) making the request
+            capability: Operation the call needs, see plan()
+
+        Returns:
+            The first successful result
+
+        Raises:
+            The last backend error when every backend failed
+        """
+        order, reason = self.plan(capability)
+        remaining = list(order)
+        pending: Dict[Any, str] = {}
+        started: Dict[Any, threading.Event] = {}
+        failovers: List[str] = []
+        hedged = False
+        last_error: Optional[Exception] = None
+        start = time.perf_counter()
+
+        def launch() -> None:
+            name = remaining.pop(0)
+            event = threading.Event()
+            # Callbacks and request-scoped metrics follow the call into the worker thread
+            future = self._executor.submit(contextvars.copy_context().run, self._timed_call, name, call,
+                                           capability, event)
+            pending[future] = name
+            started[future] = event
+
+        launch()
+        hedge_at = None
+        while pending:
+            timeout = None
+            if self.hedge and not hedged and remaining and len(pending) == 1:
+                if hedge_at is None:
+                    # Time spent waiting for a worker thread does not count towards the hedge delay
+                    future = next(iter(pending))
+                    started[future].wait()
+                    hedge_at = time.perf_counter() + self._hedge_delay_seconds(pending[future])
+                timeout = max(0.0, hedge_at - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                launch()
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    failovers.append(name)
+                    if remaining:
+                        # Replace the failed request right away, even while a hedged one is still running
+                        hedge_at = None
+                        launch()
+                    continue
+                # A hedged request still waiting for a worker is not needed anymore
+                for other in pending:
+                    other.cancel()
+                self._decide(name, order, reason, hedged, failovers, start)
+                return result
+
+        with self._lock:
+            self.failed_requests += 1
+        raise last_error
+
+    async def _atimed_call(self, name: str, call: Callable[[str, Any], Awaitable[Any]],
+                           capability: Optional[str]) -> Any:
+        self._started(name)
+        start = time.perf_counter()
+        try:
+            result = await call(name, self.backends[name])
+        except NotImplementedError:
+            if capability is None:
+                self._record(name, False, (time.perf_counter() - start) * 1000)
+            else:
+                self._record_unsupported(name, capability)
+            raise
+        except BaseException:
+            # Includes cancellation when the event loop shuts down
+            self._record(name, False, (time.perf_counter() - start) * 1000)
+            raise
+        self._record(name, True, (time.perf_counter() - start) * 1000)
+        return result
+
+    async def arun(self, call: Callable[[str, Any], Awaitable[Any]], capability: Optional[str] = None) -> Any:
+        """Async version of run(); call returns an awaitable"""
+        order, reason = self.plan(capability)
+        remaining = list(order)
+        pending: Dict[Any, str] = {}
+        failovers: List[str] = []
+        hedged = False
+        last_error: Optional[Exception] = None
+        start = time.perf_counter()
+
+        def launch() -> None:
+            name = remaining.pop(0)
+            task = asyncio.ensure_future(self._atimed_call(name, call, capability))
+            # Keep the slower hedged request alive after the first answer, so its latency is recorded
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            pending[task] = name
+
+        launch()
+        hedge_at = start + self._hedge_delay_seconds(order[0])
+        while pending:
+            timeout = None
+            if self.hedge and not hedged and remaining and len(pending) == 1:
+                timeout = max(0.0, hedge_at - time.perf_counter())
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                launch()
+                continue
+            for task in done:
+                name = pending.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    failovers.append(name)
+                    if remaining:
+                        # Replace the failed request right away, even while a hedged one is still running
+                        hedge_at = time.perf_counter() + self._hedge_delay_seconds(remaining[0])
+                        launch()
+                    continue
+                self._decide(name, order, reason, hedged, failovers, start)
+                return task.result()
+
+        with self._lock:
+            self.failed_requests += 1
+        raise last_error
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-backend health and the most recent routing decisions"""
+        now = time.monotonic()
+        with self._lock:
+            backends = {
+                name: {
+                    "healthy": self._is_healthy(name, now),
+                    "calls": health.calls,
+                    "in_flight": health.in_flight,
+                    "errors": health.errors,
+                    "error_rate": health.error_rate(),
+                    "p50_ms": health.latency_ms(0.5),
+                    "p95_ms": health.latency_ms(0.95),
+                    "wins": health.wins,
+                    "unsupported": [capability for capability in CAPABILITIES
+                                    if name in self._unsupported[capability]],
+                }
+                for name, health in self._health.items()
+            }
+            return {
+                "backends": backends,
+                "requests": sum(health.wins for health in self._health.values()) + self.failed_requests,
+                "hedged_requests": self.hedged_requests,
+                "failed_requests": self.failed_requests,
+                "recent_decisions": [decision.model_dump() for decision in list(self.decisions)[-10:]],
+            }
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    Chat model that sends every call through an LLMRouter.
+
+    Tools and structured output are bound on each backend with its own
+    implementation, so provider-specific formats keep working. A temperature
+    is passed on to every backend that has one. The backend that answered is
+    in response_metadata["llm_backend"].
+    """
+
+    router: Any = Field(exclude=True)
+    # None keeps each backend's own temperature
+    temperature: Optional[float] = None
+
+    _tempered: Dict[Tuple[str, float], Any] = PrivateAttr(default_factory=dict)
+    _bound: Dict[Tuple[str, Optional[float], int], Any] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    def _backend(self, name: str, backend: Any) -> Any:
+        """The backend with this model's temperature, if both have one (copied once per backend and temperature)"""
+        if self.temperature is None or not hasattr(backend, "temperature"):
+            return backend
+        # Copies of this model (e.g. speculative candidates) share the dict, hence the temperature in the key
+        key = (name, self.temperature)
+        if key not in self._tempered:
+            self._tempered[key] = backend.model_copy(update={"temperature": self.temperature})
+        return self._tempered[key]
+
+    def _runnable(self, name: str, backend: Any, tools: Optional[List[Any]], tool_kwargs: Dict[str, Any]) -> Any:
+        """The backend, with the tools bound (once per backend, temperature and tool list)"""
+        backend = self._backend(name, backend)
+        if not tools:
+            return backend
+        key = (name, self.temperature, id(tools))
+        if key not in self._bound:
+            self._bound[key] = (tools, backend.bind_tools(tools, **tool_kwargs))
+        return self._bound[key][1]
+
+    @staticmethod
+    def _chat_result(name: str, message: Any) -> ChatResult:
+        message.response_metadata = {**message.response_metadata, "llm_backend": name}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.pop("routed_tools", None)
+        tool_kwargs = kwargs.pop("routed_tool_kwargs", {})
+
+        def call(name: str, backend: Any) -> ChatResult:
+            message = self._runnable(name, backend, tools, tool_kwargs).invoke(messages, stop=stop, **kwargs)
+            return self._chat_result(name, message)
+
+        return self.router.run(call, "tools" if tools else None)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.pop("routed_tools", None)
+        tool_kwargs = kwargs.pop("routed_tool_kwargs", {})
+
+        async def call(name: str, backend: Any) -> ChatResult:
+            message = await self._runnable(name, backend, tools, tool_kwargs).ainvoke(messages, stop=stop, **kwargs)
+            return self._chat_result(name, message)
+
+        return await self.router.arun(call, "tools" if tools else None)
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """Bind tools; each backend converts them to its own format when it is called"""
+        return self.bind(routed_tools=list(tools), routed_tool_kwargs=kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        """Return a runnable producing schema instances from the routed backend"""
+        structured: Dict[str, Any] = {}
+
+        def invoke(input: Any) -> Any:
+            def call(name: str, backend: Any) -> Any:
+                if name not in structured:
+                    structured[name] = self._backend(name, backend).with_structured_output(schema, **kwargs)
+                return structured[name].invoke(input)
+
+            return self.router.run(call, "structured_output")
+
+        return RunnableLambda(invoke)
+
+
+# One router per Gemini model name, shared by every agent of the process so health is measured once
+_routers: Dict[str, LLMRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_llm_router(model: str = "gemini-2.5-flash", **kwargs: Any) -> LLMRouter:
+    """
+    The process-wide router over LLM_ROUTER_BACKENDS.
+
+    Backends that cannot be created (missing package or configuration) are
+    left out with a warning.
+
+    Args:
+        model: Gemini model name
+        **kwargs: Extra arguments for the Gemini model
+
+    Returns:
+        LLMRouter
+    """
+    from llm_factory import create_backend
+
+    with _routers_lock:
+        if model not in _routers:
+            backends = {}
+            for name in ROUTER_BACKENDS:
+                try:
+                    backends[name] = create_backend(name, model, **kwargs)
+                except Exception as e:
+                    logger.warning(f"LLM backend '{name}' is not available: {e}")
+            if not backends:
+                raise ValueError(f"None of the LLM router backends could be created: {', '.join(ROUTER_BACKENDS)}")
+            _routers[model] = LLMRouter(backends)
+        return _routers[model]
+
+
+def get_router_stats() -> Dict[str, Any]:
+    """Summary of every router in use, by Gemini model name"""
+    with _routers_lock:
+        routers = dict(_routers)
+    return {model: router.summary() for model, router in routers.items()}
@@ -0,0 +1,352 @@
+"""
+SQL Execution API Load Test - Saturation sweep with a DVD Rental workload mix
+
+Replays a weighted mix of requests against sql_execution_api.py:
+- point lookups on film, rental and payment by primary key
+- joins (rental history of a customer, payments with their film)
+- aggregates (revenue per staff / month, rentals per category)
+- occasional GET /tables and GET /schema/{table} calls
+
+Two load models are supported:
+- closed loop: N clients send requests back to back; sweeps the concurrency
+- open loop: requests arrive at a fixed rate (Poisson, seeded) whether or not
+  earlier ones finished; sweeps the rate. Latency is measured from the
+  scheduled arrival, so queueing in front of a saturated server is included.
+
+For every level the throughput, error rate (HTTP errors, timeouts and
+unsuccessful /execute results) and p50/p95/p99 latency are printed, plus the
+saturation point of the sweep. Results can be saved as JSON.
+
+The target is a running API on a local database, e.g. a DVD Rental database
+recreated from the dvd_rental_complete.sql script of create_complete_db.py:
+    psql -d dvdrental -f dvd_rental_complete.sql
+    python sql_execution_api.py
+    python load_test_sql_api.py --mode closed --levels 1,2,4,8,16,32 --duration 20
+    python load_test_sql_api.py --mode open --levels 10,25,50,100,200 --output load.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+
+from pipeline_metrics import percentile
+
+
+DEFAULT_API_URL = "http://localhost:8001"
+REQUEST_TIMEOUT_SECONDS = 30
+
+# (name, weight, method, path, SQL template); placeholders are filled from the id bounds
+WORKLOAD = [
+    ("film_by_id", 20, "POST", "/execute",
+     "SELECT film_id, title, release_year, rental_rate, length, rating FROM film WHERE film_id = {film_id};"),
+    ("rental_by_id", 15, "POST", "/execute",
+     "SELECT rental_id, rental_date, inventory_id, customer_id, return_date FROM rental WHERE rental_id = {rental_id};"),
+    ("payment_by_id", 15, "POST", "/execute",
+     "SELECT payment_id, customer_id, rental_id, amount, payment_date FROM payment WHERE payment_id = {payment_id};"),
+    ("customer_rentals", 12, "POST", "/execute",
+     "SELECT f.title, r.rental_date, r.return_date FROM rental r "
+     "JOIN inventory i ON r.inventory_id = i.inventory_id JOIN film f ON i.film_id = f.film_id "
+     "WHERE r.customer_id = {customer_id} ORDER BY r.rental_date DESC LIMIT 20;"),
+    ("customer_payments", 10, "POST", "/execute",
+     "SELECT p.payment_date, p.amount, f.title FROM payment p "
+     "JOIN rental r ON p.rental_id = r.rental_id JOIN inventory i ON r.inventory_id = i.inventory_id "
+     "JOIN film f ON i.film_id = f.film_id WHERE p.customer_id = {customer_id} ORDER BY p.payment_date;"),
+    ("revenue_by_staff", 8, "POST", "/execute",
+     "SELECT staff_id, COUNT(*) AS payments, SUM(amount) AS revenue FROM payment GROUP BY staff_id;"),
+    ("revenue_by_month", 8, "POST", "/execute",
+     "SELECT date_trunc('month', payment_date) AS month, SUM(amount) AS revenue "
+     "FROM payment GROUP BY month ORDER BY month;"),
+    ("rentals_by_category", 7, "POST", "/execute",
+     "SELECT c.name, COUNT(*) AS rentals FROM rental r "
+     "JOIN inventory i ON r.inventory_id = i.inventory_id JOIN film_category fc ON i.film_id = fc.film_id "
+     "JOIN category c ON fc.category_id = c.category_id GROUP BY c.name ORDER BY rentals DESC;"),
+    ("schema", 4, "GET", "/schema/{table}", None),
+    ("tables", 1, "GET", "/tables", None),
+]
+
+SCHEMA_TABLES = ("film", "rental", "payment", "customer", "inventory")
+
+_BOUNDS_SQL = (
+    "SELECT (SELECT MAX(film_id) FROM film) AS film_id, (SELECT MAX(rental_id) FROM rental) AS rental_id, "
+    "(SELECT MAX(payment_id) FROM payment) AS payment_id, (SELECT MAX(customer_id) FROM customer) AS customer_id;"
+)
+
+
+def fetch_id_bounds(api_url: str) -> Dict[str, int]:
+    """
+    Get the highest ids of the looked-up tables, so lookups hit existing rows.
+
+    Raises:
+        RuntimeError: If the API or the database is not usable
+    """
+    response = requests.post(f"{api_url}/execute", json={"sql": _BOUNDS_SQL}, timeout=REQUEST_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    result = response.json()
+    if not result["success"] or not result["result"]:
+        raise RuntimeError(f"Could not read id bounds: {result.get('error')}")
+    bounds = result["result"][0]
+    if any(value is None for value in bounds.values()):
+        raise RuntimeError("The DVD Rental tables are empty; seed the database first")
+    return bounds
+
+
+class Workload:
+    """Seeded generator of weighted requests"""
+
+    def __init__(self, bounds: Dict[str, int], seed: int = 0):
+        self.bounds = bounds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._weights = [weight for _, weight, _, _, _ in WORKLOAD]
+
+    def next_request(self) -> Tuple[str, str, str, Optional[Dict[str, str]]]:
+        """Pick the next request as (operation, method, path, JSON body)"""
+        with self._lock:
+            name, _, method, path, sql_template = self._random.choices(WORKLOAD, weights=self._weights)[0]
+            values = {key: self._random.randint(1, upper) for key, upper in self.bounds.items()}
+            values["table"] = self._random.choice(SCHEMA_TABLES)
+
+        if sql_template is None:
+            return name, method, path.format(**values), None
+        return name, method, path, {"sql": sql_template.format(**values), "description": f"load test: {name}"}
+
+
+_sessions = threading.local()
+
+
+def send_request(api_url: str, method: str, path: str, body: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Send one request over the calling thread's keep-alive session.
+
+    Returns:
+        None on success, otherwise a short error description
+    """
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+
+    try:
+        response = session.request(method, f"{api_url}{path}", json=body, timeout=REQUEST_TIMEOUT_SECONDS)
+    except requests.exceptions.Timeout:
+        return "timeout"
+    except requests.exceptions.RequestException as e:
+        return type(e).__name__
+
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    if path == "/execute" and not response.json().get("success"):
+        return "SQL error"
+    return None
+
+
+class LevelRecorder:
+    """Thread-safe samples of one load level"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Tuple[str, float, Optional[str]]] = []
+
+    def add(self, operation: str, latency_ms: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.samples.append((operation, latency_ms, error))
+
+
+def summarize_level(mode: str, level: float, samples: List[Tuple[str, float, Optional[str]]],
+                    duration_seconds: float) -> Dict[str, Any]:
+    """
+    Aggregate the samples of one level.
+
+    Args:
+        mode: "closed" or "open"
+        level: Concurrency (closed) or offered requests per second (open)
+        samples: (operation, latency ms, error) per request
+        duration_seconds: Measurement window
+
+    Returns:
+        Throughput, error rate, latency percentiles and a per-operation breakdown
+    """
+    def latency_stats(latencies: List[float]) -> Dict[str, float]:
+        ordered = sorted(latencies)
+        return {
+            "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50), 2),
+            "p95": round(percentile(ordered, 0.95), 2),
+            "p99": round(percentile(ordered, 0.99), 2),
+        }
+
+    errors = [error for _, _, error in samples if error]
+    operations = {}
+    for name in sorted({operation for operation, _, _ in samples}):
+        selected = [(latency, error) for operation, latency, error in samples if operation == name]
+        operations[name] = {
+            "requests": len(selected),
+            "errors": sum(1 for _, error in selected if error),
+            "latency_ms": latency_stats([latency for latency, _ in selected]),
+        }
+
+    return {
+        "mode": mode,
+        "level": level,
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "error_types": {error: errors.count(error) for error in sorted(set(errors))},
+        "throughput_rps": round((len(samples) - len(errors)) / duration_seconds, 2) if duration_seconds > 0 else 0.0,
+        "latency_ms": latency_stats([latency for _, latency, _ in samples]),
+        "operations": operations,
+    }
+
+
+def run_closed_loop(api_url: str, workload: Workload, concurrency: int,
+                    duration_seconds: float, warmup_seconds: float) -> Dict[str, Any]:
+    """Run `concurrency` clients sending back-to-back requests; warmup requests are not recorded"""
+    recorder = LevelRecorder()
+    measure_start = time.perf_counter() + warmup_seconds
+    deadline = measure_start + duration_seconds
+
+    def client():
+        while True:
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            operation, method, path, body = workload.next_request()
+            error = send_request(api_url, method, path, body)
+            if start >= measure_start:
+                recorder.add(operation, (time.perf_counter() - start) * 1000, error)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Requests still in flight at the deadline finish after it; count the actual window
+    window = max(duration_seconds, time.perf_counter() - measure_start)
+    return summarize_level("closed", concurrency, recorder.samples, window)
+
+
+def run_open_loop(api_url: str, workload: Workload, rate: float, duration_seconds: float,
+                  warmup_seconds: float, max_workers: int, seed: int = 0) -> Dict[str, Any]:
+    """Send Poisson arrivals at `rate` per second; latency includes waiting for a free worker"""
+    recorder = LevelRecorder()
+    arrivals = random.Random(seed)
+    start = time.perf_counter()
+    measure_start = start + warmup_seconds
+    deadline = measure_start + duration_seconds
+
+    def timed_request(scheduled: float, operation: str, method: str, path: str, body: Optional[Dict[str, str]]):
+        error = send_request(api_url, method, path, body)
+        if scheduled >= measure_start:
+            recorder.add(operation, (time.perf_counter() - scheduled) * 1000, error)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load") as executor:
+        scheduled = start
+        while True:
+            scheduled += arrivals.expovariate(rate)
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(timed_request, scheduled, *workload.next_request())
+
+    # The server keeps up if it completes the arrivals of the window within about the window
+    window = max(duration_seconds, time.perf_counter() - measure_start)
+    result = summarize_level("open", rate, recorder.samples, window)
+    result["offered_rps"] = round(len(recorder.samples) / duration_seconds, 2)
+    return result
+
+
+def find_saturation(levels: List[Dict[str, Any]], max_error_rate: float = 0.01) -> Optional[Dict[str, Any]]:
+    """
+    Find the saturation point of a sweep.
+
+    Closed loop: the level with the highest throughput. Open loop: the highest
+    rate that was served (throughput within 95% of the arrivals actually
+    offered) with an acceptable error rate.
+
+    Returns:
+        The level result, or None if no level qualifies
+    """
+    healthy = [level for level in levels if level["error_rate"] <= max_error_rate]
+    if not healthy:
+        return None
+    if healthy[0]["mode"] == "closed":
+        return max(healthy, key=lambda level: level["throughput_rps"])
+    served = [level for level in healthy if level["throughput_rps"] >= 0.95 * level["offered_rps"]]
+    return max(served, key=lambda level: level["level"]) if served else None
+
+
+def format_levels(levels: List[Dict[str, Any]]) -> str:
+    """Sweep results as a plain text table"""
+    header = "concurrency" if levels and levels[0]["mode"] == "closed" else "rate/s"
+    lines = [f"{header:>12}{'requests':>10}{'rps':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for level in levels:
+        latency = level["latency_ms"]
+        lines.append(
+            f"{level['level']:>12}{level['requests']:>10}{level['throughput_rps']:>10}"
+            f"{level['error_rate']:>9.2%}{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the SQL execution API")
+    parser.add_argument("--url", default=DEFAULT_API_URL, help="SQL execution API base URL")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed",
+                        help="closed: sweep concurrency, open: sweep arrival rate")
+    parser.add_argument("--levels", default=None,
+                        help="Comma-separated concurrencies (closed) or rates per second (open)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--max-workers", type=int, default=256, help="Open loop: concurrent requests in flight")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request mix and arrivals")
+    parser.add_argument("--output", help="Save the results as JSON")
+    args = parser.parse_args()
+
+    default_levels = "1,2,4,8,16,32" if args.mode == "closed" else "10,25,50,100,200"
+    levels = [float(value) for value in (args.levels or default_levels).split(",") if value.strip()]
+
+    try:
+        bounds = fetch_id_bounds(args.url)
+    except Exception as e:
+        print(f"❌ SQL execution API at {args.url} is not usable: {e}")
+        return 2
+    print(f"🎯 Target {args.url}, id bounds {bounds}")
+
+    results = []
+    for level in levels:
+        workload = Workload(bounds, args.seed)
+        if args.mode == "closed":
+            print(f"🚀 Closed loop, concurrency {int(level)} for {args.duration}s")
+            results.append(run_closed_loop(args.url, workload, int(level), args.duration, args.warmup))
+        else:
+            print(f"🚀 Open loop, {level} requests/s for {args.duration}s")
+            results.append(run_open_loop(args.url, workload, level, args.duration, args.warmup,
+                                         args.max_workers, args.seed))
+
+    print()
+    print(format_levels(results))
+    saturation = find_saturation(results)
+    if saturation:
+        print(f"\n📈 Saturation: {saturation['throughput_rps']} requests/s at {saturation['mode']} loop "
+              f"level {saturation['level']} (p99 {saturation['latency_ms']['p99']} ms)")
+    else:
+        print("\n⚠️ No level stayed within the error and throughput limits")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "mode": args.mode, "duration_seconds": args.duration,
+                       "seed": args.seed, "levels": results, "saturation": saturation}, f, indent=2, default=str)
+        print(f"💾 Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
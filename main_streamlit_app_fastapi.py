@@ -2,6 +2,8 @@ import streamlit as st
 import requests
 import json
 import time
+import uuid
+from node_stream import SSE_MEDIA_TYPE, parse_sse
 
 # Configure the Streamlit page
 st.set_page_config(
@@ -117,6 +119,60 @@ def query_api(message: str):
         }
 
 
+def query_api_stream(message: str, on_event):
+    """Send query to FastAPI backend in streaming mode, passing each pipeline step to on_event"""
+    try:
+        with requests.post(
+            f"{FASTAPI_URL}/query",
+            json={"message": message, "stream": True, "thread_id": st.session_state.thread_id},
+            stream=True,
+            timeout=30
+        ) as response:
+            if response.status_code != 200:
+                return {
+                    "success": False,
+                    "result": "",
+                    "error": f"API returned status code: {response.status_code}"
+                }
+            if not response.headers.get("content-type", "").startswith(SSE_MEDIA_TYPE):
+                # Backend without streaming support answered with a plain response
+                return response.json()
+
+            api_response = {"success": False, "result": "", "error": "Stream ended before the result", "sql_query": ""}
+            for event in parse_sse(response.iter_lines(decode_unicode=True)):
+                on_event(event)
+                if event["event"] in ("sql", "checked_sql"):
+                    api_response["sql_query"] = event["sql_query"]
+                elif event["event"] == "result":
+                    api_response.update(success=True, result=event["result"], error="")
+                elif event["event"] == "error":
+                    api_response.update(success=False, error=event["error"])
+            return api_response
+    except requests.exceptions.ConnectionError:
+        return {
+            "success": False,
+            "result": "",
+            "error": "Cannot connect to FastAPI backend"
+        }
+    except requests.exceptions.Timeout:
+        return {
+            "success": False,
+            "result": "",
+            "error": "Request timed out"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "result": "",
+            "error": f"Error querying API: {str(e)}"
+        }
+
+
+def clean_sql(sql_query: str) -> str:
+    """Remove markdown code fences around a generated query"""
+    return sql_query.replace("```sql", "").replace("```", "").strip()
+
+
 def get_tables():
     """Get list of tables from API"""
     try:
@@ -196,6 +252,9 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 if "query_input" not in st.session_state:
     st.session_state.query_input = ""
+if "thread_id" not in st.session_state:
+    # Conversation id: the backend gives follow-up questions the earlier ones as context
+    st.session_state.thread_id = uuid.uuid4().hex
 
 # Main content area
 col1, col2 = st.columns([2, 1])
@@ -232,14 +291,25 @@ with col1:
                     "timestamp": time.time()
                 })
                 
-                # Query the API
-                api_response = query_api(query)
+                # Query the API; the SQL is shown as soon as it is generated
+                sql_placeholder = st.empty()
+                status_placeholder = st.empty()
+
+                def show_event(event):
+                    if event["event"] in ("sql", "checked_sql"):
+                        sql_placeholder.code(clean_sql(event["sql_query"]), language="sql")
+                        status_placeholder.info(f"⏳ SQL ready after {event['elapsed_ms'] / 1000:.1f}s, running the query...")
+                    elif event["event"] == "result":
+                        status_placeholder.success(f"✅ Result after {event['elapsed_ms'] / 1000:.1f}s")
+
+                api_response = query_api_stream(query, show_event)
                 
                 if api_response["success"]:
                     # Add successful result to chat history
                     st.session_state.chat_history.append({
                         "type": "answer", 
                         "content": api_response["result"],
+                        "sql_query": clean_sql(api_response.get("sql_query", "")),
                         "timestamp": time.time()
                     })
                 else:
@@ -271,6 +341,7 @@ with col1:
     if clear_button:
         st.session_state.chat_history = []
         st.session_state.query_input = ""
+        st.session_state.thread_id = uuid.uuid4().hex
         st.rerun()
 
 with col2:
@@ -321,6 +392,8 @@ if st.session_state.chat_history:
                 {item['content']}
             </div>
             """, unsafe_allow_html=True)
+            if item.get("sql_query"):
+                st.code(item["sql_query"], language="sql")
             
         elif item["type"] == "error":
             st.markdown(f"""
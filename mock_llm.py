@@ -0,0 +1,250 @@
+"""
+Mock LLM - Offline, deterministic chat model for benchmarks and CI
+
+Replays recorded question -> SQL responses from a JSONL fixture file so the
+NL to SQL pipelines can run without a Gemini or Bedrock endpoint. Latency and
+token counts are synthetic and configurable, which makes the pipelines' own
+overhead measurable.
+
+The model behaves like the real ones in the ways the agents rely on:
+- invoke / ainvoke / stream with usage_metadata
+- bind_tools, answering with a tool call to the SQL execution tool and then
+  summarizing the tool result (create_react_agent loops)
+- with_structured_output, filling query/sql fields of the schema
+- numbered multi-question requests ("-- Query <n>" answers) for batches
+
+Questions are matched case- and whitespace-insensitively anywhere in the
+conversation. The match that ends last wins, so the question being asked
+takes precedence over few-shot example questions placed before it.
+
+Fixture format (one JSON object per line):
+    {"question": "How many actors are in the database?", "sql": "SELECT COUNT(*) FROM actor;"}
+
+Configuration:
+- MOCK_LLM_FIXTURES: Fixture file (default fixtures/mock_llm_responses.jsonl)
+- MOCK_LLM_LATENCY_MS: Delay before the first token (default 0)
+- MOCK_LLM_LATENCY_JITTER_MS: Random extra delay, seeded (default 0)
+- MOCK_LLM_TOKEN_LATENCY_MS: Delay per streamed chunk (default 0)
+- MOCK_LLM_INPUT_TOKENS / MOCK_LLM_OUTPUT_TOKENS: Fixed token counts
+  reported per call, 0 estimates them from the text length (default 0)
+- MOCK_LLM_SEED: Seed of the latency jitter (default 0)
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+from pydantic import Field, PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mock_llm_responses.jsonl")
+UNKNOWN_QUESTION_SQL = "SELECT 'No mock response recorded for this question' AS message;"
+
+_SQL_START_PATTERN = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|VALUES|TABLE|SHOW|EXPLAIN)\b", re.IGNORECASE)
+_NUMBERED_QUERY_PATTERN = re.compile(r"^\s*(\d+)\.\s+(.+?)\s*$", re.MULTILINE)
+_QUERY_FIELD_NAMES = ("query", "sql", "sql_query")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("?", " ").split())
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Text of a message whose content is a string or a list of content blocks"""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content
+    )
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def load_fixtures(path: str) -> Dict[str, str]:
+    """
+    Load question -> SQL fixtures.
+
+    Args:
+        path: JSONL file with question and sql keys
+
+    Returns:
+        Mapping of normalized question to SQL
+    """
+    fixtures = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                fixtures[_normalize(record["question"])] = record["sql"]
+    return fixtures
+
+
+class MockChatModel(BaseChatModel):
+    """Chat model that replays fixture SQL with synthetic latency and token usage"""
+
+    fixtures_path: str = Field(default_factory=lambda: os.getenv("MOCK_LLM_FIXTURES", DEFAULT_FIXTURES_PATH))
+    latency_ms: float = Field(default_factory=lambda: float(os.getenv("MOCK_LLM_LATENCY_MS", "0")))
+    latency_jitter_ms: float = Field(default_factory=lambda: float(os.getenv("MOCK_LLM_LATENCY_JITTER_MS", "0")))
+    token_latency_ms: float = Field(default_factory=lambda: float(os.getenv("MOCK_LLM_TOKEN_LATENCY_MS", "0")))
+    input_tokens: int = Field(default_factory=lambda: int(os.getenv("MOCK_LLM_INPUT_TOKENS", "0")))
+    output_tokens: int = Field(default_factory=lambda: int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "0")))
+    seed: int = Field(default_factory=lambda: int(os.getenv("MOCK_LLM_SEED", "0")))
+    temperature: float = 0.0
+
+    _fixtures: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _random: random.Random = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._fixtures = load_fixtures(self.fixtures_path)
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    # Response selection
+
+    def _find_sql(self, text: str) -> Optional[str]:
+        """SQL of the fixture question that ends last in the text (the longest one on ties)"""
+        normalized = _normalize(text)
+        best_question, best_key = None, None
+        for question in self._fixtures:
+            position = normalized.rfind(question)
+            if position != -1 and (best_key is None or (position + len(question), len(question)) > best_key):
+                best_question, best_key = question, (position + len(question), len(question))
+        return self._fixtures[best_question] if best_question else None
+
+    def _answer_text(self, messages: List[BaseMessage]) -> str:
+        """Text answer for a conversation without a pending tool call"""
+        conversation = "\n".join(_message_text(message) for message in messages)
+        last_text = _message_text(messages[-1]) if messages else ""
+
+        # Batch requests list numbered questions and expect "-- Query <n>" sections
+        if "-- Query <number>" in last_text:
+            sections = []
+            for number, question in _NUMBERED_QUERY_PATTERN.findall(last_text):
+                sections.append(f"-- Query {number}\n{self._find_sql(question) or UNKNOWN_QUESTION_SQL}")
+            return "\n".join(sections)
+
+        # Query checkers pass the query to review after a "Query:" line; it is returned unchanged
+        if "\nQuery:\n" in last_text:
+            return last_text.rsplit("\nQuery:\n", 1)[1].strip()
+
+        sql_query = self._find_sql(conversation)
+        if sql_query is None:
+            logger.warning("Mock LLM has no fixture for this conversation, answering with a placeholder query")
+            return UNKNOWN_QUESTION_SQL
+        return f"```sql\n{sql_query}\n```"
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]] = None) -> AIMessage:
+        """Build the response, including tool calls when execution tools are bound"""
+        conversation = "\n".join(_message_text(message) for message in messages)
+        input_tokens = self.input_tokens or _estimate_tokens(conversation)
+
+        execution_tools = [
+            tool["function"]["name"] for tool in tools or [] if "exec" in tool["function"]["name"]
+        ]
+
+        if messages and isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=f"The query returned: {_message_text(messages[-1])}")
+        elif execution_tools:
+            # Execute the most recent SQL in the conversation, or the recorded SQL for the question
+            sql_query = next(
+                (_message_text(m) for m in reversed(messages) if _SQL_START_PATTERN.match(_message_text(m))),
+                self._find_sql(conversation) or UNKNOWN_QUESTION_SQL
+            )
+            message = AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": execution_tools[0],
+                    "args": {"query": sql_query},
+                    "id": f"call_mock_{len(messages)}",
+                    "type": "tool_call",
+                }]
+            )
+        else:
+            message = AIMessage(content=self._answer_text(messages))
+
+        output_text = message.content or json.dumps([call["args"] for call in message.tool_calls])
+        output_tokens = self.output_tokens or _estimate_tokens(output_text)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return message
+
+    def _latency_seconds(self) -> float:
+        jitter = self._random.uniform(0, self.latency_jitter_ms) if self.latency_jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    # BaseChatModel interface
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._latency_seconds())
+        message = self._respond(messages, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._latency_seconds())
+        message = self._respond(messages, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[Any] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._latency_seconds())
+        message = self._respond(messages, kwargs.get("tools"))
+
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0
+                } for call in message.tool_calls],
+                usage_metadata=message.usage_metadata
+            ))
+            return
+
+        # Word-sized chunks; usage is reported once, on the last chunk
+        pieces = re.findall(r"\S+\s*|\s+", message.content) or [""]
+        for i, piece in enumerate(pieces):
+            if self.token_latency_ms:
+                time.sleep(self.token_latency_ms / 1000)
+            usage = message.usage_metadata if i == len(pieces) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """Bind tools in OpenAI format, like the provider chat models"""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        """
+        Return a runnable producing schema instances.
+
+        String fields named query, sql or sql_query receive the SQL answer.
+        """
+        def to_schema(message: AIMessage) -> Any:
+            sql_query = message.content.replace("```sql", "").replace("```", "").strip()
+            values = {name: sql_query for name in schema.model_fields if name in _QUERY_FIELD_NAMES}
+            return schema(**values)
+
+        return self | RunnableLambda(to_schema)
@@ -0,0 +1,169 @@
+"""
+Node Stream - Server-Sent Events of LangGraph node outputs
+
+process_query() iterates graph.stream() but only returns the final answer,
+so clients wait for the whole pipeline before seeing anything. The node
+stream turns each node output into an event as soon as the node completes:
+
+- sql: query generated by query_gen
+- checked_sql: query after query_check
+- result: formatted answer and raw rows from query_execute
+- summary: optional LLM summary of the result
+- done: per-node timings and the total time
+- error: the pipeline failed; no further events follow
+
+Every event carries node_ms (time spent in that node) and elapsed_ms (time
+since the request started). The graph runs in a worker thread that feeds a
+queue, so the request-scoped result capture stays in one context and a
+client that disconnects stops the pipeline after the running node.
+
+Events are sent as text/event-stream, one JSON object per event:
+
+    event: sql
+    data: {"event": "sql", "node": "query_gen", "sql_query": "...", "node_ms": 812.4, "elapsed_ms": 812.4}
+"""
+
+import json
+import time
+import queue
+import threading
+import contextvars
+from typing import Any, Dict, Iterable, Iterator, Optional
+from conversation_store import conversation_inputs, record_turn
+from direct_execution import RESULT_SUMMARY_TIMEOUT, start_summary
+from result_capture import capture_request
+
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Node name -> (event name, field holding the node's last message)
+NODE_EVENTS = {
+    "query_gen": ("sql", "sql_query"),
+    "query_check": ("checked_sql", "sql_query"),
+    "query_execute": ("result", "result"),
+}
+
+_END = object()
+
+
+def _run_graph(graph: Any, message: str, llm: Optional[Any], summarize: bool, thread_id: Optional[str],
+               events: "queue.Queue", stop: threading.Event) -> None:
+    """Stream the graph and put one event per node output on the queue"""
+    start = last = time.perf_counter()
+    timings: Dict[str, float] = {}
+    sql_query = ""
+    result = None
+
+    def timed(event: Dict[str, Any], node: str) -> Dict[str, Any]:
+        nonlocal last
+        now = time.perf_counter()
+        event["node_ms"] = round((now - last) * 1000, 2)
+        event["elapsed_ms"] = round((now - start) * 1000, 2)
+        timings[node] = timings.get(node, 0.0) + event["node_ms"]
+        last = now
+        return event
+
+    try:
+        with capture_request() as capture:
+            for output in graph.stream(conversation_inputs(message, thread_id)):
+                for node, value in output.items():
+                    if value is None:
+                        continue
+                    content = value["messages"][-1].content
+                    event_name, field = NODE_EVENTS.get(node, ("node", "content"))
+                    event = {"event": event_name, "node": node, field: content}
+                    if field == "sql_query":
+                        sql_query = content
+                    if node == "query_execute":
+                        result = content
+                        event["json_result"] = capture.raw_result
+                    events.put(timed(event, node))
+                if stop.is_set():
+                    return
+        if result is not None:
+            record_turn(thread_id, message, sql_query, result)
+
+        if summarize and llm is not None and result is not None:
+            future = start_summary(llm, message, sql_query, result)
+            try:
+                summary = future.result(timeout=RESULT_SUMMARY_TIMEOUT)
+            except Exception:
+                future.cancel()
+                summary = None
+            events.put(timed({"event": "summary", "node": "summary", "summary": summary}, "summary"))
+
+        events.put({
+            "event": "done",
+            "timings": {node: round(duration, 2) for node, duration in timings.items()},
+            "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+    except Exception as e:
+        events.put({"event": "error", "error": str(e), "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)})
+    finally:
+        events.put(_END)
+
+
+def stream_query_events(graph: Any, message: str, llm: Optional[Any] = None, summarize: bool = False,
+                        thread_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Run a question through a query_gen -> query_check -> query_execute graph, yielding node events.
+
+    Args:
+        graph: Compiled LangGraph workflow
+        message: Natural language question
+        llm: Chat model for the optional summary
+        summarize: Add an LLM summary event after the result
+        thread_id: Conversation the question belongs to (see conversation_store)
+
+    Yields:
+        Event dictionaries, ending with a done or error event
+    """
+    events: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    context = contextvars.copy_context()
+    worker = threading.Thread(
+        target=context.run, args=(_run_graph, graph, message, llm, summarize, thread_id, events, stop),
+        name="node-stream", daemon=True
+    )
+    worker.start()
+    try:
+        while True:
+            event = events.get()
+            if event is _END:
+                return
+            yield event
+    finally:
+        # Client went away (or the stream ended): let the worker stop after the current node
+        stop.set()
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message"""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def iter_sse(events: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Encode a stream of events for a text/event-stream response"""
+    for event in events:
+        yield format_sse(event)
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Decode Server-Sent Events produced by format_sse().
+
+    Args:
+        lines: Response lines without line endings (e.g. requests' iter_lines(decode_unicode=True))
+
+    Yields:
+        Event dictionaries
+    """
+    data_lines = []
+    for line in lines:
+        if line.startswith("data:"):
+            data_lines.append(line[5:].strip())
+        elif not line and data_lines:
+            yield json.loads("\n".join(data_lines))
+            data_lines = []
+    if data_lines:
+        yield json.loads("\n".join(data_lines))
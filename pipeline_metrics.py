@@ -0,0 +1,189 @@
+"""
+Pipeline Metrics - Per-stage timings and token usage of NL to SQL requests
+
+Each request gets a PipelineTimings record that code anywhere in the
+pipeline can add to through stage() and record_tokens(), without passing it
+around: the record of the current request is kept in a context variable.
+Finished requests are added to rolling windows so percentiles per stage can
+be reported by a stats endpoint or the CLI.
+
+Stages are not exclusive, e.g. "db" (time reported by the database) is part
+of "execute" (the whole HTTP round trip).
+
+Configuration:
+- SQL_METRICS_WINDOW: Number of recent requests kept for percentiles (default 1000)
+"""
+
+import os
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+
+METRICS_WINDOW = int(os.getenv("SQL_METRICS_WINDOW", "1000"))
+
+_TOKEN_KEYS = ("input_tokens", "output_tokens", "cached_tokens")
+
+
+class PipelineTimings:
+    """Stage durations (ms) and LLM token usage of one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {key: 0 for key in _TOKEN_KEYS}
+        self.llm_calls = 0
+
+    def add_stage(self, name: str, duration_ms: float) -> None:
+        """Add time to a stage; repeated stages (e.g. repairs) accumulate"""
+        self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+
+    def add_tokens(self, usage: Dict[str, int]) -> None:
+        """Add the token usage of one LLM call"""
+        self.llm_calls += 1
+        for key in _TOKEN_KEYS:
+            self.tokens[key] += usage.get(key, 0)
+
+    def finish(self) -> None:
+        """Stop the request clock"""
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Timings block returned with the response"""
+        total_ms = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.start) * 1000
+        return {
+            "total_ms": round(total_ms, 2),
+            "stages_ms": {name: round(duration, 2) for name, duration in self.stages.items()},
+            "llm_calls": self.llm_calls,
+            "tokens": dict(self.tokens),
+        }
+
+
+_current_timings: ContextVar[Optional[PipelineTimings]] = ContextVar("pipeline_timings", default=None)
+
+
+def current_timings() -> Optional[PipelineTimings]:
+    """Timings of the request being processed, if any"""
+    return _current_timings.get()
+
+
+@contextmanager
+def track_request() -> Iterator[PipelineTimings]:
+    """
+    Collect timings for a request.
+
+    Nested use (e.g. a pipeline step that can also run on its own) joins the
+    enclosing request instead of starting a new one. The outermost request is
+    added to the rolling statistics when it ends.
+
+    Yields:
+        PipelineTimings of the request
+    """
+    existing = _current_timings.get()
+    if existing is not None:
+        yield existing
+        return
+
+    timings = PipelineTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+        timings.finish()
+        pipeline_stats.record(timings)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a stage of the current request (no-op outside a request)"""
+    timings = _current_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def record_stage(name: str, duration_ms: float) -> None:
+    """Record a duration measured elsewhere (e.g. reported by the database)"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_stage(name, duration_ms)
+
+
+def record_tokens(usage: Optional[Dict[str, int]]) -> None:
+    """Record the token usage of an LLM call for the current request"""
+    timings = _current_timings.get()
+    if timings is not None and usage:
+        timings.add_tokens(usage)
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class PipelineStats:
+    """Thread-safe rolling windows of stage durations and token counts"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self.window = window
+        self.requests = 0
+        self._values: Dict[str, deque] = {}
+
+    def _add(self, name: str, value: float) -> None:
+        if name not in self._values:
+            self._values[name] = deque(maxlen=self.window)
+        self._values[name].append(value)
+
+    def record(self, timings: PipelineTimings) -> None:
+        """Add a finished request"""
+        with self._lock:
+            self.requests += 1
+            self._add("total_ms", timings.total_ms or 0.0)
+            for name, duration in timings.stages.items():
+                self._add(f"{name}_ms", duration)
+            if timings.llm_calls:
+                self._add("llm_calls", timings.llm_calls)
+                for key, value in timings.tokens.items():
+                    self._add(key, value)
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean and p50/p95/p99 of every metric over the window"""
+        with self._lock:
+            metrics = {}
+            for name, values in self._values.items():
+                ordered = sorted(values)
+                metrics[name] = {
+                    "count": len(ordered),
+                    "mean": round(sum(ordered) / len(ordered), 2),
+                    "p50": round(percentile(ordered, 0.50), 2),
+                    "p95": round(percentile(ordered, 0.95), 2),
+                    "p99": round(percentile(ordered, 0.99), 2),
+                }
+            return {"requests": self.requests, "window": self.window, "metrics": metrics}
+
+    def format_table(self) -> str:
+        """Summary as a plain text table for the CLI"""
+        summary = self.summary()
+        lines = [f"Requests: {summary['requests']} (window {summary['window']})",
+                 f"{'metric':<28}{'count':>7}{'mean':>12}{'p50':>12}{'p95':>12}{'p99':>12}"]
+        for name, values in sorted(summary["metrics"].items()):
+            lines.append(
+                f"{name:<28}{values['count']:>7}{values['mean']:>12}{values['p50']:>12}{values['p95']:>12}{values['p99']:>12}"
+            )
+        return "\n".join(lines)
+
+
+pipeline_stats = PipelineStats()
@@ -0,0 +1,245 @@
+"""
+Prompt Cache - Static system prompt prefixes for SQL generation
+
+The SQL generation prompt is almost entirely static: guidelines plus the
+database DDL. This module builds that prefix once per DDL version and hands
+it to the LLM in the form that lets each provider reuse it:
+
+- explicit: providers with prompt caching markers (Anthropic style) get the
+  prefix as a system content block tagged with cache_control
+- implicit: providers that cache identical request prefixes automatically
+  (Gemini 2.5) get a byte-stable system message placed before the question
+- compact: providers without caching get a whitespace- and comment-stripped
+  DDL (string literals and quoted identifiers are kept as they are), built
+  once per DDL version
+
+The prefix's token count is an estimate (about four characters per token),
+made once per prefix; it is only used when the provider reports no usage.
+
+Token usage (prompt, completion and cached tokens) is recorded per request
+and aggregated so cache savings can be tracked.
+
+Configuration:
+- LLM_PROMPT_CACHE_MODE: "auto" (default), "explicit", "implicit" or "compact"
+"""
+
+import os
+import re
+import hashlib
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+PROMPT_CACHE_MODE = os.getenv("LLM_PROMPT_CACHE_MODE", "auto").lower()
+
+# LLM types (BaseChatModel._llm_type) and the caching they support
+_EXPLICIT_CACHE_LLM_TYPES = ("anthropic",)
+_IMPLICIT_CACHE_LLM_TYPES = ("google", "gemini")
+
+
+class PromptPrefix(BaseModel):
+    """Static part of a prompt, built once per DDL version"""
+    text: str = Field(description="Prefix text sent before the per-request part")
+    ddl_version: str = Field(description="Hash of the DDL the prefix was built from")
+    mode: str = Field(description="Caching mode: 'explicit', 'implicit' or 'compact'")
+    token_estimate: int = Field(description="Approximate token count of the prefix")
+
+
+def resolve_cache_mode(llm: Any, mode: str = PROMPT_CACHE_MODE) -> str:
+    """
+    Pick the caching mode for an LLM.
+
+    Args:
+        llm: Chat model the prompt will be sent to
+        mode: Configured mode, "auto" detects it from the model type
+
+    Returns:
+        "explicit", "implicit" or "compact"
+    """
+    if mode != "auto":
+        return mode
+
+    llm_type = getattr(llm, "_llm_type", "").lower()
+    if any(name in llm_type for name in _EXPLICIT_CACHE_LLM_TYPES):
+        return "explicit"
+    if any(name in llm_type for name in _IMPLICIT_CACHE_LLM_TYPES):
+        return "implicit"
+    return "compact"
+
+
+def ddl_version(ddl: str) -> str:
+    """
+    Hash the DDL, ignoring the generation timestamp so all workers agree.
+
+    Args:
+        ddl: DDL text as produced by extract_ddl_from_database()
+
+    Returns:
+        Short hex digest identifying the DDL version
+    """
+    stable_ddl = "\n".join(line for line in ddl.splitlines() if not line.startswith("-- Date:"))
+    return hashlib.sha256(stable_ddl.encode("utf-8")).hexdigest()[:16]
+
+
+# String literals, quoted identifiers, comments, statement ends and the SQL between them
+_DDL_TOKENS = re.compile(r"""'(?:[^']|'')*'?|"(?:[^"]|"")*"?|--[^\n]*|;|[^'";-]+|-""")
+
+
+def _compact_sql(text: str) -> str:
+    """Collapse whitespace in SQL outside of quotes"""
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([(,])\s*", r"\1", text)
+    return re.sub(r"\s+\)", ")", text)
+
+
+def compact_ddl(ddl: str) -> str:
+    """
+    Strip comments and redundant whitespace from DDL to save prompt tokens.
+
+    Quoted text (string literals in defaults and checks, quoted identifiers)
+    is kept unchanged, including any ';' or '--' in it.
+
+    Args:
+        ddl: DDL text
+
+    Returns:
+        Compact DDL with one statement per line
+    """
+    statements: List[str] = []
+    parts: List[str] = []
+    code = ""
+    for token in _DDL_TOKENS.findall(ddl):
+        if token.startswith(("'", '"')):
+            parts.append(_compact_sql(code))
+            parts.append(token)
+            code = ""
+        elif token == ";":
+            parts.append(_compact_sql(code))
+            statements.append("".join(parts).strip())
+            parts, code = [], ""
+        else:
+            # Comments end at the line break, so they become whitespace
+            code += " " if token.startswith("--") else token
+    parts.append(_compact_sql(code))
+    statements.append("".join(parts).strip())
+    return ";\n".join(statement for statement in statements if statement) + ";"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=8)
+def get_prompt_prefix(template: str, ddl: str, mode: str) -> PromptPrefix:
+    """
+    Build the static prompt prefix for a DDL version.
+
+    Results are cached, so the prefix is only built again when the DDL
+    (or the mode) changes.
+
+    Args:
+        template: Prompt template with a {ddl} placeholder
+        ddl: Database DDL
+        mode: Caching mode from resolve_cache_mode()
+
+    Returns:
+        PromptPrefix ready to be placed in front of each request
+    """
+    stable_ddl = "\n".join(line for line in ddl.splitlines() if not line.startswith("-- Date:"))
+    if mode == "compact":
+        stable_ddl = compact_ddl(stable_ddl)
+
+    # DDL defaults may contain braces, so substitute rather than str.format()
+    text = template.replace("{ddl}", stable_ddl)
+    return PromptPrefix(
+        text=text,
+        ddl_version=ddl_version(ddl),
+        mode=mode,
+        token_estimate=estimate_tokens(text)
+    )
+
+
+def build_prompt_messages(prefix: PromptPrefix, request_text: str) -> List["BaseMessage"]:
+    """
+    Combine the cached prefix with the per-request part of the prompt.
+
+    Args:
+        prefix: Static prefix from get_prompt_prefix()
+        request_text: Per-request text (question and instructions)
+
+    Returns:
+        Messages with the static prefix first
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    if prefix.mode == "explicit":
+        system_message = SystemMessage(content=[
+            {"type": "text", "text": prefix.text, "cache_control": {"type": "ephemeral"}}
+        ])
+    else:
+        system_message = SystemMessage(content=prefix.text)
+
+    return [system_message, HumanMessage(content=request_text)]
+
+
+class TokenUsageStats:
+    """Thread-safe running totals of LLM token usage and prompt cache hits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, response: Any, prefix: Optional[PromptPrefix] = None) -> Dict[str, int]:
+        """
+        Record the usage reported on an LLM response.
+
+        Providers that do not report usage fall back to an estimate based on
+        the prefix size.
+
+        Args:
+            response: AIMessage returned by the LLM
+            prefix: Prefix used for the request
+
+        Returns:
+            Token usage for this request
+        """
+        usage_metadata = getattr(response, "usage_metadata", None) or {}
+        details = usage_metadata.get("input_token_details") or {}
+
+        usage = {
+            "input_tokens": usage_metadata.get("input_tokens", prefix.token_estimate if prefix else 0),
+            "output_tokens": usage_metadata.get("output_tokens", 0),
+            "cached_tokens": details.get("cache_read", 0),
+            "prefix_tokens": prefix.token_estimate if prefix else 0,
+        }
+
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += usage["input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.cached_tokens += usage["cached_tokens"]
+
+        return usage
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals and the share of prompt tokens served from the cache"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cache_hit_ratio": self.cached_tokens / self.input_tokens if self.input_tokens else 0.0,
+            }
+
+
+token_usage_stats = TokenUsageStats()
@@ -0,0 +1,50 @@
+"""
+Result Capture - Request-scoped raw database results
+
+process_query() returns the raw database result (json_result) next to the
+formatted answer. The result used to be written to a module-level variable
+by the execution tool, so concurrent requests overwrote each other's
+results. Each request now opens a capture, kept in a context variable, and
+the execution tool and node record into the capture of their own request.
+
+LangGraph runs nodes and tools with a copy of the caller's context, so the
+capture object opened by process_query() is the one they see, both for
+threads and for asyncio tasks; requests never share one.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+
+class ResultCapture:
+    """Raw database result of one request"""
+
+    def __init__(self):
+        self.raw_result: Optional[Any] = None
+
+
+_current_capture: ContextVar[Optional[ResultCapture]] = ContextVar("result_capture", default=None)
+
+
+@contextmanager
+def capture_request() -> Iterator[ResultCapture]:
+    """
+    Capture the raw database result of a request.
+
+    Yields:
+        ResultCapture filled in by record_raw_result() during the request
+    """
+    capture = ResultCapture()
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
+
+
+def record_raw_result(result: Any) -> None:
+    """Store the raw result for the current request (no-op outside a request)"""
+    capture = _current_capture.get()
+    if capture is not None:
+        capture.raw_result = result
@@ -0,0 +1,178 @@
+"""
+Speculative Generation - Race several LLM candidates for one SQL query
+
+Instead of one generation call followed by serial retries, K variants of the
+same request (different sampling temperatures) are sent concurrently. Each
+answer is validated locally as it arrives; the first valid one wins and the
+calls still in flight are cancelled. Wins per variant are recorded so the
+variant set and K can be tuned. Cost grows with K, at most K times the
+tokens of a single call: a cancelled call has already been sent, so its
+prompt tokens are spent even though no answer comes back.
+
+Races run on the process-wide background event loop of direct_execution.py,
+so no event loop is created per call.
+
+Configuration:
+- SQL_SPECULATIVE_K: Number of concurrent candidates (default 1, disabled)
+- SQL_SPECULATIVE_TEMPERATURES: Comma-separated temperatures assigned to the
+  candidates in turn (default "0,0.4,0.8")
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from direct_execution import run_in_background
+
+logger = logging.getLogger(__name__)
+
+
+SPECULATIVE_K = int(os.getenv("SQL_SPECULATIVE_K", "1"))
+SPECULATIVE_TEMPERATURES = [
+    float(value) for value in os.getenv("SQL_SPECULATIVE_TEMPERATURES", "0,0.4,0.8").split(",") if value.strip()
+]
+
+
+class SpeculativeResult(BaseModel):
+    """Outcome of a race between candidates"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    response: Optional[Any] = Field(default=None, description="Winning LLM response, None if every call failed")
+    variant: Optional[int] = Field(default=None, description="Index of the winning candidate")
+    status: str = Field(description="Validation status of the winner: 'valid', 'warning' or 'error'")
+    completed: List[Any] = Field(default_factory=list, description="All responses received before the race ended")
+    cancelled: int = Field(default=0, description="Number of calls cancelled after the winner was found")
+
+
+def candidate_models(llm: Any, k: int = SPECULATIVE_K) -> List[Any]:
+    """
+    Build K variants of a chat model with different temperatures.
+
+    Args:
+        llm: Base chat model, used unchanged as the first candidate
+        k: Number of candidates
+
+    Returns:
+        List of chat models; only the base model when it has no temperature,
+        since its copies would all send the same request
+    """
+    candidates = [llm]
+    if k > 1 and not hasattr(llm, "temperature"):
+        logger.warning(f"{type(llm).__name__} has no temperature setting, generating without speculative candidates")
+        return candidates
+    for i in range(1, k):
+        temperature = SPECULATIVE_TEMPERATURES[i % len(SPECULATIVE_TEMPERATURES)]
+        candidates.append(llm.model_copy(update={"temperature": temperature}))
+    return candidates
+
+
+async def race_candidates(candidates: List[Any], messages: List[Any], validate: Callable[[Any], str]) -> SpeculativeResult:
+    """
+    Send the same messages to every candidate and keep the first valid answer.
+
+    Args:
+        candidates: Chat models to race
+        messages: Prompt messages
+        validate: Returns 'valid', 'warning' or 'error' for a response
+
+    Returns:
+        SpeculativeResult; without a valid answer the first 'warning' answer is used
+    """
+    tasks = {asyncio.ensure_future(candidate.ainvoke(messages)): i for i, candidate in enumerate(candidates)}
+    pending = set(tasks)
+    result = SpeculativeResult(status="error")
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    logger.warning(f"Speculative candidate {tasks[task]} failed: {task.exception()}")
+                    continue
+
+                response = task.result()
+                result.completed.append(response)
+                status = validate(response)
+
+                if status == "valid":
+                    result.response, result.variant, result.status = response, tasks[task], status
+                    return result
+                if status == "warning" and result.response is None:
+                    result.response, result.variant, result.status = response, tasks[task], status
+        return result
+    finally:
+        for task in pending:
+            task.cancel()
+        result.cancelled = len(pending)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def run_speculative(llm: Any, messages: List[Any], validate: Callable[[Any], str],
+                    k: int = SPECULATIVE_K) -> SpeculativeResult:
+    """
+    Race K candidates from synchronous code.
+
+    The race runs on the background event loop, so this also works when
+    called from a thread that runs an event loop (e.g. a FastAPI endpoint).
+
+    Args:
+        llm: Base chat model
+        messages: Prompt messages
+        validate: Returns 'valid', 'warning' or 'error' for a response
+        k: Number of candidates
+
+    Returns:
+        SpeculativeResult of the race
+    """
+    candidates = candidate_models(llm, k)
+    result = run_in_background(race_candidates(candidates, messages, validate)).result()
+
+    speculative_stats.record(result, len(candidates))
+    if result.variant is not None:
+        logger.info(
+            f"Speculative generation: variant {result.variant} won ({result.status}), "
+            f"{len(result.completed)} of {len(candidates)} answers received, {result.cancelled} cancelled"
+        )
+    return result
+
+
+class SpeculativeStats:
+    """Thread-safe wins per variant and call counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.races = 0
+        self.calls_issued = 0
+        self.calls_completed = 0
+        self.calls_cancelled = 0
+        self.no_winner = 0
+        self.wins: Dict[int, int] = {}
+
+    def record(self, result: SpeculativeResult, k: int) -> None:
+        """Record one race"""
+        with self._lock:
+            self.races += 1
+            self.calls_issued += k
+            self.calls_completed += len(result.completed)
+            self.calls_cancelled += result.cancelled
+            if result.variant is None:
+                self.no_winner += 1
+            else:
+                self.wins[result.variant] = self.wins.get(result.variant, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Wins per variant and completed calls per race (the cost multiplier)"""
+        with self._lock:
+            return {
+                "races": self.races,
+                "wins": dict(sorted(self.wins.items())),
+                "no_winner": self.no_winner,
+                "calls_issued": self.calls_issued,
+                "calls_cancelled": self.calls_cancelled,
+                "cost_multiplier": self.calls_completed / self.races if self.races else 0.0,
+            }
+
+
+speculative_stats = SpeculativeStats()
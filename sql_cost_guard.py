@@ -0,0 +1,87 @@
+"""
+SQL Cost Guard - Pre-execution cost checks for generated SQL
+
+Generated SQL is planned with a plain EXPLAIN (FORMAT JSON) through the
+sql_execution_api.py service before it is executed. The estimated total cost
+and row counts of the plan are compared against configurable thresholds to
+decide whether the query runs as-is, runs with an automatic LIMIT (applied by
+sql_row_budget.py), is queued on the async job path, or is rejected outright.
+
+Thresholds are read from the environment:
+- SQL_COST_GUARD_ENABLED: "true" / "false" (default "true")
+- SQL_COST_REJECT_THRESHOLD: total plan cost above which queries are rejected
+- SQL_COST_ASYNC_THRESHOLD: total plan cost above which queries run as background jobs
+- SQL_COST_LIMIT_ROWS_THRESHOLD: estimated row count above which a LIMIT is added
+- SQL_COST_AUTO_LIMIT: the LIMIT applied when the row threshold is exceeded
+"""
+
+import os
+from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from sql_row_budget import has_top_level_limit
+
+
+COST_GUARD_ENABLED = os.getenv("SQL_COST_GUARD_ENABLED", "true").lower() == "true"
+COST_REJECT_THRESHOLD = float(os.getenv("SQL_COST_REJECT_THRESHOLD", "10000000"))
+COST_ASYNC_THRESHOLD = float(os.getenv("SQL_COST_ASYNC_THRESHOLD", "1000000"))
+LIMIT_ROWS_THRESHOLD = int(os.getenv("SQL_COST_LIMIT_ROWS_THRESHOLD", "10000"))
+AUTO_LIMIT = int(os.getenv("SQL_COST_AUTO_LIMIT", "1000"))
+
+# Statements that EXPLAIN can plan without side effects and that return rows
+_EXPLAINABLE_PREFIXES = ("SELECT", "WITH", "VALUES", "TABLE")
+
+
+class CostGuardDecision(BaseModel):
+    """Outcome of the pre-execution cost check"""
+    action: str = Field(description="Action to take: 'allow', 'limit', 'async' or 'reject'")
+    row_limit: Optional[int] = Field(default=None, description="Maximum rows to return when the action is 'limit'")
+    reason: Optional[str] = Field(default=None, description="Why the action was chosen")
+
+
+def is_explainable(sql_query: str) -> bool:
+    """
+    Check whether a query is a read-only statement that the cost guard can plan.
+
+    Args:
+        sql_query: SQL query to check
+
+    Returns:
+        True if the query starts with a row-returning keyword
+    """
+    return sql_query.strip().upper().startswith(_EXPLAINABLE_PREFIXES)
+
+
+def evaluate_plan(sql_query: str, plan_summary: Dict[str, Any]) -> CostGuardDecision:
+    """
+    Decide what to do with a query based on its estimated plan.
+
+    Args:
+        sql_query: SQL query that was planned
+        plan_summary: Summary returned by the /explain endpoint
+
+    Returns:
+        CostGuardDecision with the action to take
+    """
+    total_cost = plan_summary.get("total_cost") or 0
+    plan_rows = plan_summary.get("plan_rows") or 0
+
+    if total_cost > COST_REJECT_THRESHOLD:
+        return CostGuardDecision(
+            action="reject",
+            reason=f"Estimated cost {total_cost:.0f} exceeds the rejection threshold of {COST_REJECT_THRESHOLD:.0f}"
+        )
+
+    if total_cost > COST_ASYNC_THRESHOLD:
+        return CostGuardDecision(
+            action="async",
+            reason=f"Estimated cost {total_cost:.0f} exceeds the async threshold of {COST_ASYNC_THRESHOLD:.0f}"
+        )
+
+    if plan_rows > LIMIT_ROWS_THRESHOLD and not has_top_level_limit(sql_query):
+        return CostGuardDecision(
+            action="limit",
+            row_limit=AUTO_LIMIT,
+            reason=f"Estimated {plan_rows} rows exceeds {LIMIT_ROWS_THRESHOLD}, limited to {AUTO_LIMIT}"
+        )
+
+    return CostGuardDecision(action="allow")
@@ -0,0 +1,430 @@
+"""
+SQL Engine - The query_gen -> query_check -> query_execute pipeline, configured per entry point
+
+ai_sql_agent.py, ai_sql_agent_ddl.py, main_*.py, text_to_sql_ai_agent*.py
+and mainiteration*.py each carried a copy of the same LangGraph pipeline
+with its own LLM, database, toolkit and graph, so a fix or optimization made
+in one copy was missing from the others. They are now thin entry points
+around an SQLEngine, which differs between them only by configuration:
+
+- model / default_llm: the chat model (see llm_factory.py)
+- schema_context: "tools" (the agent looks the schema up with the
+  list/schema tools) or "ddl" (the DDL snapshot is put in the prompts)
+- execute_mode: "direct" or "agent" (see direct_execution.py)
+- verbose: print the generated and checked queries
+
+The LLM, database, tools and DDL come from engine_resources.py, so engines
+in the same process share them, and so the compiled ReAct sub-agents.
+Nothing is built, and LangChain/LangGraph are not imported, until the first
+question (or the first access to engine.llm, .db or .graph), so importing an
+entry point is cheap (see startup_profile.py).
+
+Stages are plain functions and can be replaced per engine:
+- generate(engine, messages) -> SQL query
+- check(engine, messages) -> checked SQL query; a check that is not SQL
+  keeps the generated query
+- execute(engine, messages) -> answer; the raw result is recorded for the
+  request (see result_capture.py)
+- summarize(engine, question, sql_query, answer) -> optional LLM summary
+
+Configuration:
+- SQL_EXECUTE_MODE: Default execute mode (see direct_execution.py)
+- SQL_RESULT_SUMMARY_TIMEOUT: Seconds run() waits for a summary (default 10)
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+from conversation_store import conversation_inputs, record_turn
+from direct_execution import RESULT_SUMMARY_TIMEOUT, SQL_EXECUTE_MODE, clean_sql, execute_query, start_summary
+from engine_resources import get_database, get_database_ddl, get_exec_tool, get_llm, get_sql_tools
+from node_stream import stream_query_events
+from result_capture import capture_request, record_raw_result
+from structured_output import StructuredOutputError, looks_like_sql, structured_output_stats
+
+
+SCHEMA_CONTEXTS = ("tools", "ddl")
+STAGES = ("generate", "check", "execute", "summarize")
+# Engine attributes entry points expose as module attributes, built on first access
+MODULE_ATTRIBUTES = ("llm", "db", "list_tables_tool", "get_schema_tool", "graph")
+
+GENERATE_PROMPT = (
+    "You are an expert database query generator specialized in PostgreSQL. "
+    "You are provided with tools to list the tables in the database and get the schema of specific tables. "
+    "Always use the list_tables_tool first to get an overview of available tables. "
+    "Then, for any relevant table(s), use the get_schema_tool to retrieve their schema before constructing the query. "
+    "You can generate SQL queries for ANY database operation including: "
+    "- Counting records, getting database metadata (current_database(), version(), etc.) "
+    "- Selecting data from tables, aggregating data, joining tables "
+    "- Getting system information about the database "
+    "Ensure that the SQL query you generate is syntactically correct and follows PostgreSQL standards. "
+    "Your final output should only be the SQL query, without any additional explanation or commentary. "
+    "If a user asks for database name, use SELECT current_database(); "
+    "If a user asks for database version, use SELECT version(); "
+    "Be creative and use appropriate PostgreSQL system functions and queries to answer any question."
+)
+
+GENERATE_PROMPT_DDL = (
+    "You are an expert database query generator specialized in PostgreSQL for the DVD Rental database. "
+    "You have complete knowledge of the database schema through the DDL provided below.\n\n"
+    "DATABASE SCHEMA (DDL):\n{ddl}\n\n"
+    "Based on this schema, you can generate precise SQL queries for ANY database operation including: "
+    "- Counting records, getting database metadata (current_database(), version(), etc.) "
+    "- Selecting data from tables, aggregating data, joining tables "
+    "- Complex queries involving multiple table joins "
+    "- Getting system information about the database "
+    "You can also use the list_tables_tool and get_schema_tool if you need additional runtime information. "
+    "However, with the DDL above, you have complete schema knowledge including: "
+    "- All table structures and column names "
+    "- Data types for all columns "
+    "- Primary and foreign key relationships "
+    "- Available indexes "
+    "Use this knowledge to generate accurate, efficient SQL queries. "
+    "Ensure that the SQL query you generate is syntactically correct and follows PostgreSQL standards. "
+    "Your final output should only be the SQL query, without any additional explanation or commentary. "
+    "If a user asks for database name, use SELECT current_database(); "
+    "If a user asks for database version, use SELECT version(); "
+    "Be creative and use appropriate PostgreSQL system functions and queries to answer any question. "
+    "For the DVD rental database, common queries might involve: "
+    "- Actor and film relationships (film_actor table) "
+    "- Customer rental history (rental, customer tables) "
+    "- Film categories (film_category, category tables) "
+    "- Store inventory (inventory, store tables) "
+    "- Payment transactions (payment table) "
+    "- Geographic data (country, city, address tables)"
+)
+
+CHECK_PROMPT = """You are a SQL expert with a strong attention to detail.
+    You work with PostgreSQL, SQLite, and other relational databases.
+    Your task is to carefully review the provided SQL query for any mistakes, including:
+    - Quoting identifiers correctly (e.g., "Snippet" vs Snippet in PostgreSQL)
+    - Data type mismatches
+    - Using the correct number of arguments in functions
+    - Ensuring joins use valid columns
+    - Checking for NULL handling issues
+    - Ensuring correct usage of UNION vs UNION ALL
+    - Proper casting and type usage
+    Make sure that the final query is in a postgres acceptable format
+    If there is an issue, respond with the **corrected query only**.
+    If the query is already correct, simply return the **original query**.
+    """
+
+CHECK_PROMPT_DDL = """You are a SQL expert with a strong attention to detail.
+    You work with PostgreSQL, specifically the DVD Rental database.
+    You have complete knowledge of the database schema:
+
+    {ddl}
+
+    Your task is to carefully review the provided SQL query for any mistakes, including:
+    - Quoting identifiers correctly (e.g., "Snippet" vs Snippet in PostgreSQL)
+    - Data type mismatches
+    - Using the correct number of arguments in functions
+    - Ensuring joins use valid columns from the schema above
+    - Checking for NULL handling issues
+    - Ensuring correct usage of UNION vs UNION ALL
+    - Proper casting and type usage
+    - Verifying table and column names exist in the schema
+    - Checking foreign key relationships are correct
+    Make sure that the final query is in a postgres acceptable format and uses valid table/column names from the schema.
+    If there is an issue, respond with the **corrected query only**.
+    If the query is already correct, simply return the **original query**.
+    """
+
+EXECUTE_PROMPT = (
+    "You are an expert PostgreSQL query executor. "
+    "You can use db_exec_tool_with_capture for execution of any SQL query including system queries. "
+    "Your primary task is to execute the provided SQL query accurately and return the result. "
+    "You can execute any type of PostgreSQL query including: "
+    "- Data selection queries (SELECT) "
+    "- System information queries (current_database(), version(), etc.) "
+    "- Aggregate queries (COUNT, SUM, etc.) "
+    "- Metadata queries about tables, schemas, etc. "
+    "Execute the query exactly as provided and return the result in a clear, human-understandable format. "
+    "Always provide the actual data/results, not just explanations. "
+    "If the query returns system information like database name or version, present it clearly to the user."
+)
+
+EXECUTE_PROMPT_DDL = (
+    "You are an expert PostgreSQL query executor for the DVD Rental database. "
+    "You can use db_exec_tool_with_capture for execution of any SQL query including system queries. "
+    "Your primary task is to execute the provided SQL query accurately and return the result. "
+    "You can execute any type of PostgreSQL query including: "
+    "- Data selection queries (SELECT) "
+    "- System information queries (current_database(), version(), etc.) "
+    "- Aggregate queries (COUNT, SUM, etc.) "
+    "- Complex joins across multiple tables "
+    "- Metadata queries about tables, schemas, etc. "
+    "Execute the query exactly as provided and return the result in a clear, human-understandable format. "
+    "Always provide the actual data/results, not just explanations. "
+    "If the query returns system information like database name or version, present it clearly to the user. "
+    "For DVD rental database queries, provide context about what the results mean (e.g., actor names, film titles, customer information)."
+)
+
+# Schema context -> stage -> prompt ({ddl} is replaced by the current DDL)
+PROMPTS = {
+    "tools": {"generate": GENERATE_PROMPT, "check": CHECK_PROMPT, "execute": EXECUTE_PROMPT},
+    "ddl": {"generate": GENERATE_PROMPT_DDL, "check": CHECK_PROMPT_DDL, "execute": EXECUTE_PROMPT_DDL},
+}
+
+
+class QueryChecker(BaseModel):
+    query: str = Field(description="The corrected postgres query generated by the LLm")
+
+
+class EngineResult(BaseModel):
+    """Outcome of one question"""
+    question: str = Field(description="The natural language question")
+    sql_query: str = Field(default="", description="SQL query generated by query_gen")
+    checked_sql: str = Field(default="", description="SQL query after query_check (the one executed)")
+    result: str = Field(default="", description="The result in human-readable format")
+    json_result: Any = Field(default=None, description="The raw database result")
+    summary: Optional[str] = Field(default=None, description="Optional LLM summary of the result")
+
+
+def _with_system_prompt(prompt: str, messages: List[Any]) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+    return {"messages": [HumanMessage(content=prompt, name="system"), *messages]}
+
+
+def generate_stage(engine: "SQLEngine", messages: List[Any]) -> str:
+    """Generate the SQL query with a ReAct agent that can list tables and read their schema"""
+    list_tables_tool, get_schema_tool = engine.list_tables_tool, engine.get_schema_tool
+    if not list_tables_tool or not get_schema_tool:
+        raise ValueError(
+            "Required database tools (list_tables_tool, get_schema_tool) are not available"
+        )
+
+    from agent_cache import get_react_agent
+
+    query_agent = get_react_agent(engine.llm, tools=[list_tables_tool, get_schema_tool])
+    result = query_agent.invoke(_with_system_prompt(engine.prompt("generate"), messages))
+    return result["messages"][-1].content
+
+
+def check_stage(engine: "SQLEngine", messages: List[Any]) -> str:
+    """Check the generated query with structured output; keep it when the check is not SQL"""
+    query = messages[-1].content
+    full_prompt = f"{engine.prompt('check')}\n\nQuery:\n{query}"
+
+    try:
+        checked_query = engine.llm.with_structured_output(QueryChecker).invoke(full_prompt).query
+    except StructuredOutputError:
+        checked_query = ""
+
+    # Never pass on a check that is not a query: keep the generated query instead
+    if not looks_like_sql(clean_sql(checked_query)):
+        structured_output_stats.record_fallback("not_sql")
+        checked_query = query
+    return checked_query
+
+
+def execute_stage(engine: "SQLEngine", messages: List[Any]) -> str:
+    """
+    Execute the checked query directly and format the result locally, or with
+    execute_mode "agent" let an agent execute the query and restate the result.
+    """
+    if engine.execute_mode == "agent":
+        from agent_cache import get_react_agent
+        executing_agent = get_react_agent(engine.llm, tools=[engine.exec_tool])
+        final_result = executing_agent.invoke(_with_system_prompt(engine.prompt("execute"), messages))
+        answer = final_result["messages"][-1].content
+    else:
+        execution = execute_query(engine.db, messages[-1].content)
+        # Store the raw result for JSON formatting
+        record_raw_result(execution.raw_result)
+        answer = execution.answer
+    print(answer)
+    return answer
+
+
+def summarize_stage(engine: "SQLEngine", question: str, sql_query: str, answer: str) -> Optional[str]:
+    """LLM summary of the answer, or None if it is not ready within SQL_RESULT_SUMMARY_TIMEOUT"""
+    future = start_summary(engine.llm, question, sql_query, answer)
+    try:
+        return future.result(timeout=RESULT_SUMMARY_TIMEOUT)
+    except Exception:
+        future.cancel()
+        return None
+
+
+DEFAULT_STAGES: Dict[str, Callable[..., Any]] = {
+    "generate": generate_stage,
+    "check": check_stage,
+    "execute": execute_stage,
+    "summarize": summarize_stage,
+}
+
+
+class SQLEngine:
+    """
+    Natural language to SQL pipeline of one entry point.
+
+    The LLM, database and graph are resolved on first use; llm and db can be
+    replaced (e.g. by tests) and the graph keeps working with the new ones.
+    """
+
+    def __init__(self, model: str = "gemini-2.5-flash", default_llm: Optional[Callable[[], Any]] = None,
+                 schema_context: str = "tools", execute_mode: Optional[str] = None,
+                 stages: Optional[Dict[str, Callable[..., Any]]] = None, database_url: Optional[str] = None,
+                 verbose: bool = False):
+        """
+        Args:
+            model: Gemini model name
+            default_llm: Factory of the entry point's own model (see get_chat_model())
+            schema_context: "tools" or "ddl"
+            execute_mode: "direct" or "agent", SQL_EXECUTE_MODE when not given
+            stages: Stage functions replacing the defaults, by name (generate, check, execute, summarize)
+            database_url: Database URL, DATABASE_URL when not given
+            verbose: Print the generated and checked queries
+        """
+        if schema_context not in SCHEMA_CONTEXTS:
+            raise ValueError(f"Unknown schema_context '{schema_context}', expected one of: {', '.join(SCHEMA_CONTEXTS)}")
+        unknown = set(stages or {}) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages {sorted(unknown)}, expected any of: {', '.join(STAGES)}")
+
+        self.model = model
+        self.default_llm = default_llm
+        self.schema_context = schema_context
+        self.execute_mode = (execute_mode or SQL_EXECUTE_MODE).lower()
+        self.stages = {**DEFAULT_STAGES, **(stages or {})}
+        self.database_url = database_url
+        self.verbose = verbose
+        self._llm: Optional[Any] = None
+        self._db: Optional[Any] = None
+        self._graph: Optional[Any] = None
+
+    @property
+    def llm(self) -> Any:
+        if self._llm is None:
+            self._llm = get_llm(self.model, default=self.default_llm)
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm: Any) -> None:
+        self._llm = llm
+
+    @property
+    def db(self) -> Any:
+        if self._db is None:
+            self._db = get_database(self.database_url)
+        return self._db
+
+    @db.setter
+    def db(self, db: Any) -> None:
+        self._db = db
+
+    @property
+    def list_tables_tool(self) -> Any:
+        return get_sql_tools(self.db)[0]
+
+    @property
+    def get_schema_tool(self) -> Any:
+        return get_sql_tools(self.db)[1]
+
+    @property
+    def exec_tool(self) -> Any:
+        return get_exec_tool(self.db)
+
+    def module_getattr(self, module_name: str) -> Callable[[str], Any]:
+        """
+        Module __getattr__ (PEP 562) for an entry point.
+
+        ai_sql_agent.llm, .db, .graph and the tools then resolve through the
+        engine on first access, so importing the entry point builds nothing.
+        """
+        def __getattr__(name: str) -> Any:
+            if name in MODULE_ATTRIBUTES:
+                return getattr(self, name)
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        return __getattr__
+
+    def prompt(self, stage: str) -> str:
+        """System prompt of a stage for the engine's schema context"""
+        prompt = PROMPTS[self.schema_context][stage]
+        if self.schema_context == "ddl":
+            prompt = prompt.replace("{ddl}", get_database_ddl())
+        return prompt
+
+    def _node_update(self, content: str) -> Any:
+        from langchain_core.messages import HumanMessage
+        from langgraph.types import Command
+        return Command(update={"messages": [HumanMessage(content=content, name="supervisor")]})
+
+    def query_gen(self, state: Dict[str, Any]) -> Any:
+        """Query Generation Node to convert natural language database queries into PostgreSQL queries"""
+        query = self.stages["generate"](self, state["messages"])
+        if self.verbose:
+            print("Query Generation Result:", query)
+        return self._node_update(query)
+
+    def query_check(self, state: Dict[str, Any]) -> Any:
+        """Checks the generated query, returning the corrected query or the original one"""
+        checked_query = self.stages["check"](self, state["messages"])
+        if self.verbose:
+            print("Query Check Result:", checked_query)
+        return self._node_update(checked_query)
+
+    def query_execute(self, state: Dict[str, Any]) -> Any:
+        """Executes the checked query and returns the answer"""
+        answer = self.stages["execute"](self, state["messages"])
+        return self._node_update(answer)
+
+    @property
+    def graph(self) -> Any:
+        """The compiled LangGraph workflow, built on first use"""
+        if self._graph is None:
+            from langgraph.graph import StateGraph, MessagesState, START, END
+            builder = StateGraph(MessagesState)
+
+            # Add edges and nodes to define the workflow of the graph
+            builder.add_node("query_gen", self.query_gen)
+            builder.add_node("query_check", self.query_check)
+            builder.add_node("query_execute", self.query_execute)
+
+            builder.add_edge(START, "query_gen")
+            builder.add_edge("query_gen", "query_check")
+            builder.add_edge("query_check", "query_execute")
+            builder.add_edge("query_execute", END)
+
+            self._graph = builder.compile()
+        return self._graph
+
+    def run(self, message: str, thread_id: Optional[str] = None, summarize: bool = False) -> EngineResult:
+        """
+        Process a natural language query.
+
+        Args:
+            message: The natural language query to process
+            thread_id: Conversation the query belongs to; earlier questions,
+                their SQL and results of the thread are given as context for follow-ups
+            summarize: Add an LLM summary of the result
+
+        Returns:
+            EngineResult with the generated and checked SQL, the answer and the raw result
+        """
+        outcome = EngineResult(question=message)
+
+        # The raw result is captured per request, so concurrent requests cannot mix them up
+        with capture_request() as capture:
+            for output in self.graph.stream(conversation_inputs(message, thread_id)):
+                for key, value in output.items():
+                    if value is None:
+                        continue
+                    content = value["messages"][-1].content
+                    if key == "query_gen":
+                        outcome.sql_query = content
+                    elif key == "query_check":
+                        outcome.checked_sql = content
+                    elif key == "query_execute":
+                        outcome.result = content
+        outcome.json_result = capture.raw_result
+
+        record_turn(thread_id, message, outcome.checked_sql or outcome.sql_query, outcome.result)
+        if summarize and outcome.result:
+            outcome.summary = self.stages["summarize"](self, message, outcome.checked_sql, outcome.result)
+        return outcome
+
+    def stream_events(self, message: str, thread_id: Optional[str] = None,
+                      summarize: bool = False) -> Iterator[Dict[str, Any]]:
+        """Run a question yielding one event per pipeline step (see node_stream.py)"""
+        return stream_query_events(self.graph, message, llm=self.llm, summarize=summarize, thread_id=thread_id)
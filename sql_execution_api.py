@@ -9,9 +9,12 @@ It uses pure psycopg2 for database connections.
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
 import time
+import uuid
+import threading
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
@@ -40,6 +43,24 @@ class SQLResponse(BaseModel):
     error: Optional[str] = None
     execution_time_ms: Optional[float] = None
 
+class ExplainResponse(BaseModel):
+    plan_summary: Optional[Dict[str, Any]] = None
+    success: bool
+    error: Optional[str] = None
+    execution_time_ms: Optional[float] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[SQLResponse] = None
+
+# Background job execution for queries too expensive to run inline
+JOB_WORKERS = int(os.getenv("SQL_JOB_WORKERS", "2"))
+MAX_STORED_JOBS = int(os.getenv("SQL_MAX_STORED_JOBS", "100"))
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="sql-job")
+_jobs: Dict[str, Dict[str, Any]] = {}
+_jobs_lock = threading.Lock()
+
 def get_database_connection():
     """Get a database connection using psycopg2"""
     try:
@@ -110,6 +131,113 @@ def execute_sql_query(sql_query: str):
         if conn:
             conn.close()
 
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an EXPLAIN (FORMAT JSON) plan to the figures needed for cost decisions"""
+    root_node = plan["Plan"]
+    node_types = []
+    max_node_rows = 0
+
+    # Walk the plan tree to collect node types and the largest row estimate
+    stack = [root_node]
+    while stack:
+        node = stack.pop()
+        node_types.append(node["Node Type"])
+        max_node_rows = max(max_node_rows, node.get("Plan Rows", 0))
+        stack.extend(node.get("Plans", []))
+
+    return {
+        "node_type": root_node["Node Type"],
+        "startup_cost": root_node.get("Startup Cost"),
+        "total_cost": root_node.get("Total Cost"),
+        "plan_rows": root_node.get("Plan Rows"),
+        "plan_width": root_node.get("Plan Width"),
+        "node_count": len(node_types),
+        "max_node_rows": max_node_rows,
+        "node_types": sorted(set(node_types))
+    }
+
+def explain_sql_query(sql_query: str):
+    """Run a plain EXPLAIN (FORMAT JSON) for a query and summarize the estimated plan"""
+    start_time = time.time()
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_database_connection()
+        cursor = conn.cursor()
+
+        # Clean the SQL query
+        sql_query = sql_query.replace("```sql", "").replace("```", "").strip().rstrip(";")
+
+        if not sql_query:
+            raise ValueError("SQL query cannot be empty")
+
+        # Plain EXPLAIN only plans the statement, it never executes it
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}")
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return {
+            "plan_summary": summarize_plan(plan[0]),
+            "success": True,
+            "error": None,
+            "execution_time_ms": (time.time() - start_time) * 1000
+        }
+
+    except Exception as e:
+        return {
+            "plan_summary": None,
+            "success": False,
+            "error": str(e),
+            "execution_time_ms": (time.time() - start_time) * 1000
+        }
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            # Never keep anything from the planning transaction
+            conn.rollback()
+            conn.close()
+
+def _run_job(job_id: str, sql_query: str):
+    """Execute a queued job and store its result"""
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "running"
+
+    result = execute_sql_query(sql_query)
+
+    with _jobs_lock:
+        _jobs[job_id]["status"] = "completed" if result["success"] else "failed"
+        _jobs[job_id]["result"] = result
+
+def submit_sql_job(sql_query: str) -> str:
+    """
+    Queue a SQL query for background execution and return its job id.
+
+    Raises:
+        HTTPException: 429 when the job store is full of queued and running jobs
+    """
+    job_id = uuid.uuid4().hex
+
+    with _jobs_lock:
+        # Drop the oldest finished jobs once the store is full
+        if len(_jobs) >= MAX_STORED_JOBS:
+            finished = [jid for jid, job in _jobs.items() if job["status"] in ("completed", "failed")]
+            for jid in finished[:len(_jobs) - MAX_STORED_JOBS + 1]:
+                del _jobs[jid]
+        # Unfinished jobs are never dropped, so new ones wait until some finish
+        if len(_jobs) >= MAX_STORED_JOBS:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many unfinished jobs ({len(_jobs)}), try again later",
+                headers={"Retry-After": "5"}
+            )
+        _jobs[job_id] = {"status": "queued", "result": None, "submitted_at": time.time()}
+
+    _job_executor.submit(_run_job, job_id, sql_query)
+    return job_id
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -119,6 +247,9 @@ async def root():
         "description": "Direct SQL execution without AI dependencies",
         "endpoints": {
             "/execute": "Execute SQL statements directly",
+            "/explain": "Get the estimated plan cost of a SQL statement without running it",
+            "/jobs": "Queue a SQL statement for background execution",
+            "/jobs/{job_id}": "Get the status and result of a queued SQL statement",
             "/tables": "Get list of tables and their info",
             "/schema/{table_name}": "Get schema information for a specific table",
             "/health": "Health check endpoint"
@@ -157,6 +288,43 @@ async def execute_sql(request: SQLRequest):
         execution_time_ms=result["execution_time_ms"]
     )
 
+@app.post("/explain", response_model=ExplainResponse)
+async def explain_sql(request: SQLRequest):
+    """
+    Estimate the cost of a SQL statement with a plain EXPLAIN (FORMAT JSON).
+    The statement itself is not executed.
+    """
+    result = explain_sql_query(request.sql)
+
+    return ExplainResponse(
+        plan_summary=result["plan_summary"],
+        success=result["success"],
+        error=result["error"],
+        execution_time_ms=result["execution_time_ms"]
+    )
+
+@app.post("/jobs", response_model=JobResponse)
+async def submit_job(request: SQLRequest):
+    """Queue a SQL statement for background execution"""
+    job_id = submit_sql_job(request.sql)
+    return JobResponse(job_id=job_id, status="queued")
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status and, once finished, the result of a queued SQL statement"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        status = job["status"]
+        result = job["result"]
+
+    return JobResponse(
+        job_id=job_id,
+        status=status,
+        result=SQLResponse(**result) if result else None
+    )
+
 @app.get("/tables")
 async def get_tables():
     """Get list of all tables with row counts and basic information"""
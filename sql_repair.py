@@ -0,0 +1,142 @@
+"""
+SQL Repair - Bounded self-repair of generated SQL after execution errors
+
+When a generated query fails in PostgreSQL, the failing SQL, the database
+error and the slice of the schema that the query touches are sent back to
+the LLM for a corrected query. Only this small repair request is sent, not
+the full generation prompt. The number of attempts and the total time spent
+on a question are bounded.
+
+Per-attempt success rates are recorded so the budget can be tuned.
+
+Configuration:
+- SQL_REPAIR_MAX_ATTEMPTS: Maximum repair attempts per question (default 2, 0 disables)
+- SQL_REPAIR_DEADLINE_SECONDS: Seconds since the question was received after
+  which no repair attempt starts, and a repair call still running is
+  cancelled (default 30)
+"""
+
+import os
+import re
+import threading
+from typing import Any, Dict, List
+
+
+REPAIR_MAX_ATTEMPTS = int(os.getenv("SQL_REPAIR_MAX_ATTEMPTS", "2"))
+REPAIR_DEADLINE_SECONDS = float(os.getenv("SQL_REPAIR_DEADLINE_SECONDS", "30"))
+
+# Errors that a different query cannot fix
+_UNREPAIRABLE_ERROR_PREFIXES = ("Connection error:", "API error:", "Query rejected by cost guard", "Could not queue")
+_UNREPAIRABLE_ERROR_MESSAGES = ("statement timeout", "permission denied", "could not connect", "server closed the connection")
+
+SQL_REPAIR_PROMPT = """You are an expert PostgreSQL developer fixing a query that failed.
+You are given the original question, the failing SQL, the PostgreSQL error and the relevant part of the schema.
+Return ONLY the corrected SQL query, no explanation or additional text."""
+
+
+def is_repairable_error(error: str) -> bool:
+    """
+    Check whether an execution error is worth a repair attempt.
+
+    Args:
+        error: Execution error message
+
+    Returns:
+        True for query errors (syntax, unknown columns, type mismatches, ...),
+        False for infrastructure errors and guard decisions
+    """
+    if not error:
+        return False
+    if error.startswith(_UNREPAIRABLE_ERROR_PREFIXES):
+        return False
+    return not any(message in error.lower() for message in _UNREPAIRABLE_ERROR_MESSAGES)
+
+
+def referenced_names(sql_query: str, error: str) -> List[str]:
+    """
+    Collect identifiers that may name tables from the failing SQL and the error.
+
+    Args:
+        sql_query: Failing SQL query
+        error: PostgreSQL error message
+
+    Returns:
+        Lower-case identifiers in order of appearance
+    """
+    names = []
+    for text in (sql_query, error):
+        for name in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text or ""):
+            name = name.lower()
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def build_repair_request(natural_query: str, sql_query: str, error: str, ddl: str) -> str:
+    """
+    Build the per-attempt repair request.
+
+    Args:
+        natural_query: Original natural language question
+        sql_query: SQL query that failed
+        error: PostgreSQL error message
+        ddl: Full database DDL, only the referenced tables are included
+
+    Returns:
+        Request text for the LLM
+    """
+    # extract_ddl imports the PostgreSQL driver, only needed once a repair happens
+    from extract_ddl import get_schema_slice
+
+    schema_slice = get_schema_slice(ddl, referenced_names(sql_query, error))
+    return (
+        f"Question: {natural_query}\n\n"
+        f"Failing SQL:\n{sql_query}\n\n"
+        f"PostgreSQL error:\n{error}\n\n"
+        f"Relevant schema:\n{schema_slice}"
+    )
+
+
+class RepairStats:
+    """Thread-safe success counts per repair attempt number"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.first_try_success = 0
+        self.first_try_failure = 0
+        self.attempts: Dict[int, Dict[str, int]] = {}
+
+    def record_first_try(self, success: bool) -> None:
+        """Record the outcome of executing the originally generated SQL"""
+        with self._lock:
+            if success:
+                self.first_try_success += 1
+            else:
+                self.first_try_failure += 1
+
+    def record_attempt(self, attempt: int, success: bool) -> None:
+        """Record the outcome of repair attempt number `attempt` (1-based)"""
+        with self._lock:
+            counts = self.attempts.setdefault(attempt, {"tried": 0, "succeeded": 0})
+            counts["tried"] += 1
+            if success:
+                counts["succeeded"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """First-try success rate and success rate of each repair attempt"""
+        with self._lock:
+            total = self.first_try_success + self.first_try_failure
+            return {
+                "queries": total,
+                "first_try_success_rate": self.first_try_success / total if total else 0.0,
+                "attempts": {
+                    attempt: {
+                        **counts,
+                        "success_rate": counts["succeeded"] / counts["tried"] if counts["tried"] else 0.0,
+                    }
+                    for attempt, counts in sorted(self.attempts.items())
+                },
+            }
+
+
+repair_stats = RepairStats()
@@ -0,0 +1,204 @@
+"""
+SQL Row Budget - Automatic LIMIT injection for exploratory queries
+
+Questions like "show me all customers" produce unbounded SELECT statements.
+This module scans the top level of a statement (outside parentheses, string
+literals, quoted identifiers and comments) and appends a LIMIT when the query
+has none. Because the LIMIT is added after the outermost ORDER BY, the
+ordering of the returned rows is preserved.
+
+One extra row is requested beyond the budget so the caller can tell whether
+the result was actually truncated.
+
+Configuration:
+- SQL_ROW_BUDGET: default maximum number of rows returned (0 disables the budget)
+"""
+
+import os
+import re
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+
+ROW_BUDGET = int(os.getenv("SQL_ROW_BUDGET", "1000"))
+
+# Statements that return rows and can safely take a trailing LIMIT
+_ROW_RETURNING_KEYWORDS = {"SELECT", "WITH", "VALUES", "TABLE"}
+
+# Keywords (at any depth, e.g. data-modifying CTEs) that mean the statement writes data
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "MERGE"}
+
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+_DOLLAR_TAG_PATTERN = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+
+
+class RowBudgetResult(BaseModel):
+    """Result of applying a row budget to a SQL query"""
+    sql_query: str = Field(description="SQL query to execute")
+    applied: bool = Field(description="Whether a LIMIT was added")
+    row_limit: Optional[int] = Field(default=None, description="Number of rows the caller should keep")
+
+
+def _top_level_tokens(sql_query: str) -> List[Tuple[str, int, int]]:
+    """
+    Tokenize a SQL statement while tracking parenthesis depth.
+
+    String literals, quoted identifiers and dollar-quoted bodies become a single
+    placeholder token and comments are skipped; tokens inside parentheses carry
+    their depth so callers can tell the outermost query from subqueries.
+
+    Args:
+        sql_query: SQL statement to scan
+
+    Returns:
+        List of (token, depth, end_offset) tuples, words upper-cased
+    """
+    tokens = []
+    depth = 0
+    i = 0
+    length = len(sql_query)
+
+    while i < length:
+        char = sql_query[i]
+
+        if char.isspace():
+            i += 1
+        elif sql_query.startswith("--", i):
+            newline = sql_query.find("\n", i)
+            i = length if newline == -1 else newline + 1
+        elif sql_query.startswith("/*", i):
+            # PostgreSQL block comments nest
+            nesting = 1
+            i += 2
+            while i < length and nesting:
+                if sql_query.startswith("/*", i):
+                    nesting += 1
+                    i += 2
+                elif sql_query.startswith("*/", i):
+                    nesting -= 1
+                    i += 2
+                else:
+                    i += 1
+        elif char in ("'", '"'):
+            # Quoted literal or identifier, doubled quotes escape themselves
+            i += 1
+            while i < length:
+                if sql_query[i] == char:
+                    if i + 1 < length and sql_query[i + 1] == char:
+                        i += 2
+                        continue
+                    break
+                i += 1
+            i += 1
+            tokens.append((char, depth, i))
+        elif char == "$" and _DOLLAR_TAG_PATTERN.match(sql_query, i):
+            tag = _DOLLAR_TAG_PATTERN.match(sql_query, i).group(0)
+            closing = sql_query.find(tag, i + len(tag))
+            i = length if closing == -1 else closing + len(tag)
+            tokens.append(("$", depth, i))
+        elif char == "(":
+            tokens.append((char, depth, i + 1))
+            depth += 1
+            i += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+            tokens.append((char, depth, i + 1))
+            i += 1
+        else:
+            match = _WORD_PATTERN.match(sql_query, i)
+            if match:
+                tokens.append((match.group(0).upper(), depth, match.end()))
+                i = match.end()
+            else:
+                tokens.append((char, depth, i + 1))
+                i += 1
+
+    return tokens
+
+
+def has_top_level_limit(sql_query: str) -> bool:
+    """
+    Check whether the outermost query already limits its rows.
+
+    Args:
+        sql_query: SQL query to check
+
+    Returns:
+        True if a top-level LIMIT or FETCH clause is present
+    """
+    return any(
+        depth == 0 and token in ("LIMIT", "FETCH")
+        for token, depth, _ in _top_level_tokens(sql_query)
+    )
+
+
+def is_read_only(sql_query: str) -> bool:
+    """
+    Check whether a statement only reads data.
+
+    Args:
+        sql_query: SQL statement to check
+
+    Returns:
+        True for a single SELECT or WITH query without data-modifying parts or SELECT INTO
+    """
+    tokens = _top_level_tokens(sql_query)
+    while tokens and tokens[-1][0] == ";":
+        tokens.pop()
+    if not tokens or tokens[0][0] not in ("SELECT", "WITH"):
+        return False
+    if any(token == ";" and depth == 0 for token, depth, _ in tokens):
+        return False
+    all_words = {token for token, _, _ in tokens}
+    top_level_words = {token for token, depth, _ in tokens if depth == 0}
+    return not (all_words & _WRITE_KEYWORDS or "INTO" in top_level_words)
+
+
+def apply_row_budget(sql_query: str, max_rows: Optional[int] = None, offset: int = 0) -> RowBudgetResult:
+    """
+    Add a LIMIT to a row-returning query that has none.
+
+    The LIMIT requests max_rows + 1 rows so that truncation can be detected;
+    callers keep at most row_limit rows of the result.
+
+    Args:
+        sql_query: SQL query to rewrite
+        max_rows: Maximum rows to keep, defaults to SQL_ROW_BUDGET
+        offset: Number of rows to skip, used for pagination
+
+    Returns:
+        RowBudgetResult with the SQL to execute and whether a LIMIT was added
+    """
+    if max_rows is None:
+        max_rows = ROW_BUDGET
+
+    unchanged = RowBudgetResult(sql_query=sql_query, applied=False)
+    if max_rows <= 0:
+        return unchanged
+
+    tokens = _top_level_tokens(sql_query)
+    significant = [token for token in tokens if token[0] != ";"]
+    if not significant or significant[0][0] not in _ROW_RETURNING_KEYWORDS:
+        return unchanged
+
+    # Only rewrite single statements; a ';' followed by more SQL means a script
+    first_semicolon = next((index for index, token in enumerate(tokens) if token[0] == ";"), None)
+    if first_semicolon is not None and any(token[0] != ";" for token in tokens[first_semicolon:]):
+        return unchanged
+
+    all_words = {token for token, _, _ in tokens}
+    top_level_words = {token for token, depth, _ in tokens if depth == 0}
+    if all_words & _WRITE_KEYWORDS or top_level_words & {"INTO", "LIMIT", "FETCH", "OFFSET"}:
+        return unchanged
+
+    # Insert right after the last significant token, keeping trailing ';' and comments
+    insert_at = significant[-1][2]
+    limit_clause = f"\nLIMIT {max_rows + 1}"
+    if offset:
+        limit_clause += f" OFFSET {offset}"
+
+    return RowBudgetResult(
+        sql_query=sql_query[:insert_at] + limit_clause + sql_query[insert_at:],
+        applied=True,
+        row_limit=max_rows
+    )
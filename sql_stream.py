@@ -0,0 +1,241 @@
+"""
+SQL Stream - Streamed SQL generation with early stop
+
+The LLM answer is streamed and assembled chunk by chunk. As soon as the
+statement is complete (a closing markdown fence, or a top-level semicolon
+when the model answers without a fence) the stream is closed, so trailing
+explanations are neither waited for nor generated. Partial SQL can be
+pushed to a callback (e.g. a UI placeholder) while it arrives.
+
+Configuration:
+- SQL_STREAM_GENERATION: Stream generation calls (default true)
+"""
+
+import os
+import re
+import string
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
+
+
+STREAM_GENERATION = os.getenv("SQL_STREAM_GENERATION", "true").lower() == "true"
+
+_OPENING_FENCE_PATTERN = re.compile(r"^\s*```[A-Za-z]*[ \t]*\n?")
+_DOLLAR_TAG_PATTERN = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+_PARTIAL_DOLLAR_TAG_PATTERN = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?")
+_WORD_START = set(string.ascii_letters + "_")
+_WORD_CHARS = set(string.ascii_letters + string.digits + "_$")
+
+
+class SQLStreamAssembler:
+    """
+    Collects streamed text and detects the end of the SQL statement.
+
+    The text is scanned incrementally: each feed() only looks at the new
+    characters, with the scanner state (parenthesis depth, open literal,
+    comment or dollar quote) kept between calls. A character that may start
+    a longer token ("-", "/", "$" or a closing quote) at the end of the text
+    is left for the next chunk. The statement ends just after the first
+    top-level semicolon; the tokens are those of sql_row_budget.py.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._fence_start: Optional[int] = None
+        self._unfenced: Optional[bool] = None
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._dollar_tag: Optional[str] = None
+        self._line_comment = False
+        self._comment_depth = 0
+        self._in_word = False
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add streamed text.
+
+        Args:
+            chunk: Next piece of the LLM answer
+
+        Returns:
+            True once the statement is complete
+        """
+        self.text += chunk
+        if self.end is None:
+            self.end = self._find_end()
+        return self.end is not None
+
+    def _find_end(self) -> Optional[int]:
+        if self._unfenced is None:
+            stripped = self.text.lstrip()
+            if not stripped:
+                return None
+            if stripped.startswith("```"):
+                self._unfenced = False
+                self._fence_start = len(self.text) - len(stripped) + 3
+                self._pos = self._fence_start
+            elif stripped.startswith("`"):
+                if stripped.strip("`"):
+                    # Not a markdown fence; the end is only known from the full answer
+                    self._unfenced = False
+                    self._fence_start = len(self.text)
+                    self._pos = -1
+                return None
+            else:
+                self._unfenced = True
+
+        if not self._unfenced:
+            if self._pos < 0:
+                return None
+            closing = self.text.find("```", self._pos)
+            if closing == -1:
+                self._pos = max(self._fence_start, len(self.text) - 2)
+                return None
+            return closing + 3
+        return self._scan()
+
+    def _scan(self) -> Optional[int]:
+        """Continue scanning for a top-level semicolon from the previous position"""
+        text = self.text
+        length = len(text)
+        i = self._pos
+
+        while i < length:
+            char = text[i]
+            if self._quote:
+                if char == self._quote:
+                    if i + 1 == length:
+                        break  # A doubled quote escapes itself
+                    if text[i + 1] == self._quote:
+                        i += 2
+                        continue
+                    self._quote = None
+                i += 1
+            elif self._dollar_tag:
+                closing = text.find(self._dollar_tag, i)
+                if closing == -1:
+                    i = max(i, length - len(self._dollar_tag) + 1)
+                    break
+                i = closing + len(self._dollar_tag)
+                self._dollar_tag = None
+            elif self._line_comment:
+                newline = text.find("\n", i)
+                if newline == -1:
+                    i = length
+                    break
+                i = newline + 1
+                self._line_comment = False
+            elif self._comment_depth:
+                # PostgreSQL block comments nest
+                if text.startswith("/*", i):
+                    self._comment_depth += 1
+                    i += 2
+                elif text.startswith("*/", i):
+                    self._comment_depth -= 1
+                    i += 2
+                elif char in "/*" and i + 1 == length:
+                    break
+                else:
+                    i += 1
+            elif self._in_word and char in _WORD_CHARS:
+                i += 1
+            else:
+                self._in_word = False
+                if char in "-/" and i + 1 == length:
+                    break
+                if text.startswith("--", i):
+                    self._line_comment = True
+                    i += 2
+                elif text.startswith("/*", i):
+                    self._comment_depth = 1
+                    i += 2
+                elif char in ("'", '"'):
+                    self._quote = char
+                    i += 1
+                elif char == "$":
+                    tag = _DOLLAR_TAG_PATTERN.match(text, i)
+                    if tag:
+                        self._dollar_tag = tag.group(0)
+                        i = tag.end()
+                    elif _PARTIAL_DOLLAR_TAG_PATTERN.fullmatch(text, i):
+                        break
+                    else:
+                        i += 1
+                elif char == "(":
+                    self._depth += 1
+                    i += 1
+                elif char == ")":
+                    self._depth = max(self._depth - 1, 0)
+                    i += 1
+                elif char == ";" and self._depth == 0:
+                    self._pos = i + 1
+                    return i + 1
+                else:
+                    self._in_word = char in _WORD_START
+                    i += 1
+
+        self._pos = i
+        return None
+
+    @property
+    def sql(self) -> str:
+        """SQL received so far, without markdown fences"""
+        text = self.text[:self.end] if self.end is not None else self.text
+        text = _OPENING_FENCE_PATTERN.sub("", text, count=1)
+        return text.replace("```", "").strip()
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of a streamed message chunk (string or content blocks)"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block) for block in content
+    )
+
+
+def stream_sql(llm: Any, messages: List[Any], on_partial: Optional[Callable[[str], None]] = None,
+               stop_early: bool = True) -> "AIMessage":
+    """
+    Stream a SQL generation call.
+
+    Args:
+        llm: Chat model
+        messages: Prompt messages
+        on_partial: Called with the SQL received so far after every chunk
+        stop_early: Close the stream once the statement is complete; disable
+            when text after the SQL (e.g. an explanation) is needed
+
+    Returns:
+        AIMessage with the received content (cut at the end of the statement
+        when stopped early) and the usage metadata the provider reported
+    """
+    from langchain_core.messages import AIMessage
+
+    assembler = SQLStreamAssembler()
+    aggregate = None
+    stream = llm.stream(messages)
+
+    try:
+        for chunk in stream:
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            complete = assembler.feed(_chunk_text(chunk))
+            if on_partial:
+                on_partial(assembler.sql)
+            if complete and stop_early:
+                break
+    finally:
+        # Closing the generator closes the provider stream, so no further tokens are generated
+        stream.close()
+
+    content = assembler.text[:assembler.end] if stop_early and assembler.end is not None else assembler.text
+    return AIMessage(
+        content=content,
+        usage_metadata=getattr(aggregate, "usage_metadata", None),
+        response_metadata={"stopped_early": stop_early and assembler.end is not None}
+    )
@@ -0,0 +1,244 @@
+"""
+Startup Profile - Cold import time of the agent entry points
+
+Importing an agent used to import LangChain, LangGraph, the Google GenAI SDK,
+boto3 and SQLAlchemy, reflect the database schema or extract the DDL, and
+create the LLM client.
+The FastAPI apps paid this on every (re)start and Streamlit on every rerun of
+a fresh process. The entry points now build these on first use (see
+sql_engine.py and engine_resources.py); this profile keeps it that way.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`
+and reported with:
+- import time (median and max over the runs) and peak RSS
+- the deferred modules loaded by the import (should be none)
+- the slowest imports by self time, from the -X importtime output
+- the time of the first use (llm, db and graph created), when the module has them
+
+Exits with status 1 when an entry point is slower than the budget or loads a
+deferred module, so the profile can gate releases like benchmark_pipeline.py.
+
+Configuration:
+- SQL_STARTUP_BUDGET_MS: Cold import budget per entry point (default: 1000)
+- LLM_BACKEND: Backend of the first use (default: mock, see llm_factory.py)
+- DATABASE_URL: Database of the first use
+
+Usage:
+    DATABASE_URL=sqlite:///dvdrental.db python startup_profile.py
+    python startup_profile.py --modules ai_sql_agent,fastapi_sql_api --repeat 5 --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+STARTUP_BUDGET_MS = float(os.getenv("SQL_STARTUP_BUDGET_MS", "1000"))
+
+ENTRY_POINTS = (
+    "ai_sql_agent", "ai_sql_agent_ddl", "ai_sql_agent_v2", "text_to_sql_ai_agent",
+    "text_to_sql_ai_agent_v2", "main_cli", "main_streamlit", "main_fastapi", "main",
+    "fastapi_sql_api",
+)
+
+# Heavy libraries that must only be imported when first used
+DEFERRED_MODULES = (
+    "langchain_core", "langchain_community", "langgraph",
+    "langchain_google_genai", "google.genai", "boto3", "sqlalchemy",
+)
+
+# Module attributes created on first use (see SQLEngine.module_getattr())
+FIRST_USE_ATTRIBUTES = ("llm", "db", "graph")
+
+# Runs in the fresh interpreter; the measurement is the last line of stdout
+_PROBE = """
+import sys, json, time, importlib
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+import_ms = (time.perf_counter() - start) * 1000
+deferred = [name for name in sys.argv[2].split(",") if name in sys.modules]
+first_use_ms = None
+attributes = [name for name in sys.argv[3].split(",") if name]
+if attributes:
+    start = time.perf_counter()
+    touched = [name for name in attributes if getattr(module, name, None) is not None]
+    if touched:
+        first_use_ms = (time.perf_counter() - start) * 1000
+try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_kb / (1024 * 1024) if sys.platform == "darwin" else peak_kb / 1024
+except ImportError:
+    peak_rss_mb = None
+print(json.dumps({"import_ms": import_ms, "deferred_loaded": deferred,
+                  "first_use_ms": first_use_ms, "peak_rss_mb": peak_rss_mb}))
+"""
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse the stderr of `python -X importtime`.
+
+    Args:
+        output: Lines like "import time:       448 |     422100 |   fastapi"
+
+    Returns:
+        (module, self microseconds, cumulative microseconds) per imported module
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return imports
+
+
+def _probe(module: str, first_use: bool) -> Tuple[Dict[str, Any], List[Tuple[str, int, int]]]:
+    env = dict(os.environ)
+    env.setdefault("LLM_BACKEND", "mock")
+    attributes = ",".join(FIRST_USE_ATTRIBUTES) if first_use else ""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, module, ",".join(DEFERRED_MODULES), attributes],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"Importing {module} failed: {completed.stderr.strip().splitlines()[-1:]}")
+    return json.loads(lines[-1]), parse_importtime(completed.stderr)
+
+
+def profile_module(module: str, repeat: int = 3, top: int = 10, first_use: bool = False) -> Dict[str, Any]:
+    """
+    Import a module in fresh interpreters and measure its startup.
+
+    Args:
+        module: Module name, importable from this directory
+        repeat: Number of fresh imports
+        top: Number of slowest imports to report
+        first_use: Also time creating the module's llm, db and graph (once)
+
+    Returns:
+        Startup metrics of the module
+    """
+    runs = [_probe(module, first_use=False) for _ in range(repeat)]
+    import_ms = [run[0]["import_ms"] for run in runs]
+    measurement, imports = runs[0]
+
+    slowest = sorted((entry for entry in imports if entry[0] != module), key=lambda entry: entry[1], reverse=True)
+    profile = {
+        "import_ms_median": round(statistics.median(import_ms), 1),
+        "import_ms_max": round(max(import_ms), 1),
+        "peak_rss_mb": None if measurement["peak_rss_mb"] is None else round(measurement["peak_rss_mb"], 1),
+        "deferred_loaded": measurement["deferred_loaded"],
+        "slowest_imports": [
+            {"module": name, "self_ms": round(self_us / 1000, 1), "cumulative_ms": round(cumulative_us / 1000, 1)}
+            for name, self_us, cumulative_us in slowest[:top]
+        ],
+        "first_use_ms": None,
+    }
+    if first_use:
+        first_use_ms = _probe(module, first_use=True)[0]["first_use_ms"]
+        profile["first_use_ms"] = None if first_use_ms is None else round(first_use_ms, 1)
+    return profile
+
+
+def profile_startup(modules: List[str], repeat: int = 3, top: int = 10, first_use: bool = False) -> Dict[str, Any]:
+    """
+    Profile the startup of the given entry points.
+
+    Returns:
+        Result document with the run settings and the metrics per module
+    """
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            "repeat": repeat,
+            "llm_backend": os.getenv("LLM_BACKEND", "mock"),
+            "python": sys.version.split()[0],
+        },
+        "modules": {},
+    }
+    for module in modules:
+        print(f"⏱️ Profiling import of {module} x {repeat}")
+        results["modules"][module] = profile_module(module, repeat, top, first_use)
+    return results
+
+
+def check_budget(results: Dict[str, Any], budget_ms: float = STARTUP_BUDGET_MS) -> List[str]:
+    """
+    Find entry points over the import budget or loading deferred modules.
+
+    Args:
+        results: Result document of profile_startup()
+        budget_ms: Allowed median import time per entry point
+
+    Returns:
+        Descriptions of the violations (empty if none)
+    """
+    violations = []
+    for module, metrics in results["modules"].items():
+        if metrics["import_ms_median"] > budget_ms:
+            violations.append(f"{module}: import takes {metrics['import_ms_median']}ms (budget {budget_ms:g}ms)")
+        if metrics["deferred_loaded"]:
+            violations.append(f"{module}: imports {', '.join(metrics['deferred_loaded'])} at startup")
+    return violations
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """Module metrics as a plain text table, followed by the slowest imports"""
+    lines = [f"{'module':<26}{'p50 ms':>9}{'max ms':>9}{'rss MB':>9}{'1st use':>9}  deferred"]
+    for module, m in results["modules"].items():
+        first_use = "-" if m["first_use_ms"] is None else m["first_use_ms"]
+        rss = "-" if m["peak_rss_mb"] is None else m["peak_rss_mb"]
+        lines.append(f"{module:<26}{m['import_ms_median']:>9}{m['import_ms_max']:>9}{rss:>9}{first_use:>9}  "
+                     f"{', '.join(m['deferred_loaded']) or '-'}")
+    for module, m in results["modules"].items():
+        if m["slowest_imports"]:
+            lines.append(f"\nSlowest imports of {module} (self ms / cumulative ms):")
+            lines.extend(f"   {entry['self_ms']:>7} / {entry['cumulative_ms']:>7}  {entry['module']}"
+                         for entry in m["slowest_imports"])
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profile the cold import time of the agent entry points")
+    parser.add_argument("--modules", default=",".join(ENTRY_POINTS),
+                        help="Comma-separated entry point modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh imports per module")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports reported per module")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Allowed median import time per module")
+    parser.add_argument("--first-use", action="store_true",
+                        help="Also time creating llm, db and graph (needs DATABASE_URL)")
+    parser.add_argument("--output", help="Result JSON file")
+    args = parser.parse_args()
+
+    modules = [name.strip() for name in args.modules.split(",") if name.strip()]
+    results = profile_startup(modules, args.repeat, args.top, args.first_use)
+
+    print()
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+    violations = check_budget(results, args.budget_ms)
+    if violations:
+        print(f"\n❌ {len(violations)} startup budget violation(s):")
+        for violation in violations:
+            print(f"   - {violation}")
+        return 1
+    print(f"\n✅ All entry points import within {args.budget_ms:g}ms without deferred modules")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Structured Output - JSON-schema responses read field by field
+
+Models without native structured output (the Lambda Bedrock proxy) used to
+be asked for plain text, which was then stripped of markdown and wrapped in
+the schema. Prose around the query ended up in the query, and nothing
+noticed.
+
+In JSON-schema mode the model is asked for a single JSON object matching the
+schema, and the response is fed through a streaming JSON parser as it
+arrives. As soon as the target field (the first field of the schema, e.g.
+QueryChecker.query) closes, the caller can stop reading the stream instead
+of waiting for the rest of the generation. Responses that are not valid JSON
+fall back to the old text extraction; every fallback is counted by reason.
+
+Configuration:
+- SQL_STRUCTURED_OUTPUT_MODE: "json_schema" or "text" (the old extraction) (default "json_schema")
+- SQL_STRUCTURED_MAX_TOKENS: Token budget of a structured response (default 1024)
+"""
+
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+
+STRUCTURED_OUTPUT_MODE = os.getenv("SQL_STRUCTURED_OUTPUT_MODE", "json_schema")
+STRUCTURED_MAX_TOKENS = int(os.getenv("SQL_STRUCTURED_MAX_TOKENS", "1024"))
+
+# Statements a checked query may start with
+_SQL_PREFIXES = ("SELECT", "WITH", "VALUES", "TABLE", "SHOW", "EXPLAIN", "INSERT", "UPDATE", "DELETE")
+
+
+class StructuredOutputError(Exception):
+    """The response could not be turned into the requested schema"""
+
+
+def target_field(schema: Type[BaseModel]) -> str:
+    """The field whose value ends the useful part of the response (the schema's first field)"""
+    return next(iter(schema.model_fields))
+
+
+def json_schema_instruction(schema: Type[BaseModel]) -> str:
+    """
+    Instruction appended to a prompt to get a JSON response matching the schema.
+
+    Args:
+        schema: Pydantic model of the expected response
+
+    Returns:
+        Instruction text including the JSON schema
+    """
+    field = target_field(schema)
+    return (
+        "Respond with a single JSON object that matches this JSON schema, and nothing else "
+        "(no markdown, no explanation):\n"
+        f"{json.dumps(schema.model_json_schema())}\n"
+        f'Put the "{field}" field first.'
+    )
+
+
+def looks_like_sql(query: str) -> bool:
+    """Check that a query starts like a SQL statement (and not like prose)"""
+    return bool(query) and query.lstrip("( \n\t").upper().startswith(_SQL_PREFIXES)
+
+
+class StreamingFieldParser:
+    """
+    Incremental JSON scanner that extracts one top-level string field.
+
+    Text before the first "{" (e.g. a markdown fence) is skipped. feed()
+    returns True once the field's string value has closed, so the caller can
+    stop reading; the full text stays available for a complete parse.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.text = ""
+        self.value: Optional[str] = None
+        self.complete = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._chars: list = []
+        self._string_role: Optional[str] = None
+        self._expect_key = False
+        self._after_colon = False
+        self._key: Optional[str] = None
+
+    @property
+    def field_closed(self) -> bool:
+        return self.value is not None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add response text.
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            True once the target field has been read
+        """
+        self.text += chunk
+        if self.field_closed or self.complete:
+            return self.field_closed
+        for char in chunk:
+            if self._in_string:
+                self._scan_string(char)
+                if self.field_closed:
+                    return True
+            elif self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._expect_key = True
+            elif char == '"':
+                self._in_string = True
+                self._chars = []
+                self._string_role = None
+                if self._depth == 1:
+                    self._string_role = "key" if self._expect_key else ("value" if self._after_colon else None)
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+                    return False
+            elif self._depth == 1 and char == ":":
+                self._after_colon = True
+            elif self._depth == 1 and char == ",":
+                self._expect_key = True
+                self._after_colon = False
+        return False
+
+    def _scan_string(self, char: str) -> None:
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            self._end_string()
+            return
+        self._chars.append(char)
+
+    def _end_string(self) -> None:
+        try:
+            text = json.loads('"' + "".join(self._chars) + '"')
+        except ValueError:
+            text = "".join(self._chars)
+        if self._string_role == "key":
+            self._key = text
+            self._expect_key = False
+        elif self._string_role == "value":
+            self._after_colon = False
+            if self._key == self.field:
+                self.value = text
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Parse the JSON object in a response, ignoring surrounding fences or text.
+
+    Raises:
+        StructuredOutputError: No JSON object could be parsed
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise StructuredOutputError("response contains no JSON object")
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise StructuredOutputError(f"invalid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise StructuredOutputError("response JSON is not an object")
+    return data
+
+
+def text_fallback(text: str, schema: Type[BaseModel]) -> BaseModel:
+    """The old extraction: strip markdown and put the whole text in the target field"""
+    value = re.sub(r"```[a-zA-Z]*", "", text).replace("```", "").strip()
+    if not value:
+        raise StructuredOutputError("empty response")
+    try:
+        return schema.model_validate({target_field(schema): value})
+    except ValidationError as e:
+        raise StructuredOutputError(f"response does not match {schema.__name__}: {e}") from e
+
+
+def parse_structured(parser: StreamingFieldParser, schema: Type[BaseModel]) -> Tuple[BaseModel, str]:
+    """
+    Build the schema from a (possibly partially read) response.
+
+    Args:
+        parser: Parser the response was fed to
+        schema: Pydantic model of the expected response
+
+    Returns:
+        (instance, how it was parsed): "field" when the scanned target field was enough
+        (reading stops there), "json" for a complete JSON object, "text" for the fallback extraction
+
+    Raises:
+        StructuredOutputError: Nothing usable in the response
+    """
+    if parser.field_closed and not parser.complete:
+        try:
+            return schema.model_validate({parser.field: parser.value}), "field"
+        except ValidationError:
+            # Other required fields: fall through to the complete response if we have it
+            pass
+    try:
+        return schema.model_validate(extract_json_object(parser.text)), "json"
+    except (StructuredOutputError, ValidationError):
+        return text_fallback(parser.text, schema), "text"
+
+
+def parse_stream(chunks: Iterable[str], schema: Type[BaseModel]) -> Tuple[BaseModel, str, StreamingFieldParser]:
+    """
+    Read response chunks until the target field closes, then parse.
+
+    Args:
+        chunks: Response text as it arrives; the remaining chunks are not read once the field closes
+        schema: Pydantic model of the expected response
+
+    Returns:
+        (instance, how it was parsed, parser)
+    """
+    parser = StreamingFieldParser(target_field(schema))
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    instance, method = parse_structured(parser, schema)
+    return instance, method, parser
+
+
+class StructuredOutputStats:
+    """Thread-safe counts of how structured responses were parsed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.methods: Dict[str, int] = {}
+        self.fallbacks: Dict[str, int] = {}
+        self.chars_read = 0
+
+    def record(self, method: str, chars_read: int = 0) -> None:
+        """Record a parsed response ("field", "json" or "text") and the characters read"""
+        with self._lock:
+            self.calls += 1
+            self.methods[method] = self.methods.get(method, 0) + 1
+            self.chars_read += chars_read
+
+    def record_fallback(self, reason: str) -> None:
+        """Record a response that did not give the schema directly (e.g. "not_json", "not_sql")"""
+        with self._lock:
+            self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Parse method counts, fallbacks by reason and the average response length read"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "methods": dict(self.methods),
+                "fallbacks": dict(self.fallbacks),
+                "fallback_rate": sum(self.fallbacks.values()) / self.calls if self.calls else 0.0,
+                "avg_chars_read": self.chars_read / self.calls if self.calls else 0.0,
+            }
+
+
+structured_output_stats = StructuredOutputStats()
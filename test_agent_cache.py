@@ -0,0 +1,85 @@
+"""
+Test script for the compiled ReAct sub-agent cache
+"""
+
+import sys
+import os
+import threading
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.tools import tool
+from mock_llm import MockChatModel
+from agent_cache import clear_agent_cache, get_agent_cache_stats, get_react_agent
+
+
+@tool
+def list_tables_tool(tool_input: str = "") -> str:
+    """List the tables in the database"""
+    return "actor, film"
+
+
+@tool
+def db_exec_tool(query: str) -> str:
+    """Execute a SQL query"""
+    return "[(200,)]"
+
+
+def test_agents_are_compiled_once():
+    """The same llm, tools and prompt reuse one compiled agent; other toolsets get their own"""
+    clear_agent_cache()
+    llm = MockChatModel()
+
+    first = get_react_agent(llm, [db_exec_tool])
+    second = get_react_agent(llm, [db_exec_tool])
+    other_tools = get_react_agent(llm, [list_tables_tool, db_exec_tool])
+    other_prompt = get_react_agent(llm, [db_exec_tool], prompt="Execute the query")
+    other_llm = get_react_agent(MockChatModel(), [db_exec_tool])
+
+    stats = get_agent_cache_stats()
+    print(f"Cache stats: {stats}")
+    assert first is second
+    assert len({id(first), id(other_tools), id(other_prompt), id(other_llm)}) == 4
+    assert stats["agents"] == 4
+
+
+def test_cached_agent_answers_questions():
+    """A shared agent can be invoked again and again"""
+    clear_agent_cache()
+    llm = MockChatModel()
+    question = {"messages": [("user", "How many actors are in the database?")]}
+
+    for _ in range(2):
+        result = get_react_agent(llm, [db_exec_tool]).invoke(question)
+        print(f"Answer: {result['messages'][-1].content}")
+        assert any(message.type == "tool" for message in result["messages"])
+
+
+def test_concurrent_requests_share_one_agent():
+    """Threads asking for the same agent at once get a single compiled graph"""
+    clear_agent_cache()
+    llm = MockChatModel()
+    agents = []
+    barrier = threading.Barrier(8)
+
+    def request():
+        barrier.wait()
+        agents.append(get_react_agent(llm, [list_tables_tool]))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(agents) == 8
+    assert len({id(agent) for agent in agents}) == 1
+    assert get_agent_cache_stats()["agents"] == 1
+
+
+if __name__ == "__main__":
+    test_agents_are_compiled_once()
+    test_cached_agent_answers_questions()
+    test_concurrent_requests_share_one_agent()
+    print("✅ All agent cache tests passed!")
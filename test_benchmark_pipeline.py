@@ -0,0 +1,53 @@
+"""
+Test script for the pipeline benchmark aggregation and regression check
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import compare_results, load_corpus, summarize_run
+
+
+def test_corpus_is_loaded_from_fixtures():
+    """The default corpus is the mock LLM fixture questions"""
+    questions = load_corpus()
+    print(f"Corpus size: {len(questions)}")
+    assert len(questions) > 10
+    assert "How many actors are in the database?" in questions
+
+
+def test_summarize_run():
+    """Latency percentiles and per-question counts are computed from the run"""
+    metrics = summarize_run([10.0, 20.0, 30.0, 40.0], wall_seconds=0.2, successes=3,
+                            llm_calls=8, db_round_trips=None)
+    print(f"Metrics: {metrics}")
+    assert metrics["throughput_qps"] == 20.0
+    assert metrics["latency_p50_ms"] == 20.0
+    assert metrics["latency_p99_ms"] == 40.0
+    assert metrics["llm_calls_per_question"] == 2.0
+    assert metrics["db_round_trips_per_question"] is None
+    assert metrics["success_rate"] == 0.75
+
+
+def test_regressions_are_reported():
+    """Only changes in the bad direction beyond the tolerance are regressions"""
+    baseline = {"variants": {"v2": {"throughput_qps": 10.0, "latency_p95_ms": 100.0, "llm_calls_per_question": 1.0}}}
+    current = {"variants": {
+        "v2": {"throughput_qps": 12.0, "latency_p95_ms": 130.0, "llm_calls_per_question": 1.05},
+        "react": {"throughput_qps": 1.0},
+    }}
+
+    regressions = compare_results(current, baseline, tolerance=0.10)
+    print(f"Regressions: {regressions}")
+    assert len(regressions) == 1
+    assert regressions[0].startswith("v2.latency_p95_ms")
+
+
+if __name__ == "__main__":
+    test_corpus_is_loaded_from_fixtures()
+    test_summarize_run()
+    test_regressions_are_reported()
+    print("✅ All benchmark pipeline tests passed!")
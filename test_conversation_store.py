@@ -0,0 +1,76 @@
+"""
+Test script for the compact per-thread conversation history
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import conversation_store
+from conversation_store import ConversationStore, conversation_inputs, history_message, record_turn
+
+LONG_RESULT = "The query returned 599 rows:\n" + "\n".join(f"customer {i} | {i * 3}" for i in range(599))
+
+
+def test_history_is_compact():
+    """Only the last turns are kept for prompts, with SQL fences and long results trimmed"""
+    store = ConversationStore(":memory:")
+    for i in range(8):
+        store.append_turn("t1", f"Question {i}", f"```sql\nSELECT {i};\n```", LONG_RESULT)
+
+    history = store.get_history("t1", max_turns=5)
+    print(f"Kept questions: {[turn.question for turn in history]}")
+    assert [turn.question for turn in history] == [f"Question {i}" for i in range(3, 8)]
+    assert history[-1].sql_query == "SELECT 7;"
+    assert len(history[-1].result_summary) <= conversation_store.CONVERSATION_RESULT_CHARS + 4
+    assert history[-1].result_summary.endswith("...")
+
+    message = history_message(history)
+    print(f"Context message: {len(message.content)} characters for 8 turns of {len(LONG_RESULT)}-character results")
+    assert "Question 7" in message.content and "Question 2" not in message.content
+    assert len(message.content) < 3000
+
+
+def test_threads_survive_a_restart():
+    """Another store on the same file (a restarted process) resumes each thread separately"""
+    path = os.path.join(tempfile.mkdtemp(), "conversations.sqlite3")
+    first = ConversationStore(path)
+    first.append_turn("alice", "How many customers are there?", "SELECT COUNT(*) FROM customer;", "count: 599")
+    first.append_turn("bob", "How many films are there?", "SELECT COUNT(*) FROM film;", "count: 1000")
+
+    restarted = ConversationStore(path)
+    alice = restarted.get_history("alice")
+    assert [turn.question for turn in alice] == ["How many customers are there?"]
+    assert alice[0].result_summary == "count: 599"
+
+    restarted.clear("alice")
+    assert restarted.get_history("alice") == []
+    assert len(restarted.get_history("bob")) == 1
+
+
+def test_follow_up_inputs():
+    """A follow-up gets one context message before the question; standalone questions get none"""
+    conversation_store._store = ConversationStore(":memory:")
+    try:
+        assert conversation_inputs("How many actors?", "t1") == {"messages": [("user", "How many actors?")]}
+
+        record_turn("t1", "How many actors?", "SELECT COUNT(*) FROM actor;", "count: 200")
+        record_turn(None, "Ignored without a thread", "SELECT 1;", "1")
+
+        messages = conversation_inputs("And how many films?", "t1")["messages"]
+        assert len(messages) == 2
+        assert "SELECT COUNT(*) FROM actor;" in messages[0].content
+        assert messages[1] == ("user", "And how many films?")
+        assert conversation_inputs("And how many films?")["messages"] == [("user", "And how many films?")]
+    finally:
+        conversation_store._store = None
+
+
+if __name__ == "__main__":
+    test_history_is_compact()
+    test_threads_survive_a_restart()
+    test_follow_up_inputs()
+    print("✅ All conversation store tests passed!")
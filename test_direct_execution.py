@@ -0,0 +1,118 @@
+"""
+Test script for the deterministic query_execute node helpers
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_community.utilities import SQLDatabase
+from direct_execution import await_summary, execute_query, fetch_result, format_result, start_summary
+
+
+def make_database():
+    db = SQLDatabase.from_uri("sqlite://")
+    db.run("CREATE TABLE actor (actor_id INTEGER, first_name TEXT)")
+    for i in range(1, 26):
+        db.run(f"INSERT INTO actor VALUES ({i}, 'Actor {i}')")
+    return db
+
+
+def test_raw_result_matches_database_run():
+    """The captured raw result keeps the SQLDatabase.run() format"""
+    db = make_database()
+    query = "SELECT actor_id, first_name FROM actor ORDER BY actor_id"
+
+    execution = execute_query(db, f"```sql\n{query}\n```")
+    print(execution.answer)
+    assert execution.sql_query == query
+    assert execution.raw_result == db.run(query)
+    assert execution.columns == ["actor_id", "first_name"]
+    assert len(execution.rows) == 25
+    assert execution.answer.startswith("The query returned 25 rows:")
+    assert execution.answer.endswith("... and 5 more rows")
+
+    empty = execute_query(db, "SELECT * FROM actor WHERE actor_id < 0")
+    assert empty.raw_result == "" and empty.answer == "The query returned no rows."
+
+    failed = execute_query(db, "SELECT missing FROM actor")
+    assert failed.error.startswith("Error:")
+    assert failed.raw_result == db.run_no_throw("SELECT missing FROM actor")
+
+
+def test_fetch_result_adapter():
+    """Rows come back untruncated with their columns; statements without rows are committed"""
+    db = make_database()
+    assert fetch_result(db, "UPDATE actor SET first_name = 'x' || printf('%.500d', 0) WHERE actor_id = 1") == ([], [])
+
+    query = "SELECT first_name FROM actor WHERE actor_id = 1"
+    columns, rows = fetch_result(db, query)
+    assert columns == ["first_name"] and len(rows[0][0]) == 501
+
+    execution = execute_query(db, query)
+    print(f"Raw result length: {len(execution.raw_result)}")
+    assert execution.raw_result == db.run(query)
+    assert execution.rows == rows and execution.answer.startswith("first_name: x000")
+
+
+def test_format_result():
+    """Single values are answered inline, other results as a table"""
+    assert format_result(["count"], [(200,)]) == "count: 200"
+
+    table = format_result(["name", "rentals"], [("Mary", 32), (None, 1)])
+    print(table)
+    assert table.splitlines() == [
+        "The query returned 2 rows:",
+        "name | rentals",
+        "-----+--------",
+        "Mary | 32",
+        "NULL | 1",
+    ]
+
+
+class SlowLLM:
+    """Async LLM stand-in that records whether its call was cancelled"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.cancelled = False
+
+    async def ainvoke(self, messages):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+        class Response:
+            content = "There are 200 actors."
+        return Response()
+
+
+def test_summary_is_optional_and_cancellable():
+    """A summary is returned when ready and cancelled when it times out"""
+    fast = SlowLLM(0.01)
+    summary = asyncio.run(await_summary(start_summary(fast, "How many actors?", "SELECT 1", "count: 200"), timeout=5))
+    assert summary == "There are 200 actors."
+
+    slow = SlowLLM(5)
+    started = time.perf_counter()
+    summary = asyncio.run(await_summary(start_summary(slow, "How many actors?", "SELECT 1", "count: 200"), timeout=0.1))
+    elapsed = time.perf_counter() - started
+    time.sleep(0.1)
+    print(f"Timed out summary returned after {elapsed:.2f}s, cancelled: {slow.cancelled}")
+    assert summary is None
+    assert elapsed < 1
+    assert slow.cancelled
+
+
+if __name__ == "__main__":
+    test_raw_result_matches_database_run()
+    test_fetch_result_adapter()
+    test_format_result()
+    test_summary_is_optional_and_cancellable()
+    print("✅ All direct execution tests passed!")
@@ -0,0 +1,108 @@
+"""
+Test script for the few-shot example store
+Uses temporary files instead of the default sql_examples.json.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from example_store import ExampleStore, FewShotStats, format_examples
+
+
+def test_nearest_examples_are_retrieved():
+    """The seed examples closest to a question come first"""
+    store = ExampleStore(path=None)
+    examples = store.search("Which actors appeared in comedy movies?", k=2)
+    print([example.question for example in examples])
+    assert examples[0].question == "Which actors have appeared in action movies?"
+    assert "Question: Which actors have appeared in action movies?" in format_examples(examples)
+    assert store.search("zzz qqq") == []
+
+
+def test_store_persists_and_grows():
+    """Successful runs are added and survive a reload"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "examples.json")
+        store = ExampleStore(path=path)
+        store.add("How many films are rated PG?", "SELECT COUNT(*) FROM film WHERE rating = 'PG';")
+        store.flush()
+
+        reloaded = ExampleStore(path=path)
+        assert len(reloaded) == len(store)
+        examples = reloaded.search("How many films are rated R?", k=1)
+        assert examples[0].sql_query == "SELECT COUNT(*) FROM film WHERE rating = 'PG';"
+        reloaded.flush()
+
+
+def test_writes_are_batched_and_keep_usage():
+    """Additions are written once per flush interval, with the usage fields eviction relies on"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "examples.json")
+        store = ExampleStore(path=path, flush_seconds=60)
+        seeded_at = os.path.getmtime(path)
+        for rating in ("PG", "R", "G"):
+            store.add(f"How many films are rated {rating}?", f"SELECT COUNT(*) FROM film WHERE rating = '{rating}';")
+        used = store.search("How many films are rated NC-17?", k=1)[0]
+
+        assert len(ExampleStore(path=path, seed_examples=[])) == len(store) - 3
+        assert os.path.getmtime(path) == seeded_at
+        store.flush()
+        print(f"Files after flush: {os.listdir(tmp_dir)}")
+        assert os.listdir(tmp_dir) == ["examples.json"]
+
+        reloaded = ExampleStore(path=path)
+        saved = reloaded._examples[reloaded._key(used.question)]
+        assert len(reloaded) == len(store)
+        assert (saved.hits, saved.last_used) == (1, used.last_used)
+
+    # A short interval writes in the background
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "examples.json")
+        store = ExampleStore(path=path, flush_seconds=0.05)
+        store.add("How many films are there?", "SELECT COUNT(*) FROM film;")
+        time.sleep(0.3)
+        assert len(ExampleStore(path=path)) == len(store)
+
+
+def test_eviction_keeps_seed_examples():
+    """The size cap evicts the least recently used learned examples"""
+    seeds = [("How many actors are in the database?", "SELECT COUNT(*) FROM actor;")]
+    store = ExampleStore(path=None, max_size=3, seed_examples=seeds)
+    store.add("How many films are there?", "SELECT COUNT(*) FROM film;")
+    store.add("How many customers are there?", "SELECT COUNT(*) FROM customer;")
+    store.search("number of films")
+    store.add("How many stores are there?", "SELECT COUNT(*) FROM store;")
+
+    questions = {example.question for example in store._examples.values()}
+    print(questions)
+    assert len(store) == 3
+    assert "How many actors are in the database?" in questions
+    assert "How many films are there?" in questions
+    assert "How many customers are there?" not in questions
+
+
+def test_accuracy_per_token():
+    """Questions with and without examples are compared per token spent"""
+    stats = FewShotStats()
+    stats.record(examples_used=3, success=True, tokens=500)
+    stats.record(examples_used=0, success=False, tokens=400)
+    stats.record(examples_used=0, success=True, tokens=600)
+
+    summary = stats.summary()
+    print(f"Summary: {summary}")
+    assert summary["with_examples"]["successes_per_1k_tokens"] == 2.0
+    assert summary["without_examples"]["success_rate"] == 0.5
+
+
+if __name__ == "__main__":
+    test_nearest_examples_are_retrieved()
+    test_store_persists_and_grows()
+    test_writes_are_batched_and_keep_usage()
+    test_eviction_keeps_seed_examples()
+    test_accuracy_per_token()
+    print("✅ All example store tests passed!")
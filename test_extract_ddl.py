@@ -0,0 +1,43 @@
+"""
+Test script for the DDL column definitions built from catalog rows
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from extract_ddl import _column_definition, _group_by_constraint
+
+
+def test_column_definitions():
+    """Catalog column rows map to the same column lines as before"""
+    cases = [
+        (("title", "character varying", 255, "NO", None, "varchar"), "    title VARCHAR(255) NOT NULL"),
+        (("note", "character varying", None, "YES", None, "varchar"), "    note VARCHAR"),
+        (("name", "character", 20, "NO", None, "bpchar"), "    name CHAR(20) NOT NULL"),
+        (("last_update", "timestamp without time zone", None, "NO", "now()", "timestamp"),
+         "    last_update TIMESTAMP NOT NULL DEFAULT now()"),
+        (("film_id", "integer", None, "NO", "nextval('film_film_id_seq'::regclass)", "int4"),
+         "    film_id INTEGER NOT NULL SERIAL"),
+        (("rating", "USER-DEFINED", None, "YES", "'G'::mpaa_rating", "mpaa_rating"),
+         "    rating MPAA_RATING DEFAULT 'G'::mpaa_rating"),
+        (("special_features", "ARRAY", None, "YES", None, "_text"), "    special_features ARRAY"),
+    ]
+    for row, expected in cases:
+        definition = _column_definition(*row)
+        print(definition)
+        assert definition == expected
+
+
+def test_group_by_constraint():
+    """Rows are grouped by constraint name, keeping their order"""
+    grouped = _group_by_constraint([("pk", "a", 1), ("fk", "b", 1), ("pk", "c", 2)])
+    assert grouped == {"pk": [("a", 1), ("c", 2)], "fk": [("b", 1)]}
+
+
+if __name__ == "__main__":
+    test_column_definitions()
+    test_group_by_constraint()
+    print("✅ All DDL extraction tests passed!")
@@ -8,6 +8,7 @@ import os
 
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SQL_EXAMPLE_STORE_PATH", "")  # Learned examples stay in memory
 
 from ai_sql_agent_v2 import process_query
 import pandas as pd
@@ -0,0 +1,137 @@
+"""
+Test script for the template fast-path intent router
+Uses a small in-memory set of dimension values instead of the SQL execution API.
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from intent_router import IntentRouter
+
+DDL = """
+CREATE TABLE actor (
+    actor_id INTEGER NOT NULL SERIAL
+);
+CREATE TABLE film (
+    film_id INTEGER NOT NULL SERIAL
+);
+CREATE TABLE customer (
+    customer_id INTEGER NOT NULL SERIAL
+);
+"""
+
+DIMENSIONS = {
+    "category": ["Action", "Comedy", "Sci-Fi"],
+    "city": ["Aurora", "New York"],
+    "actor": ["PENELOPE GUINESS"],
+    "customer": ["MARY SMITH"],
+}
+
+
+def fake_execute(sql):
+    """Return dimension values for the router's lookup queries"""
+    for name, values in DIMENSIONS.items():
+        if f"FROM {name};" in sql:
+            return {"success": True, "result": [{"value": value} for value in values]}
+    return {"success": False, "result": None}
+
+
+def test_confident_matches():
+    """Common intents are answered from templates"""
+    router = IntentRouter(DDL, execute_fn=fake_execute)
+    expectations = [
+        ("How many actors are in the database?", "table_row_count", "FROM actor"),
+        ("What is the name of the database?", "database_name", "current_database()"),
+        ("What's the database version?", "database_version", "version()"),
+        ("What are the top 5 film categories by number of films?", "top_categories_by_films", "LIMIT 5"),
+        ("How many comedy films are there?", "category_film_count", "c.name = 'Comedy'"),
+        ("Show me the rentals of Mary Smith", "customer_rentals", "c.last_name = 'SMITH'"),
+        ("List customers in New York", "customers_in_city", "ci.city = 'New York'"),
+    ]
+
+    for question, template_id, sql_fragment in expectations:
+        match = router.route(question)
+        print(f"{question} -> {match.template_id if match else None}")
+        assert match is not None
+        assert match.template_id == template_id
+        assert sql_fragment in match.sql_query
+
+
+def test_unmatched_questions_go_to_llm():
+    """Questions with unexplained content are not answered from templates"""
+    router = IntentRouter(DDL, execute_fn=fake_execute)
+    for question in [
+        "How many actors appear in films in the Action category?",
+        "Find customers who have never rented a movie",
+        "What is the average rental price for each film category?",
+    ]:
+        match = router.route(question)
+        print(f"{question} -> {match.template_id if match else None}")
+        assert match is None
+
+    stats = router.stats()
+    assert stats["misses"] == 3
+    assert stats["hit_ratio"] == 0.0
+
+
+def test_metric_direction_and_negation_go_to_llm():
+    """A template that does not name the metric, direction or negation never answers"""
+    router = IntentRouter(DDL, execute_fn=fake_execute)
+    for question in [
+        "What are the top 5 categories by revenue?",
+        "Top 3 least popular categories",
+        "Top 10 actors by revenue",
+        "Show the top films in Comedy by revenue",
+        "How many customers never rented a film?",
+        "How many inactive customers are there?",
+        "Top 5 categories by average rental price",
+        "How many films are not in the Comedy category?",
+    ]:
+        match = router.route(question)
+        print(f"{question} -> {match.template_id if match else None}")
+        assert match is None
+
+
+def test_unused_entities_and_words_go_to_llm():
+    """An entity, number or word the template does not use sends the question to the LLM"""
+    router = IntentRouter(DDL + "CREATE TABLE rental (\n    rental_id INTEGER NOT NULL SERIAL\n);\n",
+                          execute_fn=fake_execute)
+    for question in [
+        "How many customers in London",
+        "How many customers in Aurora",
+        "how many rentals in 2005",
+        "top actors in Action films",
+        "Count Mary Smith rentals",
+        "How many films are there in 5 stores?",
+    ]:
+        match = router.route(question)
+        print(f"{question} -> {match.template_id if match else None}")
+        assert match is None
+
+    assert router.route("How many rentals are there?").template_id == "table_row_count"
+    assert router.route("Top 3 actors").sql_query.endswith("LIMIT 3;")
+
+
+def test_hit_statistics():
+    """Hits are counted per template"""
+    router = IntentRouter(DDL, execute_fn=fake_execute)
+    router.route("How many films are there?")
+    router.route("Count the total number of customers")
+    router.route("Which store has more inventory?")
+
+    stats = router.stats()
+    print(f"Stats: {stats}")
+    assert stats["template_hits"]["table_row_count"] == 2
+    assert stats["misses"] == 1
+
+
+if __name__ == "__main__":
+    test_confident_matches()
+    test_unmatched_questions_go_to_llm()
+    test_metric_direction_and_negation_go_to_llm()
+    test_unused_entities_and_words_go_to_llm()
+    test_hit_statistics()
+    print("✅ All intent router tests passed!")
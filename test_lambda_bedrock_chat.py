@@ -0,0 +1,182 @@
+"""
+Test script for the pooled, retrying Lambda Bedrock chat model
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import asyncio
+import threading
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from botocore.exceptions import ReadTimeoutError
+from langchain_core.messages import HumanMessage
+from lambda_bedrock_chat import LambdaBedrockChat, LambdaInvocationError
+from speculative_generation import SPECULATIVE_TEMPERATURES, candidate_models
+
+THROTTLED = {"errorType": "ThrottlingException", "errorMessage": "Rate exceeded"}
+ACCESS_DENIED = {"errorType": "AccessDeniedException", "errorMessage": "Model access is denied"}
+COMPLETION = {"response": {"content": "SELECT COUNT(*) FROM customer;"}}
+
+
+class FakeLambdaClient:
+    """Stands in for boto3's Lambda client, replying with the queued payloads"""
+
+    def __init__(self, payloads, latency=0.0, error=None):
+        self.payloads = list(payloads)
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        with self._lock:
+            self.calls += 1
+            self.requests.append(json.loads(Payload))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            payload = self.payloads.pop(0) if len(self.payloads) > 1 else self.payloads[0]
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        if self.error is not None:
+            raise self.error
+        response = {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(payload).encode())}
+        if "errorMessage" in payload:
+            response["FunctionError"] = "Unhandled"
+        return response
+
+
+def make_chat(payloads, latency=0.0, error=None, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    return LambdaBedrockChat(lambda_client=FakeLambdaClient(payloads, latency, error), **kwargs)
+
+
+def test_client_configuration():
+    """The boto3 client is built once with the pool size, timeouts and a single botocore attempt"""
+    chat = LambdaBedrockChat(max_pool_connections=25, connect_timeout=2, read_timeout=30, max_attempts=4)
+    config = chat.lambda_client.meta.config
+    print(f"Pool: {config.max_pool_connections}, timeouts: {config.connect_timeout}/{config.read_timeout}, "
+          f"retries: {config.retries}")
+    assert config.max_pool_connections == 25
+    assert (config.connect_timeout, config.read_timeout) == (2, 30)
+    assert config.retries == {"total_max_attempts": 1, "mode": "adaptive"}
+
+
+def test_throttling_is_retried():
+    """A throttled function call is retried with backoff until it succeeds"""
+    chat = make_chat([THROTTLED, THROTTLED, COMPLETION])
+    result = chat.invoke([HumanMessage(content="How many customers are there?")])
+    print(f"Calls: {chat.lambda_client.calls}, answer: {result.content}")
+    assert result.content == "SELECT COUNT(*) FROM customer;"
+    assert chat.lambda_client.calls == 3
+
+
+def test_errors_are_raised():
+    """Other errors raise at once, throttling raises after the last attempt"""
+    chat = make_chat([ACCESS_DENIED])
+    try:
+        chat.invoke("How many customers are there?")
+        raise AssertionError("Expected LambdaInvocationError")
+    except LambdaInvocationError as e:
+        print(f"Raised: {e}")
+        assert not e.throttled and "AccessDeniedException" in str(e)
+    assert chat.lambda_client.calls == 1
+
+    chat = make_chat([THROTTLED], max_attempts=3)
+    try:
+        chat.invoke("How many customers are there?")
+        raise AssertionError("Expected LambdaInvocationError")
+    except LambdaInvocationError as e:
+        assert e.throttled
+    assert chat.lambda_client.calls == 3
+
+    chat = make_chat([{"response": {"content": ""}}])
+    try:
+        chat.invoke("How many customers are there?")
+        raise AssertionError("Expected LambdaInvocationError")
+    except LambdaInvocationError as e:
+        assert "empty completion" in str(e)
+
+
+def test_read_timeouts_are_not_retried():
+    """A read timeout may leave the generation running, so it is not sent again"""
+    chat = make_chat([COMPLETION], error=ReadTimeoutError(endpoint_url="https://lambda"))
+    try:
+        chat.invoke("How many customers are there?")
+        raise AssertionError("Expected LambdaInvocationError")
+    except LambdaInvocationError as e:
+        print(f"Raised: {e}")
+        assert not e.retryable
+    assert chat.lambda_client.calls == 1
+
+
+def test_call_deadline():
+    """One deadline covers the call, its retries and their backoff"""
+    chat = make_chat([COMPLETION], latency=1.0, call_timeout=0.2)
+    start = time.perf_counter()
+    for invoke in (chat.invoke, lambda prompt: asyncio.run(chat.ainvoke(prompt))):
+        try:
+            invoke("How many customers are there?")
+            raise AssertionError("Expected LambdaInvocationError")
+        except LambdaInvocationError as e:
+            assert "did not complete within 0.2s" in str(e)
+    elapsed = time.perf_counter() - start
+    print(f"Two timed out calls took {elapsed:.2f}s")
+    assert elapsed < 1.0
+
+    # No backoff that would end after the deadline
+    chat = make_chat([THROTTLED], backoff_base=5, call_timeout=1, max_attempts=5)
+    start = time.perf_counter()
+    try:
+        chat.invoke("How many customers are there?")
+        raise AssertionError("Expected LambdaInvocationError")
+    except LambdaInvocationError as e:
+        assert e.throttled
+    assert time.perf_counter() - start < 1.0
+
+
+def test_async_calls_run_concurrently():
+    """ainvoke() does not block the event loop: concurrent calls share the pooled client"""
+    latency = 0.2
+    chat = make_chat([COMPLETION], latency=latency, max_pool_connections=8)
+
+    async def run():
+        return await asyncio.gather(*(chat.ainvoke(f"Question {i}") for i in range(8)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    print(f"8 concurrent calls of {latency}s took {elapsed:.2f}s (max in flight: {chat.lambda_client.max_active})")
+    assert all(result.content == "SELECT COUNT(*) FROM customer;" for result in results)
+    assert chat.lambda_client.max_active == 8
+    assert elapsed < latency * 3
+
+
+def test_temperature_is_sent():
+    """Copies with another temperature (speculative candidates) send it to the function"""
+    chat = make_chat([COMPLETION])
+    candidates = candidate_models(chat, k=3)
+    for candidate in candidates:
+        candidate.invoke("How many customers are there?")
+    temperatures = [request["model_kwargs"]["temperature"] for request in chat.lambda_client.requests]
+    print(f"Temperatures sent: {temperatures}")
+    assert temperatures == [chat.temperature] + [SPECULATIVE_TEMPERATURES[i % len(SPECULATIVE_TEMPERATURES)] for i in (1, 2)]
+
+
+if __name__ == "__main__":
+    test_client_configuration()
+    test_throttling_is_retried()
+    test_errors_are_raised()
+    test_read_timeouts_are_not_retried()
+    test_call_deadline()
+    test_async_calls_run_concurrently()
+    test_temperature_is_sent()
+    print("✅ All Lambda Bedrock chat tests passed!")
@@ -0,0 +1,202 @@
+"""
+Test script for the latency-aware LLM router
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from typing import Any, List, Optional
+from pydantic import BaseModel, Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+from mock_llm import MockChatModel
+from llm_router import LLMRouter, RouterChatModel
+from speculative_generation import SPECULATIVE_TEMPERATURES, candidate_models
+
+QUESTION = "How many actors are in the database?"
+
+
+class FailingChatModel(BaseChatModel):
+    """Backend whose every call fails"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "failing"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        raise ConnectionError("backend is down")
+
+
+class TextOnlyChatModel(BaseChatModel):
+    """Backend without tool calling, like the Lambda proxy"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "text-only"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="SELECT 1;"))])
+
+
+class NoToolsAtRuntimeModel(TextOnlyChatModel):
+    """Backend whose bind_tools exists but refuses when called"""
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        raise NotImplementedError("no tool calling")
+
+
+class TemperatureEchoModel(TextOnlyChatModel):
+    """Backend that answers with its sampling temperature"""
+
+    temperature: float = 0.1
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=str(self.temperature)))])
+
+
+class QueryChecker(BaseModel):
+    query: str = Field(description="The checked query")
+
+
+@tool
+def db_exec_tool(query: str) -> str:
+    """Execute a SQL query"""
+    return "[(200,)]"
+
+
+def make_model(backends, **kwargs) -> RouterChatModel:
+    kwargs.setdefault("hedge", False)
+    kwargs.setdefault("min_samples", 2)
+    return RouterChatModel(router=LLMRouter(backends, **kwargs))
+
+
+def test_routes_to_the_fastest_backend():
+    """Every backend is measured first, then calls go to the fastest one"""
+    model = make_model({"slow": MockChatModel(latency_ms=80), "fast": MockChatModel(latency_ms=5)})
+    backends = [model.invoke(QUESTION).response_metadata["llm_backend"] for _ in range(10)]
+    summary = model.router.summary()
+    print(f"Backends used: {backends}")
+    print(f"Health: {summary['backends']}")
+    assert backends[:4].count("slow") == 2
+    assert backends[4:] == ["fast"] * 6
+    assert summary["recent_decisions"][-1]["reason"] == "fastest"
+
+
+def test_failover_and_health():
+    """A failing backend is skipped within the request, then marked unhealthy"""
+    model = make_model({"down": FailingChatModel(), "mock": MockChatModel()}, cooldown_seconds=60)
+    for _ in range(4):
+        assert "FROM actor" in model.invoke(QUESTION).content
+
+    summary = model.router.summary()
+    decisions = summary["recent_decisions"]
+    print(f"Decisions: {[(d['backend'], d['reason'], d['failovers']) for d in decisions]}")
+    assert decisions[0]["failovers"] == ["down"]
+    assert not summary["backends"]["down"]["healthy"]
+    assert decisions[-1]["reason"] == "only_healthy" and decisions[-1]["failovers"] == []
+    assert summary["backends"]["down"]["calls"] == 2
+
+
+def test_hedged_request_beats_a_slow_backend():
+    """When the first backend is slower than the hedge delay, the next backend answers"""
+    model = make_model({"stalled": MockChatModel(latency_ms=600), "mock": MockChatModel(latency_ms=10)},
+                       hedge=True, hedge_after_ms=50)
+    start = time.perf_counter()
+    message = model.invoke(QUESTION)
+    elapsed = time.perf_counter() - start
+    decision = model.router.summary()["recent_decisions"][-1]
+    print(f"Answered by {message.response_metadata['llm_backend']} in {elapsed * 1000:.0f}ms: {decision}")
+    assert message.response_metadata["llm_backend"] == "mock"
+    assert decision["hedged"] and elapsed < 0.3
+
+    # The stalled backend has not answered yet, so the next call does not wait for it
+    start = time.perf_counter()
+    message = model.invoke(QUESTION)
+    assert message.response_metadata["llm_backend"] == "mock" and time.perf_counter() - start < 0.05
+    assert not model.router.summary()["recent_decisions"][-1]["hedged"]
+
+
+def test_async_tools_and_structured_output():
+    """Tool binding and structured output are routed per backend; ainvoke hedges too"""
+    model = make_model({"stalled": MockChatModel(latency_ms=600), "mock": MockChatModel(latency_ms=10)},
+                       hedge=True, hedge_after_ms=50)
+
+    message = asyncio.run(model.bind_tools([db_exec_tool]).ainvoke(QUESTION))
+    assert message.tool_calls[0]["name"] == "db_exec_tool"
+    assert message.response_metadata["llm_backend"] == "mock"
+
+    checked = model.with_structured_output(QueryChecker).invoke("Check this.\nQuery:\nSELECT 1;")
+    assert checked.query == "SELECT 1;"
+
+
+def test_tool_calls_skip_backends_without_tools():
+    """Tool-bound calls only go to backends that support tools; that is not a health failure"""
+    model = make_model({"lambda": TextOnlyChatModel(), "refusing": NoToolsAtRuntimeModel(), "mock": MockChatModel()},
+                       cooldown_seconds=60)
+    bound = model.bind_tools([db_exec_tool])
+    for _ in range(4):
+        message = bound.invoke(QUESTION)
+        assert message.response_metadata["llm_backend"] == "mock"
+
+    summary = model.router.summary()
+    print(f"Health: {summary['backends']}")
+    for name in ("lambda", "refusing"):
+        assert summary["backends"][name]["healthy"]
+        assert summary["backends"][name]["errors"] == 0
+        assert "tools" in summary["backends"][name]["unsupported"]
+    # The learned backend is skipped after its first refusal, the known one is never called
+    assert summary["backends"]["lambda"]["calls"] == 0
+    assert summary["backends"]["refusing"]["calls"] == 0
+
+    # Plain calls still reach the backends without tools
+    assert model.invoke(QUESTION).response_metadata["llm_backend"] in ("lambda", "refusing", "mock")
+    assert model.router.plan()[0][0] in ("lambda", "refusing")
+
+
+def test_queued_calls_do_not_hedge():
+    """The hedge delay starts when a call runs, not while it waits for a worker thread"""
+    model = make_model({"first": MockChatModel(latency_ms=100), "second": MockChatModel(latency_ms=100)},
+                       hedge=True, hedge_after_ms=150, min_samples=1000)
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        messages = list(pool.map(lambda _: model.invoke(QUESTION), range(64)))
+
+    summary = model.router.summary()
+    print(f"Hedged {summary['hedged_requests']} of {len(messages)}, health: {summary['backends']}")
+    assert all("FROM actor" in message.content for message in messages)
+    assert summary["hedged_requests"] == 0
+    assert sum(health["calls"] for health in summary["backends"].values()) == 64
+
+
+def test_temperature_reaches_the_backends():
+    """Speculative candidates of a router model call the backends with their own temperatures"""
+    model = make_model({"echo": TemperatureEchoModel()})
+    answers = [candidate.invoke(QUESTION).content for candidate in candidate_models(model, k=3)]
+    print(f"Answers: {answers}")
+    assert answers == ["0.1"] + [str(SPECULATIVE_TEMPERATURES[i % len(SPECULATIVE_TEMPERATURES)]) for i in (1, 2)]
+    assert model.router.backends["echo"].temperature == 0.1
+
+    # Backends without a temperature are called unchanged
+    text_only = make_model({"lambda": TextOnlyChatModel()}).model_copy(update={"temperature": 0.8})
+    assert text_only.invoke(QUESTION).content == "SELECT 1;"
+
+
+if __name__ == "__main__":
+    test_routes_to_the_fastest_backend()
+    test_failover_and_health()
+    test_hedged_request_beats_a_slow_backend()
+    test_async_tools_and_structured_output()
+    test_tool_calls_skip_backends_without_tools()
+    test_queued_calls_do_not_hedge()
+    test_temperature_reaches_the_backends()
+    print("✅ All LLM router tests passed!")
@@ -0,0 +1,61 @@
+"""
+Test script for the SQL execution API load test workload and reporting
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from load_test_sql_api import Workload, find_saturation, summarize_level
+
+BOUNDS = {"film_id": 1000, "rental_id": 16044, "payment_id": 14596, "customer_id": 599}
+
+
+def test_workload_is_seeded_and_weighted():
+    """The same seed replays the same mix, which is dominated by /execute requests"""
+    workload_a, workload_b = Workload(BOUNDS, seed=7), Workload(BOUNDS, seed=7)
+    requests_a = [workload_a.next_request() for _ in range(500)]
+    requests_b = [workload_b.next_request() for _ in range(500)]
+    assert requests_a == requests_b
+
+    execute_share = sum(1 for _, _, path, _ in requests_a if path == "/execute") / len(requests_a)
+    print(f"Share of /execute requests: {execute_share:.0%}")
+    assert execute_share > 0.8
+    assert any(path.startswith("/schema/") for _, _, path, _ in requests_a)
+    assert all("{" not in body["sql"] for _, _, _, body in requests_a if body)
+
+
+def test_summarize_level():
+    """Errors are excluded from throughput and broken down per operation"""
+    samples = [("film_by_id", 10.0, None), ("film_by_id", 20.0, None), ("tables", 300.0, "HTTP 500")]
+    result = summarize_level("closed", 2, samples, duration_seconds=1.0)
+    print(f"Level: {result}")
+    assert result["throughput_rps"] == 2.0
+    assert result["error_rate"] == round(1 / 3, 4)
+    assert result["error_types"] == {"HTTP 500": 1}
+    assert result["operations"]["film_by_id"]["latency_ms"]["p50"] == 10.0
+
+
+def test_find_saturation():
+    """Closed loop peaks at the best throughput; open loop at the highest served rate"""
+    closed = [
+        {"mode": "closed", "level": 1, "throughput_rps": 90.0, "error_rate": 0.0},
+        {"mode": "closed", "level": 8, "throughput_rps": 110.0, "error_rate": 0.0},
+        {"mode": "closed", "level": 32, "throughput_rps": 120.0, "error_rate": 0.05},
+    ]
+    assert find_saturation(closed)["level"] == 8
+
+    open_levels = [
+        {"mode": "open", "level": 50, "offered_rps": 49.0, "throughput_rps": 48.5, "error_rate": 0.0},
+        {"mode": "open", "level": 200, "offered_rps": 201.0, "throughput_rps": 80.0, "error_rate": 0.0},
+    ]
+    assert find_saturation(open_levels)["level"] == 50
+
+
+if __name__ == "__main__":
+    test_workload_is_seeded_and_weighted()
+    test_summarize_level()
+    test_find_saturation()
+    print("✅ All load test tests passed!")
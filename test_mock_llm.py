@@ -0,0 +1,112 @@
+"""
+Test script for the offline mock LLM backend
+"""
+
+import sys
+import os
+import asyncio
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import tool
+from mock_llm import MockChatModel, UNKNOWN_QUESTION_SQL
+from engine_resources import get_llm
+
+
+@tool
+def db_exec_tool(query: str) -> str:
+    """Execute a SQL query"""
+    return query
+
+
+class QueryChecker(BaseModel):
+    query: str = Field(description="The corrected postgres query")
+
+
+def test_recorded_question_is_replayed():
+    """The fixture SQL of the asked question is returned with token usage"""
+    llm = MockChatModel(input_tokens=500, output_tokens=20)
+    response = llm.invoke([
+        SystemMessage(content="Schema ..."),
+        HumanMessage(content="Question: Which store has more inventory?\nNatural language query: How many actors are in the database?")
+    ])
+    print(f"Response: {response.content!r}")
+    assert "FROM actor" in response.content
+    assert response.usage_metadata["input_tokens"] == 500
+    assert response.usage_metadata["output_tokens"] == 20
+
+    assert UNKNOWN_QUESTION_SQL in llm.invoke("What is the meaning of life?").content
+
+
+def test_streaming_and_async_match_invoke():
+    """Streamed chunks and ainvoke give the same answer as invoke"""
+    llm = MockChatModel()
+    question = "How many films are there?"
+    streamed = "".join(chunk.content for chunk in llm.stream(question))
+    assert streamed == llm.invoke(question).content
+    assert asyncio.run(llm.ainvoke(question)).content == streamed
+
+
+def test_tool_call_then_summary():
+    """With an execution tool bound the model calls it, then summarizes the tool result"""
+    llm = MockChatModel().bind_tools([db_exec_tool])
+    first = llm.invoke([HumanMessage(content="How many actors are in the database?")])
+    print(f"Tool calls: {first.tool_calls}")
+    assert first.tool_calls[0]["name"] == "db_exec_tool"
+    assert "FROM actor" in first.tool_calls[0]["args"]["query"]
+
+    second = llm.invoke([
+        HumanMessage(content="How many actors are in the database?"),
+        first,
+        ToolMessage(content="[(200,)]", tool_call_id=first.tool_calls[0]["id"])
+    ])
+    assert not second.tool_calls
+    assert "[(200,)]" in second.content
+
+
+def test_structured_output_and_batches():
+    """Query checkers get the query back in the schema; batches get one section per question"""
+    llm = MockChatModel()
+    checked = llm.with_structured_output(QueryChecker).invoke("Review it.\n\nQuery:\n```sql\nSELECT 1;\n```")
+    assert checked == QueryChecker(query="SELECT 1;")
+
+    batch = llm.invoke(
+        "Natural language queries:\n1. How many films are there?\n2. How many stores are there?\n\n"
+        "Answer every query. For each one write a line '-- Query <number>' followed by its SQL query."
+    )
+    print(batch.content)
+    assert batch.content.startswith("-- Query 1\nSELECT COUNT(*) AS film_count")
+    assert "-- Query 2\nSELECT COUNT(*) AS store_count" in batch.content
+
+
+def test_backend_is_read_when_the_model_is_created():
+    """LLM_BACKEND set after the factory was imported still selects the mock model"""
+    def agent_default():
+        return "agent default"
+
+    original = os.environ.get("LLM_BACKEND")
+    os.environ["LLM_BACKEND"] = "default"
+    try:
+        default_llm = get_llm("gemini-2.5-flash", default=agent_default)
+        os.environ["LLM_BACKEND"] = "mock"
+        mock_llm = get_llm("gemini-2.5-flash", default=agent_default)
+    finally:
+        if original is None:
+            os.environ.pop("LLM_BACKEND", None)
+        else:
+            os.environ["LLM_BACKEND"] = original
+    print(f"default: {default_llm!r}, mock: {type(mock_llm).__name__}")
+    assert default_llm == "agent default"
+    assert isinstance(mock_llm, MockChatModel)
+
+
+if __name__ == "__main__":
+    test_recorded_question_is_replayed()
+    test_streaming_and_async_match_invoke()
+    test_tool_call_then_summary()
+    test_structured_output_and_batches()
+    test_backend_is_read_when_the_model_is_created()
+    print("✅ All mock LLM tests passed!")
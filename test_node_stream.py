@@ -0,0 +1,96 @@
+"""
+Test script for the Server-Sent Events stream of pipeline node outputs
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import HumanMessage
+from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.types import Command
+from result_capture import record_raw_result
+from node_stream import format_sse, parse_sse, stream_query_events
+
+EXECUTE_SECONDS = 0.5
+
+
+def build_graph(fail_execution=False):
+    """query_gen -> query_check -> query_execute with a slow execution step"""
+
+    def query_gen(state: MessagesState):
+        time.sleep(0.05)
+        return Command(update={"messages": [HumanMessage(content="SELECT COUNT(*) FROM actor;", name="supervisor")]})
+
+    def query_check(state: MessagesState):
+        return Command(update={"messages": [HumanMessage(content=state["messages"][-1].content, name="supervisor")]})
+
+    def query_execute(state: MessagesState):
+        time.sleep(EXECUTE_SECONDS)
+        if fail_execution:
+            raise RuntimeError("database is down")
+        record_raw_result("[(200,)]")
+        return Command(update={"messages": [HumanMessage(content="count: 200", name="supervisor")]})
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("query_gen", query_gen)
+    builder.add_node("query_check", query_check)
+    builder.add_node("query_execute", query_execute)
+    builder.add_edge(START, "query_gen")
+    builder.add_edge("query_gen", "query_check")
+    builder.add_edge("query_check", "query_execute")
+    builder.add_edge("query_execute", END)
+    return builder.compile()
+
+
+def test_sql_arrives_before_the_result():
+    """Each node is emitted when it completes, with timings and the captured rows"""
+    start = time.perf_counter()
+    received = []
+    for event in stream_query_events(build_graph(), "How many actors are there?"):
+        received.append((event, time.perf_counter() - start))
+
+    names = [event["event"] for event, _ in received]
+    print(f"Events: {[(name, round(at, 3)) for name, (_, at) in zip(names, received)]}")
+    assert names == ["sql", "checked_sql", "result", "done"]
+
+    sql_event, sql_at = received[0]
+    assert sql_event["sql_query"] == "SELECT COUNT(*) FROM actor;"
+    assert sql_at < EXECUTE_SECONDS
+
+    result_event = received[2][0]
+    assert result_event["result"] == "count: 200"
+    assert result_event["json_result"] == "[(200,)]"
+    assert result_event["node_ms"] >= EXECUTE_SECONDS * 1000
+
+    done = received[3][0]
+    assert set(done["timings"]) == {"query_gen", "query_check", "query_execute"}
+    assert done["total_ms"] >= result_event["elapsed_ms"]
+
+
+def test_failures_end_the_stream_with_an_error():
+    """A failing node produces an error event after the steps that completed"""
+    names = [event["event"] for event in stream_query_events(build_graph(fail_execution=True), "How many actors?")]
+    assert names == ["sql", "checked_sql", "error"]
+
+
+def test_sse_round_trip():
+    """Encoded events are decoded back unchanged"""
+    events = [
+        {"event": "sql", "node": "query_gen", "sql_query": "SELECT 1;\n", "node_ms": 1.5, "elapsed_ms": 1.5},
+        {"event": "done", "timings": {"query_gen": 1.5}, "total_ms": 2.0},
+    ]
+    encoded = "".join(format_sse(event) for event in events)
+    print(encoded)
+    assert encoded.startswith("event: sql\ndata: ")
+    assert list(parse_sse(encoded.split("\n"))) == events
+
+
+if __name__ == "__main__":
+    test_sql_arrives_before_the_result()
+    test_failures_end_the_stream_with_an_error()
+    test_sse_round_trip()
+    print("✅ All node stream tests passed!")
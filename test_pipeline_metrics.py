@@ -0,0 +1,71 @@
+"""
+Test script for per-stage pipeline timings and rolling percentiles
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_metrics import PipelineStats, percentile, record_tokens, stage, track_request
+import pipeline_metrics
+
+
+def test_stages_and_tokens_are_collected():
+    """Stages and tokens recorded anywhere in the request end up in its timings"""
+    original_stats = pipeline_metrics.pipeline_stats
+    pipeline_metrics.pipeline_stats = PipelineStats()
+    try:
+        with track_request() as timings:
+            with stage("llm"):
+                time.sleep(0.01)
+            with track_request() as nested:
+                assert nested is timings
+                with stage("llm"):
+                    pass
+            record_tokens({"input_tokens": 100, "output_tokens": 20, "cached_tokens": 80})
+
+        result = timings.as_dict()
+        print(f"Timings: {result}")
+        assert result["stages_ms"]["llm"] >= 10
+        assert result["total_ms"] >= result["stages_ms"]["llm"]
+        assert result["llm_calls"] == 1
+        assert result["tokens"]["cached_tokens"] == 80
+        assert pipeline_metrics.pipeline_stats.summary()["requests"] == 1
+    finally:
+        pipeline_metrics.pipeline_stats = original_stats
+
+
+def test_stage_outside_request_is_ignored():
+    """Stages outside a request do not fail"""
+    with stage("execute"):
+        pass
+    record_tokens({"input_tokens": 1})
+
+
+def test_rolling_percentiles():
+    """Percentiles are computed over the most recent requests only"""
+    assert percentile(list(range(1, 101)), 0.95) == 95
+    assert percentile([], 0.5) == 0.0
+
+    stats = PipelineStats(window=10)
+    for i in range(20):
+        timings = pipeline_metrics.PipelineTimings()
+        timings.add_stage("db", float(i))
+        timings.total_ms = float(i)
+        stats.record(timings)
+
+    db = stats.summary()["metrics"]["db_ms"]
+    print(f"db_ms: {db}")
+    assert db["count"] == 10
+    assert db["p50"] == 14.0
+    assert db["p99"] == 19.0
+
+
+if __name__ == "__main__":
+    test_stages_and_tokens_are_collected()
+    test_stage_outside_request_is_ignored()
+    test_rolling_percentiles()
+    print("✅ All pipeline metrics tests passed!")
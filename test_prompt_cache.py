@@ -0,0 +1,89 @@
+"""
+Test script for the static prompt prefix and token usage accounting
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage
+from prompt_cache import TokenUsageStats, build_prompt_messages, compact_ddl, ddl_version, get_prompt_prefix
+
+TEMPLATE = "You generate SQL.\n\nDATABASE SCHEMA (DDL):\n{ddl}\n"
+
+DDL = """-- DVD Rental Database DDL
+-- Date: 2024-01-01 10:00:00
+
+-- Table: film
+CREATE TABLE film (
+    film_id INTEGER NOT NULL,
+    title   VARCHAR(255) NOT NULL,   -- shown to customers
+    rating  TEXT DEFAULT 'G;  PG -- family',
+    "special  features" TEXT
+);
+
+COMMENT ON TABLE film IS 'Films; one row per title';
+"""
+
+
+def test_compact_ddl_keeps_quoted_text():
+    """Whitespace and comments are stripped outside quotes only; ';' in literals does not split statements"""
+    compact = compact_ddl(DDL)
+    print(compact)
+    assert compact.splitlines() == [
+        "CREATE TABLE film(film_id INTEGER NOT NULL,title VARCHAR(255) NOT NULL,"
+        "rating TEXT DEFAULT 'G;  PG -- family',\"special  features\" TEXT);",
+        "COMMENT ON TABLE film IS 'Films; one row per title';",
+    ]
+
+
+def test_prefix_is_stable_across_ddl_timestamps():
+    """The prefix and its version ignore the extraction date, so every worker sends the same bytes"""
+    later = DDL.replace("2024-01-01 10:00:00", "2024-06-30 23:59:59")
+    assert ddl_version(DDL) == ddl_version(later)
+
+    for mode in ("implicit", "compact"):
+        prefix = get_prompt_prefix(TEMPLATE, DDL, mode)
+        assert get_prompt_prefix(TEMPLATE, later, mode).text == prefix.text
+        assert get_prompt_prefix(TEMPLATE, DDL, mode) is prefix
+        assert "-- Date:" not in prefix.text
+
+    compact = get_prompt_prefix(TEMPLATE, DDL, "compact")
+    assert compact.token_estimate < get_prompt_prefix(TEMPLATE, DDL, "implicit").token_estimate
+
+    messages = build_prompt_messages(get_prompt_prefix(TEMPLATE, DDL, "explicit"), "How many films are there?")
+    print(f"Explicit system block: {messages[0].content[0]['cache_control']}")
+    assert messages[0].content[0]["cache_control"] == {"type": "ephemeral"}
+    assert messages[1].content == "How many films are there?"
+
+
+def test_cache_hit_accounting():
+    """Reported cached tokens count as hits; responses without usage fall back to the prefix estimate"""
+    stats = TokenUsageStats()
+    prefix = get_prompt_prefix(TEMPLATE, DDL, "implicit")
+
+    cached = AIMessage(content="SELECT 1;", usage_metadata={
+        "input_tokens": 1000, "output_tokens": 10, "total_tokens": 1010,
+        "input_token_details": {"cache_read": 800},
+    })
+    usage = stats.record(cached, prefix)
+    assert usage == {"input_tokens": 1000, "output_tokens": 10, "cached_tokens": 800,
+                     "prefix_tokens": prefix.token_estimate}
+
+    usage = stats.record(AIMessage(content="SELECT 2;"), prefix)
+    assert usage["input_tokens"] == prefix.token_estimate and usage["cached_tokens"] == 0
+
+    summary = stats.summary()
+    print(f"Summary: {summary}")
+    assert summary["requests"] == 2
+    assert summary["cached_tokens"] == 800
+    assert summary["cache_hit_ratio"] == 800 / (1000 + prefix.token_estimate)
+
+
+if __name__ == "__main__":
+    test_compact_ddl_keeps_quoted_text()
+    test_prefix_is_stable_across_ddl_timestamps()
+    test_cache_hit_accounting()
+    print("✅ All prompt cache tests passed!")
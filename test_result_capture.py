@@ -0,0 +1,95 @@
+"""
+Stress test for request-scoped raw result capture under concurrency
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from langchain_community.utilities import SQLDatabase
+from mock_llm import MockChatModel
+from result_capture import capture_request, record_raw_result
+import ai_sql_agent
+
+REQUESTS = 200
+PARALLELISM = 32
+
+
+def question(number):
+    return f"Which request has the number {number}?"
+
+
+def setup_pipeline():
+    """Answer each question with a query returning its own number"""
+    fixtures_path = os.path.join(tempfile.mkdtemp(), "requests.jsonl")
+    with open(fixtures_path, "w", encoding="utf-8") as f:
+        for number in range(REQUESTS):
+            f.write(json.dumps({"question": question(number), "sql": f"SELECT {number} AS request_id;"}) + "\n")
+    ai_sql_agent.engine.llm = MockChatModel(fixtures_path=fixtures_path, latency_ms=2, latency_jitter_ms=5)
+    ai_sql_agent.engine.db = SQLDatabase.from_uri("sqlite://")
+
+
+def check_result(number, result):
+    assert result["json_result"] == f"[({number},)]", f"request {number} got {result['json_result']}"
+
+
+def test_capture_is_scoped_to_the_request():
+    """Nested and sequential captures do not see each other's results"""
+    record_raw_result("outside")
+    with capture_request() as outer:
+        record_raw_result("outer")
+        with capture_request() as inner:
+            record_raw_result("inner")
+        assert inner.raw_result == "inner"
+        assert outer.raw_result == "outer"
+    with capture_request() as later:
+        assert later.raw_result is None
+
+
+def test_threaded_requests_keep_their_results():
+    """Concurrent process_query calls from a thread pool each get their own json_result"""
+    setup_pipeline()
+    with ThreadPoolExecutor(max_workers=PARALLELISM) as executor:
+        results = list(executor.map(lambda n: ai_sql_agent.process_query(question(n)), range(REQUESTS)))
+
+    for number, result in enumerate(results):
+        check_result(number, result)
+    print(f"{REQUESTS} threaded requests with {PARALLELISM} workers kept their own results")
+
+
+def test_async_requests_keep_their_results():
+    """Concurrent requests from asyncio tasks, including the agent execution path"""
+    setup_pipeline()
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(PARALLELISM)
+
+        async def request(number):
+            async with semaphore:
+                return await asyncio.to_thread(ai_sql_agent.process_query, question(number))
+
+        return await asyncio.gather(*(request(number) for number in range(REQUESTS)))
+
+    for mode in ("direct", "agent"):
+        ai_sql_agent.engine.execute_mode = mode
+        try:
+            results = asyncio.run(run_all())
+        finally:
+            ai_sql_agent.engine.execute_mode = "direct"
+        for number, result in enumerate(results):
+            check_result(number, result)
+        print(f"{REQUESTS} async requests in {mode} mode kept their own results")
+
+
+if __name__ == "__main__":
+    test_capture_is_scoped_to_the_request()
+    test_threaded_requests_keep_their_results()
+    test_async_requests_keep_their_results()
+    print("✅ All result capture tests passed!")
@@ -0,0 +1,85 @@
+"""
+Test script for the SQL row budget (automatic LIMIT injection)
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sql_row_budget import apply_row_budget, has_top_level_limit, is_read_only
+
+
+def test_limit_added_after_order_by():
+    """An unbounded query gets a LIMIT after its outermost ORDER BY"""
+    result = apply_row_budget("SELECT * FROM customer ORDER BY last_name;", max_rows=50)
+    print(f"Rewritten: {result.sql_query!r}")
+    assert result.applied
+    assert result.row_limit == 50
+    assert result.sql_query == "SELECT * FROM customer ORDER BY last_name\nLIMIT 51;"
+
+
+def test_existing_limit_is_kept():
+    """Queries that already limit their rows are left alone"""
+    for sql in ["SELECT * FROM film LIMIT 10", "SELECT * FROM film FETCH FIRST 5 ROWS ONLY"]:
+        result = apply_row_budget(sql, max_rows=50)
+        print(f"{sql!r} -> applied={result.applied}")
+        assert not result.applied
+        assert has_top_level_limit(sql)
+
+
+def test_subquery_limit_is_not_top_level():
+    """A LIMIT inside a subquery does not bound the outer query"""
+    sql = "SELECT * FROM (SELECT * FROM film LIMIT 5) f JOIN film_actor fa ON fa.film_id = f.film_id"
+    assert not has_top_level_limit(sql)
+    assert apply_row_budget(sql, max_rows=50).applied
+
+
+def test_strings_and_comments_are_ignored():
+    """LIMIT inside literals or comments is not mistaken for a clause"""
+    sql = "SELECT 'limit 1' AS note FROM actor -- limit 2\n"
+    result = apply_row_budget(sql, max_rows=10)
+    print(f"Rewritten: {result.sql_query!r}")
+    assert result.sql_query == "SELECT 'limit 1' AS note FROM actor\nLIMIT 11 -- limit 2\n"
+
+
+def test_writes_and_scripts_are_not_rewritten():
+    """Only single row-returning statements take a LIMIT"""
+    for sql in [
+        "UPDATE film SET rental_rate = 0.99",
+        "WITH d AS (DELETE FROM payment RETURNING *) SELECT * FROM d",
+        "SELECT 1; SELECT 2",
+        "SELECT * INTO film_copy FROM film",
+    ]:
+        result = apply_row_budget(sql, max_rows=10)
+        print(f"{sql!r} -> applied={result.applied}")
+        assert not result.applied
+
+
+def test_pagination_offset():
+    """Pages after the first are fetched with an OFFSET"""
+    result = apply_row_budget("SELECT * FROM film ORDER BY title", max_rows=100, offset=200)
+    assert result.sql_query.endswith("LIMIT 101 OFFSET 200")
+
+
+def test_read_only_statements():
+    """Only single SELECT/WITH queries without writes or SELECT INTO are read-only"""
+    for sql_query in ["SELECT * FROM film;", "WITH f AS (SELECT 1) SELECT * FROM f",
+                      "SELECT 'DELETE; INSERT' AS text; -- UPDATE"]:
+        assert is_read_only(sql_query), sql_query
+    for sql_query in ["DELETE FROM film", "UPDATE film SET title = 'x'", "INSERT INTO actor VALUES (1)",
+                      "WITH d AS (DELETE FROM rental RETURNING *) SELECT * FROM d",
+                      "SELECT * INTO film_copy FROM film", "SELECT 1; DROP TABLE film", "EXPLAIN SELECT 1", ""]:
+        assert not is_read_only(sql_query), sql_query
+
+
+if __name__ == "__main__":
+    test_limit_added_after_order_by()
+    test_existing_limit_is_kept()
+    test_subquery_limit_is_not_top_level()
+    test_strings_and_comments_are_ignored()
+    test_writes_and_scripts_are_not_rewritten()
+    test_pagination_offset()
+    test_read_only_statements()
+    print("✅ All row budget tests passed!")
@@ -0,0 +1,132 @@
+"""
+Test script for speculative generation (first valid candidate wins)
+Uses fake chat models with fixed delays instead of a real LLM.
+"""
+
+import sys
+import os
+import asyncio
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SQL_EXAMPLE_STORE_PATH", "")  # Learned examples stay in memory
+
+from langchain_core.messages import AIMessage
+import ai_sql_agent_v2
+from speculative_generation import candidate_models, race_candidates, run_speculative, SpeculativeResult, SpeculativeStats
+
+
+class FakeChatModel:
+    """Answers after a delay; cancelled calls are counted"""
+
+    cancelled = 0
+
+    def __init__(self, content, delay):
+        self.content = content
+        self.delay = delay
+        self.temperature = 0.0
+
+    async def ainvoke(self, messages):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            FakeChatModel.cancelled += 1
+            raise
+        return AIMessage(content=self.content, additional_kwargs={"loop": id(asyncio.get_running_loop())})
+
+    def model_copy(self, update):
+        # Each temperature answers later than the previous one
+        return FakeChatModel(self.content, self.delay + update["temperature"])
+
+
+def validate(response):
+    return "valid" if response.content.startswith("SELECT") else "error"
+
+
+def test_first_valid_candidate_wins():
+    """An invalid fast answer is skipped and slower calls are cancelled"""
+    FakeChatModel.cancelled = 0
+    candidates = [
+        FakeChatModel("SELECT slow", 1.0),
+        FakeChatModel("not sql", 0.01),
+        FakeChatModel("SELECT fast", 0.05),
+    ]
+    result = asyncio.run(race_candidates(candidates, [], validate))
+    print(f"Winner: {result.variant} ({result.status}), cancelled: {result.cancelled}")
+    assert result.variant == 2
+    assert result.response.content == "SELECT fast"
+    assert result.cancelled == 1
+    assert FakeChatModel.cancelled == 1
+
+
+def test_no_valid_candidate():
+    """Without a valid answer the race reports no winner"""
+    candidates = [FakeChatModel("nope", 0.01), FakeChatModel("still nope", 0.02)]
+    result = asyncio.run(race_candidates(candidates, [], validate))
+    assert result.variant is None
+    assert len(result.completed) == 2
+
+    stats = SpeculativeStats()
+    stats.record(result, k=2)
+    assert stats.summary()["no_winner"] == 1
+    assert stats.summary()["cost_multiplier"] == 2.0
+
+
+def test_races_share_one_event_loop():
+    """Every race runs on the same long-lived loop, also when called from inside a running loop"""
+    FakeChatModel.cancelled = 0
+    first = run_speculative(FakeChatModel("SELECT 1", 0.01), [], validate, k=3)
+    assert first.variant == 0 and first.cancelled == 2
+
+    async def from_event_loop():
+        return run_speculative(FakeChatModel("SELECT 2", 0.01), [], validate, k=2)
+
+    second = asyncio.run(from_event_loop())
+    print(f"Loops: {first.response.additional_kwargs['loop']}, {second.response.additional_kwargs['loop']}")
+    assert first.response.additional_kwargs["loop"] == second.response.additional_kwargs["loop"]
+    assert FakeChatModel.cancelled == 3
+
+
+def test_models_without_temperature_are_not_raced():
+    """Copies of a model without a temperature would all be the same request, so only one call is made"""
+    class NoTemperatureModel:
+        async def ainvoke(self, messages):
+            return AIMessage(content="SELECT 1")
+
+    llm = NoTemperatureModel()
+    assert candidate_models(llm, k=3) == [llm]
+    result = run_speculative(llm, [], validate, k=3)
+    assert result.variant == 0 and len(result.completed) == 1 and result.cancelled == 0
+
+
+def test_cancelled_calls_count_prompt_tokens():
+    """A cancelled candidate is charged the prompt tokens the completed ones reported"""
+    winner = AIMessage(content="SELECT COUNT(*) FROM film;", usage_metadata={
+        "input_tokens": 1000, "output_tokens": 20, "total_tokens": 1020,
+    })
+    race = SpeculativeResult(response=winner, variant=0, status="valid", completed=[winner], cancelled=2)
+    originals = {name: getattr(ai_sql_agent_v2, name)
+                 for name in ("SPECULATIVE_K", "get_llm", "match_sql_template", "run_speculative")}
+    ai_sql_agent_v2.SPECULATIVE_K = 3
+    ai_sql_agent_v2.get_llm = lambda model: FakeChatModel("SELECT 1", 0)
+    ai_sql_agent_v2.match_sql_template = lambda *args, **kwargs: None
+    ai_sql_agent_v2.run_speculative = lambda llm, messages, validate: race
+    try:
+        result = ai_sql_agent_v2.generate_sql_query("How many films are there?")
+    finally:
+        for name, value in originals.items():
+            setattr(ai_sql_agent_v2, name, value)
+
+    print(f"Token usage: {result.token_usage}")
+    assert result.sql_query == "SELECT COUNT(*) FROM film;"
+    assert result.token_usage["input_tokens"] == 3000
+    assert result.token_usage["output_tokens"] == 20
+
+
+if __name__ == "__main__":
+    test_first_valid_candidate_wins()
+    test_no_valid_candidate()
+    test_races_share_one_event_loop()
+    test_models_without_temperature_are_not_raced()
+    test_cancelled_calls_count_prompt_tokens()
+    print("✅ All speculative generation tests passed!")
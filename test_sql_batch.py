@@ -0,0 +1,145 @@
+"""
+Test script for batch SQL generation in AI SQL Agent v2
+Uses a scripted chat model and a fake execution step instead of Gemini and the SQL execution API.
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from typing import Any, List, Optional
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SQL_EXAMPLE_STORE_PATH", "")  # Learned examples stay in memory
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+import ai_sql_agent_v2 as agent
+
+SINGLE_SQL = "SELECT 'single' AS answer;"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Answers batch prompts with a fixed reply and single prompts with SINGLE_SQL"""
+
+    batch_reply: str = ""
+    prompts: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        content = self.batch_reply if "Natural language queries:" in prompt else SINGLE_SQL
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+@contextmanager
+def patched(**attributes):
+    """Replace ai_sql_agent_v2 attributes for the duration of a test"""
+    originals = {name: getattr(agent, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(agent, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(agent, name, value)
+
+
+def scripted_llm(batch_reply: str) -> ScriptedChatModel:
+    return ScriptedChatModel(batch_reply=batch_reply, prompts=[])
+
+
+def test_related_queries_are_grouped():
+    """Queries sharing content words go together, up to the group size"""
+    groups = agent._group_related_queries([
+        "How many films are in the Comedy category?",
+        "List customers living in Aurora",
+        "How many films are in the Action category?",
+        "List customers living in London",
+        "How many films are in the Drama category?",
+    ], group_size=2)
+    print(f"Groups: {groups}")
+    assert groups == [
+        ["How many films are in the Comedy category?", "How many films are in the Action category?"],
+        ["List customers living in Aurora", "List customers living in London"],
+        ["How many films are in the Drama category?"],
+    ]
+
+
+def test_batch_answer_is_split_per_query():
+    """One LLM call answers the group; '-- Query n' sections map back to the queries"""
+    queries = ["How many films are rated PG?", "How many films are rated R?"]
+    llm = scripted_llm("```sql\n-- Query 2:\nSELECT COUNT(*) FROM film WHERE rating = 'R';\n"
+                       "-- query 1\nSELECT COUNT(*) FROM film WHERE rating = 'PG';\n```")
+    with patched(get_llm=lambda model: llm):
+        results = agent.generate_sql_batch(queries)
+
+    print(f"Results: { {query: result.sql_query for query, result in results.items()} }")
+    assert len(llm.prompts) == 1
+    assert "1. How many films are rated PG?" in llm.prompts[0]
+    assert results[queries[0]].sql_query == "SELECT COUNT(*) FROM film WHERE rating = 'PG';"
+    assert results[queries[1]].sql_query == "SELECT COUNT(*) FROM film WHERE rating = 'R';"
+    assert all(result.validation_status == "valid" for result in results.values())
+
+
+def test_unparsed_queries_fall_back_to_single_generation():
+    """Queries missing from the combined answer are generated on their own"""
+    queries = ["How many films are rated PG?", "How many films are rated R?", "How many films are rated G?"]
+    llm = scripted_llm("-- Query 1\nSELECT COUNT(*) FROM film WHERE rating = 'PG';\n-- Query 7\nSELECT 7;")
+    with patched(get_llm=lambda model: llm, match_sql_template=lambda *args, **kwargs: None):
+        results = agent.generate_sql_batch(queries)
+    assert results[queries[0]].sql_query == "SELECT COUNT(*) FROM film WHERE rating = 'PG';"
+    assert results[queries[1]].sql_query == SINGLE_SQL
+    assert results[queries[2]].sql_query == SINGLE_SQL
+    assert len(llm.prompts) == 3
+
+    # An answer without any section falls back for every query
+    llm = scripted_llm("I cannot answer these.")
+    with patched(get_llm=lambda model: llm, match_sql_template=lambda *args, **kwargs: None):
+        results = agent.generate_sql_batch(queries[:2])
+    print(f"Prompts after an unparseable answer: {len(llm.prompts)}")
+    assert [result.sql_query for result in results.values()] == [SINGLE_SQL, SINGLE_SQL]
+    assert len(llm.prompts) == 3
+
+
+def test_batch_dedupes_identical_queries():
+    """Identical queries (ignoring case and whitespace) are generated and executed once"""
+    executed = []
+
+    def fake_execute(natural_query, generation_result, max_rows, start_time):
+        executed.append(natural_query)
+        return agent.QueryExecutionResponse(
+            natural_query=natural_query, sql_query=generation_result.sql_query,
+            execution_result=[{"count": 1}], execution_success=True
+        )
+
+    llm = scripted_llm("-- Query 1\nSELECT COUNT(*) FROM film WHERE rating = 'PG';\n"
+                       "-- Query 2\nSELECT COUNT(*) FROM film WHERE rating = 'R';")
+    with patched(get_llm=lambda model: llm, check_api_availability=lambda: True,
+                 match_sql_template=lambda *args, **kwargs: None, execute_with_repair=fake_execute):
+        results = list(agent.process_natural_language_batch([
+            "How many films are rated PG?",
+            "how many  films are rated PG?",
+            "How many films are rated R?",
+        ]))
+
+    indices = sorted(result.query_indices for result in results)
+    print(f"Query indices: {indices}, executed: {executed}")
+    assert indices == [[0, 1], [2]]
+    assert sorted(executed) == ["How many films are rated PG?", "How many films are rated R?"]
+    assert len(llm.prompts) == 1
+    assert all(result.response.execution_success for result in results)
+
+
+if __name__ == "__main__":
+    test_related_queries_are_grouped()
+    test_batch_answer_is_split_per_query()
+    test_unparsed_queries_fall_back_to_single_generation()
+    test_batch_dedupes_identical_queries()
+    print("✅ All batch generation tests passed!")
@@ -0,0 +1,110 @@
+"""
+Test script for the SQL cost guard
+Feeds canned EXPLAIN (FORMAT JSON) plans instead of planning against PostgreSQL.
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sql_cost_guard import (
+    AUTO_LIMIT,
+    COST_ASYNC_THRESHOLD,
+    COST_REJECT_THRESHOLD,
+    LIMIT_ROWS_THRESHOLD,
+    evaluate_plan,
+    is_explainable
+)
+from sql_execution_api import summarize_plan
+
+JOIN_QUERY = "SELECT * FROM rental r JOIN customer c ON c.customer_id = r.customer_id"
+
+
+def join_plan(total_cost, plan_rows):
+    """EXPLAIN (FORMAT JSON) output of JOIN_QUERY, one element of the returned list"""
+    return {
+        "Plan": {
+            "Node Type": "Hash Join",
+            "Join Type": "Inner",
+            "Startup Cost": 22.48,
+            "Total Cost": total_cost,
+            "Plan Rows": plan_rows,
+            "Plan Width": 126,
+            "Hash Cond": "(r.customer_id = c.customer_id)",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Parent Relationship": "Outer", "Relation Name": "rental",
+                 "Alias": "r", "Startup Cost": 0.0, "Total Cost": 310.44, "Plan Rows": 16044, "Plan Width": 36},
+                {"Node Type": "Hash", "Parent Relationship": "Inner", "Startup Cost": 14.99,
+                 "Total Cost": 14.99, "Plan Rows": 599, "Plan Width": 90,
+                 "Plans": [
+                     {"Node Type": "Seq Scan", "Parent Relationship": "Outer", "Relation Name": "customer",
+                      "Alias": "c", "Startup Cost": 0.0, "Total Cost": 14.99, "Plan Rows": 599, "Plan Width": 90}
+                 ]}
+            ]
+        }
+    }
+
+
+def test_summarize_plan():
+    """The summary has the root estimates and walks every node of the tree"""
+    summary = summarize_plan(join_plan(375.53, 16044))
+    print(f"Summary: {summary}")
+    assert summary["node_type"] == "Hash Join"
+    assert (summary["startup_cost"], summary["total_cost"]) == (22.48, 375.53)
+    assert (summary["plan_rows"], summary["plan_width"]) == (16044, 126)
+    assert summary["node_count"] == 4
+    assert summary["max_node_rows"] == 16044
+    assert summary["node_types"] == ["Hash", "Hash Join", "Seq Scan"]
+
+    # A leaf plan without child nodes
+    leaf = summarize_plan({"Plan": {"Node Type": "Result", "Startup Cost": 0.0, "Total Cost": 0.01,
+                                    "Plan Rows": 1, "Plan Width": 4}})
+    assert leaf["node_count"] == 1 and leaf["node_types"] == ["Result"]
+
+
+def test_each_threshold():
+    """Each threshold leads to its action; the more expensive check wins"""
+    cases = [
+        (COST_REJECT_THRESHOLD + 1, LIMIT_ROWS_THRESHOLD + 1, "reject"),
+        (COST_ASYNC_THRESHOLD + 1, LIMIT_ROWS_THRESHOLD + 1, "async"),
+        (COST_ASYNC_THRESHOLD, LIMIT_ROWS_THRESHOLD + 1, "limit"),
+        (COST_ASYNC_THRESHOLD, LIMIT_ROWS_THRESHOLD, "allow"),
+    ]
+    for total_cost, plan_rows, action in cases:
+        decision = evaluate_plan(JOIN_QUERY, summarize_plan(join_plan(total_cost, plan_rows)))
+        print(f"Cost {total_cost}, {plan_rows} rows: {decision.action} ({decision.reason})")
+        assert decision.action == action
+        assert decision.row_limit == (AUTO_LIMIT if action == "limit" else None)
+        assert (decision.reason is None) == (action == "allow")
+
+
+def test_existing_limit_is_allowed():
+    """A query with its own top-level LIMIT is not limited again; a LIMIT in a subquery does not count"""
+    summary = summarize_plan(join_plan(375.53, LIMIT_ROWS_THRESHOLD + 1))
+    assert evaluate_plan(JOIN_QUERY + " LIMIT 50", summary).action == "allow"
+    subquery = "SELECT * FROM (SELECT * FROM rental LIMIT 50) r JOIN customer c ON c.customer_id = r.customer_id"
+    assert evaluate_plan(subquery, summary).action == "limit"
+
+    # A plan without estimates is allowed
+    assert evaluate_plan(JOIN_QUERY, {"total_cost": None, "plan_rows": None}).action == "allow"
+
+
+def test_only_row_returning_statements_are_explainable():
+    """Writes, DDL and utility statements are not planned by the cost guard"""
+    for sql_query in ["SELECT 1", "  select * from film", "WITH f AS (SELECT 1) SELECT * FROM f",
+                      "VALUES (1)", "TABLE film"]:
+        assert is_explainable(sql_query), sql_query
+    for sql_query in ["INSERT INTO actor (first_name) VALUES ('A')", "UPDATE film SET title = 'x'",
+                      "DELETE FROM rental", "CREATE TABLE t (id int)", "DROP TABLE film",
+                      "EXPLAIN SELECT 1", "COPY film TO STDOUT", ""]:
+        assert not is_explainable(sql_query), sql_query
+
+
+if __name__ == "__main__":
+    test_summarize_plan()
+    test_each_threshold()
+    test_existing_limit_is_allowed()
+    test_only_row_returning_statements_are_explainable()
+    print("✅ All SQL cost guard tests passed!")
@@ -0,0 +1,68 @@
+"""
+Test script for the shared SQL engine behind the agent entry points
+"""
+
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LLM_BACKEND", "mock")
+
+from langchain_community.utilities import SQLDatabase
+from agent_cache import get_react_agent
+from engine_resources import get_database, get_resource_stats
+from sql_engine import SQLEngine
+import main_cli
+
+
+def test_entry_points_share_resources():
+    """Importing another entry point creates no new database, LLM or toolset"""
+    before = get_resource_stats()
+    import main_streamlit
+    after = get_resource_stats()
+    print(f"Shared resources: {before} -> {after}")
+    assert after == before
+
+    assert main_cli.db is main_streamlit.db is get_database()
+    assert main_cli.llm is main_streamlit.llm
+    assert main_cli.list_tables_tool is main_streamlit.engine.list_tables_tool
+
+    # Same LLM and tools, so the compiled sub-agents are shared as well
+    tools = [main_cli.list_tables_tool, main_cli.get_schema_tool]
+    assert get_react_agent(main_cli.llm, tools) is get_react_agent(main_streamlit.llm, tools)
+
+
+def test_stages_are_pluggable():
+    """Replaced stages run in the graph; the other stages keep their defaults"""
+    engine = SQLEngine(stages={
+        "generate": lambda engine, messages: "SELECT 42 AS answer;",
+        "check": lambda engine, messages: messages[-1].content.replace("42", "43"),
+        "summarize": lambda engine, question, sql_query, answer: f"{question} -> {answer}",
+    })
+    engine.db = SQLDatabase.from_uri("sqlite://")
+
+    outcome = engine.run("What is the answer?", summarize=True)
+    print(f"Outcome: {outcome.model_dump()}")
+    assert outcome.sql_query == "SELECT 42 AS answer;"
+    assert outcome.checked_sql == "SELECT 43 AS answer;"
+    assert outcome.json_result == "[(43,)]"
+    assert outcome.summary == "What is the answer? -> answer: 43"
+
+
+def test_invalid_configuration():
+    """Unknown stages and schema contexts are rejected"""
+    for kwargs in ({"stages": {"explain": lambda engine, messages: ""}}, {"schema_context": "catalog"}):
+        try:
+            SQLEngine(**kwargs)
+            raise AssertionError(f"Expected ValueError for {kwargs}")
+        except ValueError as e:
+            print(f"Rejected: {e}")
+
+
+if __name__ == "__main__":
+    test_entry_points_share_resources()
+    test_stages_are_pluggable()
+    test_invalid_configuration()
+    print("✅ All SQL engine tests passed!")
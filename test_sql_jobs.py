@@ -0,0 +1,58 @@
+"""
+Test script for background SQL jobs in the SQL Execution API
+Uses a blocking fake instead of executing against PostgreSQL.
+"""
+
+import sys
+import os
+import time
+import threading
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+import sql_execution_api
+
+
+def test_full_store_of_unfinished_jobs_is_rejected():
+    """Finished jobs make room for new ones; unfinished jobs are kept and new submissions get 429"""
+    release = threading.Event()
+
+    def blocking_execute(sql_query):
+        release.wait(5)
+        return {"result": [], "rows_affected": 0, "success": True, "error": None, "execution_time_ms": 1.0}
+
+    originals = (sql_execution_api.execute_sql_query, sql_execution_api.MAX_STORED_JOBS, dict(sql_execution_api._jobs))
+    sql_execution_api.execute_sql_query = blocking_execute
+    sql_execution_api.MAX_STORED_JOBS = 3
+    sql_execution_api._jobs.clear()
+    try:
+        client = TestClient(sql_execution_api.app)
+        sql_execution_api._jobs["done"] = {"status": "completed", "result": None, "submitted_at": 0.0}
+
+        job_ids = [client.post("/jobs", json={"sql": f"SELECT {i};"}).json()["job_id"] for i in range(3)]
+        assert "done" not in sql_execution_api._jobs
+
+        rejected = client.post("/jobs", json={"sql": "SELECT 4;"})
+        print(f"Rejected: {rejected.status_code} {rejected.json()}")
+        assert rejected.status_code == 429
+        assert rejected.headers["Retry-After"] == "5"
+        assert len(sql_execution_api._jobs) == 3
+
+        release.set()
+        deadline = time.time() + 5
+        while time.time() < deadline and any(
+                client.get(f"/jobs/{job_id}").json()["status"] != "completed" for job_id in job_ids):
+            time.sleep(0.01)
+        assert client.post("/jobs", json={"sql": "SELECT 5;"}).status_code == 200
+    finally:
+        release.set()
+        sql_execution_api.execute_sql_query, sql_execution_api.MAX_STORED_JOBS, jobs = originals
+        sql_execution_api._jobs.clear()
+        sql_execution_api._jobs.update(jobs)
+
+
+if __name__ == "__main__":
+    test_full_store_of_unfinished_jobs_is_rejected()
+    print("✅ All SQL job tests passed!")
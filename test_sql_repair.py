@@ -0,0 +1,137 @@
+"""
+Test script for the SQL repair request and statistics
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SQL_EXAMPLE_STORE_PATH", "")  # Learned examples stay in memory
+
+from mock_llm import MockChatModel
+from sql_repair import RepairStats, build_repair_request, is_repairable_error
+
+DDL = """-- Table: actor
+CREATE TABLE actor (
+    actor_id INTEGER NOT NULL SERIAL,
+    first_name VARCHAR(45) NOT NULL
+);
+
+-- Table: film
+CREATE TABLE film (
+    film_id INTEGER NOT NULL SERIAL,
+    title VARCHAR(255) NOT NULL
+);
+
+-- Table: payment
+CREATE TABLE payment (
+    payment_id INTEGER NOT NULL SERIAL
+);
+
+ALTER TABLE film ADD PRIMARY KEY (film_id);
+ALTER TABLE payment ADD PRIMARY KEY (payment_id);
+"""
+
+
+def test_request_contains_only_referenced_tables():
+    """The repair request carries the schema of the tables the query uses"""
+    request = build_repair_request(
+        "List film titles",
+        "SELECT name FROM films",
+        'relation "films" does not exist',
+        DDL
+    )
+    print(request)
+    assert "SELECT name FROM films" in request
+    assert 'relation "films" does not exist' in request
+    assert "CREATE TABLE film (" in request
+    assert "ALTER TABLE film ADD PRIMARY KEY" in request
+    assert "CREATE TABLE actor" not in request
+    assert "payment" not in request
+
+
+def test_infrastructure_errors_are_not_repaired():
+    """Only errors caused by the query itself trigger a repair"""
+    assert is_repairable_error('column "name" does not exist')
+    assert not is_repairable_error("Connection error: refused")
+    assert not is_repairable_error("Query rejected by cost guard: estimated cost 1e9")
+    assert not is_repairable_error("canceling statement due to statement timeout")
+    assert not is_repairable_error(None)
+
+
+def test_attempt_success_rates():
+    """Success rates are tracked per attempt number"""
+    stats = RepairStats()
+    stats.record_first_try(True)
+    stats.record_first_try(False)
+    stats.record_first_try(False)
+    stats.record_attempt(1, True)
+    stats.record_attempt(1, False)
+    stats.record_attempt(2, False)
+
+    summary = stats.summary()
+    print(f"Summary: {summary}")
+    assert summary["queries"] == 3
+    assert summary["attempts"][1]["success_rate"] == 0.5
+    assert summary["attempts"][2]["success_rate"] == 0.0
+
+
+def test_repair_call_is_cancelled_at_the_deadline():
+    """A repair LLM call still running when the deadline passes is cancelled"""
+    import ai_sql_agent_v2
+
+    original_get_llm = ai_sql_agent_v2.get_llm
+    ai_sql_agent_v2.get_llm = lambda model: MockChatModel(latency_ms=2000)
+    try:
+        start = time.perf_counter()
+        result = ai_sql_agent_v2.repair_sql_query(
+            "How many films are there?", "SELECT COUNT(*) FROM films;",
+            'relation "films" does not exist', timeout=0.2
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        ai_sql_agent_v2.get_llm = original_get_llm
+
+    print(f"Repair after {elapsed:.2f}s: {result.validation_message}")
+    assert result.validation_status == "error"
+    assert "deadline" in result.validation_message
+    assert elapsed < 1.0
+
+
+def test_only_read_only_queries_become_examples():
+    """A successful write is executed but never stored as a few-shot example"""
+    import ai_sql_agent_v2
+    from example_store import ExampleStore
+
+    def fake_execute(natural_query, sql_query, max_rows):
+        return ai_sql_agent_v2.QueryExecutionResponse(
+            natural_query=natural_query, sql_query=sql_query, execution_result=[], execution_success=True
+        )
+
+    store = ExampleStore(path=None, seed_examples=[])
+    originals = (ai_sql_agent_v2.execute_generated_sql, ai_sql_agent_v2._example_store)
+    ai_sql_agent_v2.execute_generated_sql = fake_execute
+    ai_sql_agent_v2._example_store = store
+    try:
+        for question, sql_query in [("Delete the rentals of film 1", "DELETE FROM rental WHERE inventory_id = 1;"),
+                                    ("How many films are there?", "SELECT COUNT(*) FROM film;")]:
+            generation = ai_sql_agent_v2.SQLGenerationResponse(
+                sql_query=sql_query, validation_status="valid", validation_message="ok"
+            )
+            assert ai_sql_agent_v2.execute_with_repair(question, generation).execution_success
+    finally:
+        ai_sql_agent_v2.execute_generated_sql, ai_sql_agent_v2._example_store = originals
+
+    print(f"Stored examples: {[example.sql_query for example in store._examples.values()]}")
+    assert [example.sql_query for example in store._examples.values()] == ["SELECT COUNT(*) FROM film;"]
+
+
+if __name__ == "__main__":
+    test_request_contains_only_referenced_tables()
+    test_infrastructure_errors_are_not_repaired()
+    test_attempt_success_rates()
+    test_repair_call_is_cancelled_at_the_deadline()
+    test_only_read_only_queries_become_examples()
+    print("✅ All SQL repair tests passed!")
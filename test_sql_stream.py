@@ -0,0 +1,97 @@
+"""
+Test script for streamed SQL generation with early stop
+Uses a fake chat model that streams fixed chunks instead of a real LLM.
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessageChunk
+from sql_stream import SQLStreamAssembler, stream_sql
+
+
+class FakeStreamingModel:
+    """Streams the given chunks and records how many were consumed"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+
+    def stream(self, messages):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield AIMessageChunk(content=chunk)
+
+
+def test_fenced_sql_stops_at_closing_fence():
+    """Explanation tokens after the closing fence are never requested"""
+    model = FakeStreamingModel(["```sql\nSELECT COUNT(*)", " FROM actor;", "\n```", "\nThis query counts", " actors."])
+    partials = []
+    response = stream_sql(model, [], on_partial=partials.append)
+    print(f"Content: {response.content!r}, partials: {partials}")
+    assert response.content == "```sql\nSELECT COUNT(*) FROM actor;\n```"
+    assert model.sent == 3
+    assert partials[0] == "SELECT COUNT(*)"
+    assert response.response_metadata["stopped_early"]
+
+
+def test_unfenced_sql_stops_at_top_level_semicolon():
+    """Semicolons inside literals do not end the statement"""
+    assembler = SQLStreamAssembler()
+    assert not assembler.feed("SELECT title FROM film WHERE description LIKE '%;")
+    assert not assembler.feed("%'")
+    assert assembler.feed(" ORDER BY title; The query lists")
+    assert assembler.sql == "SELECT title FROM film WHERE description LIKE '%;%' ORDER BY title;"
+
+
+def test_any_chunking_finds_the_same_end():
+    """Any chunking ends the statement just after its first top-level semicolon"""
+    statements = [
+        ("SELECT 'it''s; fine' AS a, \"x;\"\"y\" FROM t WHERE b = $tag$ ; $ta$ $tag$;", " trailing"),
+        ("SELECT (1; 2) -- no; end\n/* a /* nested; */ still; */ FROM t;", " next"),
+        ("SELECT a$b$c, $$;$$ FROM t-1/2;", " rest"),
+    ]
+    for statement, rest in statements:
+        sql = statement + rest
+        expected = len(statement)
+        for size in range(1, 6):
+            assembler = SQLStreamAssembler()
+            for start in range(0, len(sql), size):
+                if assembler.feed(sql[start:start + size]):
+                    break
+            assert assembler.end == expected, (sql, size, assembler.end)
+            assert start < expected <= start + size
+    print(f"Statement ends: {[len(statement) for statement, _ in statements]}")
+
+
+def test_scan_is_linear_in_the_answer_length():
+    """Every chunk only scans its own characters, so tiny chunks of a long answer stay fast"""
+    sql = "SELECT " + "a, 'x;y', (b) -- c;\n" * 1500 + "1;"
+    assembler = SQLStreamAssembler()
+    started = time.perf_counter()
+    complete = [assembler.feed(char) for char in sql]
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {len(sql)} one-character chunks in {elapsed * 1000:.0f}ms")
+    assert complete.index(True) == len(sql) - 1 and assembler.end == len(sql)
+    assert elapsed < 2.0
+
+
+def test_explanation_is_kept_when_requested():
+    """Without early stop the full answer is returned"""
+    model = FakeStreamingModel(["SELECT 1;", "\nEXPLANATION: ", "Returns one."])
+    response = stream_sql(model, [], stop_early=False)
+    assert response.content == "SELECT 1;\nEXPLANATION: Returns one."
+    assert model.sent == 3
+
+
+if __name__ == "__main__":
+    test_fenced_sql_stops_at_closing_fence()
+    test_unfenced_sql_stops_at_top_level_semicolon()
+    test_any_chunking_finds_the_same_end()
+    test_scan_is_linear_in_the_answer_length()
+    test_explanation_is_kept_when_requested()
+    print("✅ All SQL stream tests passed!")
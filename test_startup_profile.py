@@ -0,0 +1,80 @@
+"""
+Test script for lazy entry point imports and the startup profile
+"""
+
+import sys
+import os
+import subprocess
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("LLM_BACKEND", "mock")
+
+from startup_profile import DEFERRED_MODULES, check_budget, parse_importtime, profile_module
+
+SAMPLE_IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       448 |     422100 |   fastapi
+import time:     11650 |     307176 |       fastapi.routing
+import time:      9540 |    1161332 | fastapi_sql_api
+"""
+
+
+def test_parse_importtime():
+    """Self and cumulative times are read per module; the header is skipped"""
+    imports = parse_importtime(SAMPLE_IMPORTTIME)
+    print(f"Parsed: {imports}")
+    assert imports == [
+        ("fastapi", 448, 422100),
+        ("fastapi.routing", 11650, 307176),
+        ("fastapi_sql_api", 9540, 1161332),
+    ]
+
+
+def test_entry_point_defers_heavy_imports():
+    """Importing an agent loads no heavy library; the first use builds llm, db and graph"""
+    profile = profile_module("ai_sql_agent", repeat=1, top=3, first_use=True)
+    print(f"Profile: {profile}")
+    assert profile["deferred_loaded"] == []
+    assert len(profile["slowest_imports"]) == 3
+    assert profile["first_use_ms"] is not None
+
+    # The deferred modules are loaded by the first use of the graph and the database
+    import ai_sql_agent
+    ai_sql_agent.graph
+    assert all(name in sys.modules for name in ("langgraph", "langchain_core.language_models"))
+    ai_sql_agent.db
+    assert "sqlalchemy" in sys.modules
+
+
+def test_api_defers_the_ddl_and_langchain():
+    """The API imports no LangChain and does not load or extract the DDL until a question arrives"""
+    profile = profile_module("fastapi_sql_api", repeat=1, top=0)
+    print(f"Deferred modules loaded: {profile['deferred_loaded']}")
+    assert profile["deferred_loaded"] == []
+
+    probe = "import sys, ai_sql_agent_v2; print(sorted({'ddl_snapshot', 'extract_ddl'} & set(sys.modules)))"
+    completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert completed.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_budget_violations():
+    """Slow imports and deferred modules loaded at startup are violations"""
+    results = {"modules": {
+        "fast": {"import_ms_median": 200.0, "deferred_loaded": []},
+        "slow": {"import_ms_median": 1500.0, "deferred_loaded": []},
+        "eager": {"import_ms_median": 300.0, "deferred_loaded": [DEFERRED_MODULES[0]]},
+    }}
+    violations = check_budget(results, budget_ms=1000)
+    print(f"Violations: {violations}")
+    assert len(violations) == 2
+    assert violations[0].startswith("slow:") and violations[1].startswith("eager:")
+
+
+if __name__ == "__main__":
+    test_parse_importtime()
+    test_entry_point_defers_heavy_imports()
+    test_api_defers_the_ddl_and_langchain()
+    test_budget_violations()
+    print("✅ All startup profile tests passed!")
@@ -0,0 +1,163 @@
+"""
+Test script for JSON-schema structured output with the streaming field parser
+"""
+
+import sys
+import os
+import io
+import json
+from contextlib import contextmanager
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import HumanMessage
+import lambda_bedrock_chat
+import sql_engine
+import text_to_sql_ai_agent_v2 as agent
+from lambda_bedrock_chat import LambdaBedrockChat
+from sql_engine import QueryChecker
+from structured_output import (
+    StreamingFieldParser,
+    StructuredOutputError,
+    StructuredOutputStats,
+    parse_stream,
+    parse_structured
+)
+import structured_output
+
+CHECKED = '{"query": "SELECT \\"first_name\\" FROM actor WHERE last_name = \'O\\\\Brien\';", "notes": "' + "x" * 500 + '"}'
+
+
+@contextmanager
+def fresh_stats():
+    """Replace the global stats in every module that imported them for the duration of a test"""
+    modules = (structured_output, lambda_bedrock_chat, sql_engine)
+    originals = [module.structured_output_stats for module in modules]
+    stats = StructuredOutputStats()
+    for module in modules:
+        module.structured_output_stats = stats
+    try:
+        yield stats
+    finally:
+        for module, original in zip(modules, originals):
+            module.structured_output_stats = original
+
+
+class FakeEventStream:
+    """Stands in for the EventStream of invoke_with_response_stream"""
+
+    def __init__(self, text, chunk_size=8):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.closed:
+                return
+            self.read += 1
+            yield {"PayloadChunk": {"Payload": chunk.encode()}}
+        yield {"InvokeComplete": {}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeLambdaClient:
+    """Lambda client replying with a fixed generation, streamed or not"""
+
+    def __init__(self, text):
+        self.text = text
+        self.payloads = []
+        self.stream = None
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.payloads.append(json.loads(Payload))
+        return {"StatusCode": 200, "Payload": io.BytesIO(json.dumps({"response": {"content": self.text}}).encode())}
+
+    def invoke_with_response_stream(self, FunctionName, InvocationType, Payload):
+        self.payloads.append(json.loads(Payload))
+        self.stream = FakeEventStream(self.text)
+        return {"StatusCode": 200, "EventStream": self.stream}
+
+
+def test_parser_stops_at_the_closing_quote():
+    """The field is read one character at a time, with escapes, and reading stops when it closes"""
+    parser = StreamingFieldParser("query")
+    fed = 0
+    for char in "```json\n" + CHECKED:
+        fed += 1
+        if parser.feed(char):
+            break
+    print(f"Read {fed} of {len(CHECKED) + 8} characters: {parser.value}")
+    assert parser.value == "SELECT \"first_name\" FROM actor WHERE last_name = 'O\\Brien';"
+    assert fed < len(CHECKED) / 2
+
+    instance, method = parse_structured(parser, QueryChecker)
+    assert method == "field" and instance.query == parser.value
+
+
+def test_nested_and_later_fields():
+    """Keys inside nested values are ignored; the field may come after others"""
+    text = '{"meta": {"query": "nested"}, "tags": ["query"], "query": "SELECT 1;"}'
+    instance, method, parser = parse_stream([text[i:i + 3] for i in range(0, len(text), 3)], QueryChecker)
+    assert instance.query == "SELECT 1;" and method == "field"
+
+
+def test_fallbacks():
+    """Plain text falls back to the old extraction; empty responses raise"""
+    instance, method, _ = parse_stream(["```sql\nSELECT COUNT(*) FROM film;\n```"], QueryChecker)
+    assert method == "text" and instance.query == "SELECT COUNT(*) FROM film;"
+
+    instance, method, _ = parse_stream(['{"query": null}'], QueryChecker)
+    assert method == "text"
+
+    try:
+        parse_stream(["```", "```"], QueryChecker)
+        raise AssertionError("Expected StructuredOutputError")
+    except StructuredOutputError:
+        pass
+
+
+def test_streaming_wrapper_closes_the_stream_early():
+    """With a streaming function the stream is closed once the query field closes"""
+    client = FakeLambdaClient(CHECKED)
+    chat = LambdaBedrockChat(lambda_client=client, structured_streaming=True)
+
+    with fresh_stats() as stats:
+        result = chat.with_structured_output(QueryChecker).invoke("Check: SELECT first_name FROM actor;")
+    print(f"Read {client.stream.read} of {len(client.stream.chunks)} chunks: {result.query}")
+    assert result.query.startswith('SELECT "first_name" FROM actor')
+    assert client.stream.closed and client.stream.read < len(client.stream.chunks) / 2
+
+    payload = client.payloads[0]
+    assert payload["model_kwargs"]["maxTokenCount"] == structured_output.STRUCTURED_MAX_TOKENS
+    assert payload["response_format"]["schema"]["required"] == ["query"]
+    assert "JSON schema" in payload["messages"][-1]["content"]
+    assert stats.summary()["methods"] == {"field": 1}
+
+
+def test_query_check_never_passes_prose_on():
+    """A check that is not SQL is counted and the generated query is kept"""
+    original_llm = agent.engine.llm
+    agent.engine.llm = LambdaBedrockChat(lambda_client=FakeLambdaClient("The query looks correct to me."))
+    try:
+        with fresh_stats() as stats:
+            state = {"messages": [HumanMessage(content="SELECT COUNT(*) FROM actor;")]}
+            checked = agent.engine.query_check(state).update["messages"][-1].content
+    finally:
+        agent.engine.llm = original_llm
+    summary = stats.summary()
+    print(f"Checked query: {checked}, stats: {summary}")
+    assert checked == "SELECT COUNT(*) FROM actor;"
+    assert summary["fallbacks"] == {"not_json": 1, "not_sql": 1}
+
+
+if __name__ == "__main__":
+    test_parser_stops_at_the_closing_quote()
+    test_nested_and_later_fields()
+    test_fallbacks()
+    test_streaming_wrapper_closes_the_stream_early()
+    test_query_check_never_passes_prose_on()
+    print("✅ All structured output tests passed!")